@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+'''
+Usage:
+    kitty_session_export.py (reports|summaries|tests) <session> <output> [--columns] [--min <id>] [--max <id>] [--jobs <n>]
+    kitty_session_export.py blobs <session> <output>
+
+Export the data of a kitty session file, without running the fuzzer.
+The session file is read directly, so it can be exported while the fuzzer runs.
+
+Options:
+    reports             export the reports as JSON lines
+    summaries           export the report summaries as JSON lines
+    tests               export the test summaries as JSON lines
+    blobs               export the payload blobs as JSON lines
+    --columns           export the summaries in columnar layout, a file for each field in the <output> directory
+    --min <id>          first test id to export
+    --max <id>          last test id to export
+    -j --jobs <n>       export in parallel, each job writes its test id range to <output>.<job> [default: 1]
+'''
+import docopt
+import multiprocessing
+from kitty.data.export import SessionExporter
+
+
+def export_range(args):
+    '''
+    Export a test id range of the session (in a separate process)
+
+    :param args: tuple of (kind, session, output, columns, min test id, max test id)
+    :return: number of exported entries
+    '''
+    kind, session, output, columns, min_test_id, max_test_id = args
+    exporter = SessionExporter(session)
+    try:
+        if kind == 'reports':
+            with open(output, 'w') as f:
+                return exporter.export_reports(f, min_test_id, max_test_id)
+        if kind == 'tests':
+            if columns:
+                return exporter.export_test_summary_columns(output, min_test_id, max_test_id)
+            with open(output, 'w') as f:
+                return exporter.export_test_summaries(f, min_test_id, max_test_id)
+        if columns:
+            return exporter.export_summary_columns(output, min_test_id, max_test_id)
+        with open(output, 'w') as f:
+            return exporter.export_summaries(f, min_test_id, max_test_id)
+    finally:
+        exporter.close()
+
+
+def _main():
+    opts = docopt.docopt(__doc__)
+    session = opts['<session>']
+    output = opts['<output>']
+    if opts['blobs']:
+        exporter = SessionExporter(session)
+        with open(output, 'w') as f:
+            count = exporter.export_blobs(f)
+        exporter.close()
+        print('exported %d blobs' % count)
+        return
+    kind = [k for k in ['reports', 'summaries', 'tests'] if opts[k]][0]
+    min_test_id = int(opts['--min']) if opts['--min'] else None
+    max_test_id = int(opts['--max']) if opts['--max'] else None
+    jobs = int(opts['--jobs'])
+    if jobs == 1:
+        count = export_range((kind, session, output, opts['--columns'], min_test_id, max_test_id))
+    else:
+        exporter = SessionExporter(session)
+        ranges = exporter.get_ranges(jobs, kind == 'tests')
+        exporter.close()
+        tasks = []
+        for i, (low, high) in enumerate(ranges):
+            if min_test_id is not None:
+                low = max(low, min_test_id)
+            if max_test_id is not None:
+                high = min(high, max_test_id)
+            if low <= high:
+                tasks.append((kind, session, '%s.%d' % (output, i), opts['--columns'], low, high))
+        pool = multiprocessing.Pool(jobs)
+        count = sum(pool.map(export_range, tasks))
+        pool.close()
+    print('exported %d %s' % (count, kind))
+
+
+if __name__ == '__main__':
+    _main()
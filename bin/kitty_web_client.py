@@ -53,11 +53,26 @@ class KittyWebApi(object):
         assert(resp.status_code == 200)
         return resp.json()
 
-    def get_report_list(self):
+    def query_reports(self, **params):
+        '''
+        Query report summaries (see /api/reports for the parameters)
+        :return: tuple of (number of matching reports, list of report summaries)
+        '''
+        resp = requests.get('%s/api/reports' % self.url, params=params)
+        assert(resp.status_code == 200)
+        result = resp.json()
+        return result['total'], result['reports']
+
+    def get_report_list(self, page_size=1000):
         '''
         Get list of report ids
         '''
-        return self.get_stats()['reports']
+        ids = []
+        while True:
+            _, summaries = self.query_reports(offset=len(ids), limit=page_size)
+            ids.extend(s['test_id'] for s in summaries)
+            if len(summaries) < page_size:
+                return ids
 
     def get_reports(self, report_ids):
         '''
@@ -152,10 +167,10 @@ def cmd_info(options, web):
     for k, v in sorted(info.items()):
         pad = ' ' * (max_len - len(k))
         print('%s:%s %s' % (k, pad, v))
+    print
+    print('--- Reports: %s ---' % resp['report_count'])
     if options['--verbose']:
-        reports = resp['reports']
-        print
-        print('--- Report list ---')
+        reports = web.get_report_list()
         print(','.join('%s' % i for i in reports))
 
 
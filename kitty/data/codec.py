@@ -0,0 +1,221 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+'''
+Compact binary encoding of reports, for storing them in the session database.
+'''
+import cPickle
+import zlib
+from kitty.core import KittyException
+from kitty.data.report import Report
+
+
+class ReportCodec(object):
+    '''
+    Encodes reports in a compact binary format.
+
+    - string values are stored as raw bytes (not base64 encoded)
+    - sub reports are encoded separately, so a report can be decoded partially,
+      skipping the sub reports that are not needed
+    - the encoded report is compressed with a fast zlib level, and the compressor
+      is primed with a dictionary of the common report structure (field names
+      of the reports that the fuzzers create), which makes small reports much smaller
+    - hex views of raw fields ('hex' of 'raw', 'request (hex)' of 'request (raw)' etc.)
+      are not stored, they are generated when the report is decoded
+    - raw fields may be stored outside of the encoded report (e.g. in a blob store),
+      the encoded report refers to them by id
+
+    :example:
+
+        ::
+
+            codec = ReportCodec()
+            data = codec.encode(report)
+            report = codec.decode(data)
+            # decode only the failure reason and the payload sub report
+            partial = codec.decode(data, fields=['failure_reason', 'payload'])
+    '''
+
+    #  Prefix of encoded reports, the last byte is the format version
+    MAGIC = '\x00KR\x01'
+    #  Compression level of the encoded reports
+    COMPRESSION_LEVEL = 1
+
+    def __init__(self):
+        # the dictionary is part of the format, if it is changed, the version must be changed too
+        dictionary = self._encode_report(self._get_dictionary_report())
+        compressor = zlib.compressobj(self.COMPRESSION_LEVEL)
+        prefix = compressor.compress(dictionary) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        decompressor = zlib.decompressobj()
+        decompressor.decompress(prefix)
+        self._compressor = compressor
+        self._decompressor = decompressor
+
+    def _get_dictionary_report(self):
+        '''
+        :return: a report with the common structure of the fuzzer reports
+        '''
+        report = Report('Fuzzer')
+        report.failed('failure reason')
+        report.add('test_number', 0)
+        report.add('fuzz_path', 'template->template')
+        report.add('start_time', 0.0)
+        report.add('stop_time', 0.0)
+        report.add('status', 'failed')
+        report.add('exception', 'exception')
+        report.add('traceback', 'Traceback (most recent call last):\n  File ')
+        data_model = Report('Data Model')
+        data_model.add('sequence/current', 'template->template')
+        data_model.add('current mutation index', '0/0')
+        data_model.add('sequence/index', '0/0')
+        data_model.add('field/name', 'name')
+        data_model.add('field/path', 'template/name')
+        data_model.add('field/mutation index', '0/0')
+        data_model.add('field/type', 'String')
+        report.add(data_model.get_name(), data_model)
+        payload = Report('payload')
+        payload.add('raw', '')
+        payload.add('length', 0)
+        report.add('payload', payload)
+        controller = Report('controller')
+        controller.add('process_id', 0)
+        controller.add('return_code', 0)
+        report.add('controller', controller)
+        target = Report('target')
+        target.add('request (raw)', '')
+        target.add('response (raw)', '')
+        target.add('response (hex)', '')
+        report.add('target', target)
+        return report
+
+    @classmethod
+    def is_encoded(cls, data):
+        '''
+        :param data: stored report data
+        :return: True if the data was encoded by the codec
+        '''
+        return data[:len(cls.MAGIC)] == cls.MAGIC
+
+    @classmethod
+    def get_hex_key(cls, key):
+        '''
+        :param key: key of a report field
+        :return: key of the hex view of the field, None if the field is not a raw field
+        '''
+        if key == 'raw':
+            return 'hex'
+        if key.endswith(' (raw)'):
+            return key[:-len('(raw)')] + '(hex)'
+        return None
+
+    def encode(self, report, store_blob=None):
+        '''
+        :type report: :class:`~kitty.data.report.Report`
+        :param report: the report to encode
+        :type store_blob: func(str) -> str
+        :param store_blob: function that stores the value of a raw field outside of the
+            encoded report, and returns its id, or None to keep it in the report (default: None)
+        :rtype: str
+        :return: the encoded report
+        '''
+        compressor = self._compressor.copy()
+        body = self._encode_report(report, store_blob)
+        return self.MAGIC + compressor.compress(body) + compressor.flush()
+
+    def decode(self, data, fields=None, load_blob=None):
+        '''
+        :param data: the encoded report
+        :param fields: names of the top-level fields and sub reports to decode,
+            None to decode all of them, the other fields keep their defaults (default: None)
+        :type load_blob: func(str) -> str
+        :param load_blob: function that loads a value that was stored by ``store_blob`` by its id (default: None)
+        :rtype: :class:`~kitty.data.report.Report`
+        :return: the decoded report
+        '''
+        if not self.is_encoded(data):
+            raise KittyException('data is not an encoded report')
+        decompressor = self._decompressor.copy()
+        body = decompressor.decompress(data[len(self.MAGIC):]) + decompressor.flush()
+        return self._decode_report(body, fields, load_blob)
+
+    def get_blob_ids(self, data):
+        '''
+        :param data: the encoded report
+        :return: list of the ids of the blobs that the report refers to (see ``store_blob`` of :func:`encode`)
+        '''
+        if not self.is_encoded(data):
+            raise KittyException('data is not an encoded report')
+        decompressor = self._decompressor.copy()
+        body = decompressor.decompress(data[len(self.MAGIC):]) + decompressor.flush()
+        return self._get_blob_ids(body)
+
+    def _get_blob_ids(self, body):
+        values = cPickle.loads(body)
+        blob_ids = list(values[3].values()) if len(values) > 3 else []
+        for sub_report in values[2].values():
+            blob_ids.extend(self._get_blob_ids(sub_report))
+        return blob_ids
+
+    def _encode_report(self, report, store_blob=None):
+        '''
+        A report is encoded as a pickled tuple of its name, its data fields,
+        its sub reports, each of them encoded separately,
+        so they can be skipped when decoding, and the ids of its stored blobs.
+        '''
+        data_fields = report._data_fields
+        skip = set(['name', 'sub_reports'])
+        for k, v in data_fields.items():
+            hex_key = self.get_hex_key(k)
+            if hex_key and isinstance(v, str) and v and (data_fields.get(hex_key) == v.encode('hex')):
+                skip.add(hex_key)
+        fields = {}
+        blobs = {}
+        for k, v in data_fields.items():
+            if k in skip:
+                continue
+            if store_blob and self.get_hex_key(k) and isinstance(v, str) and v:
+                blob_id = store_blob(v)
+                if blob_id is not None:
+                    blobs[k] = blob_id
+                    continue
+            fields[k] = v
+        sub_reports = dict((k, self._encode_report(v, store_blob)) for (k, v) in report._sub_reports.items())
+        if blobs:
+            return cPickle.dumps((report.get_name(), fields, sub_reports, blobs), protocol=2)
+        return cPickle.dumps((report.get_name(), fields, sub_reports), protocol=2)
+
+    def _decode_report(self, body, fields=None, load_blob=None):
+        values = cPickle.loads(body)
+        name, data_fields, sub_reports = values[:3]
+        blobs = values[3] if len(values) > 3 else {}
+        report = Report(name)
+        for k, v in data_fields.items():
+            if (fields is None) or (k in fields):
+                report.add(k, v)
+        for k, blob_id in blobs.items():
+            if (fields is None) or (k in fields):
+                if load_blob is None:
+                    raise KittyException('report field %s is stored as blob %s' % (k, blob_id))
+                report.add(k, load_blob(blob_id))
+        for k in data_fields.keys() + blobs.keys():
+            hex_key = self.get_hex_key(k)
+            value = report.get(k)
+            if hex_key and isinstance(value, str) and (report.get(hex_key) is None):
+                report.add(hex_key, value.encode('hex'))
+        for k in sorted(sub_reports):
+            if (fields is None) or (k in fields):
+                report.add(k, self._decode_report(sub_reports[k], None, load_blob))
+        return report
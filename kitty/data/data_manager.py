@@ -19,18 +19,37 @@ This module is usde to store the fuzzing session related data.
 It provides both means of communications between the fuzzer and the user
 interface, and persistent storage of the fuzzing session results.
 '''
+import os
+import sys
 import sqlite3
 import cPickle
+import hashlib
+import time
 import zlib
+import six
+from kitty.core import KittyException
+from kitty.data.codec import ReportCodec
 from kitty.data.report import Report
-from threading import Event, Thread
-from Queue import Queue
+from threading import Event, Thread, Lock
+from Queue import Queue, Empty, Full
 
 
 class DataManagerTask(object):
     '''
     Task to be performed in the :class:`~kitty.data.data_manager.DataManager`
-    context
+    context.
+    A task is a future of its results: the caller may wait for them with a timeout,
+    cancel the task before it starts, and gets the exception that the task raised.
+
+    :example:
+
+        ::
+
+            task = dataman.submit_task(DataManagerTask(get_session_info))
+            try:
+                session_info = task.get_results(timeout=10)
+            except KittyException:
+                task.cancel()
     '''
 
     def __init__(self, task):
@@ -39,7 +58,11 @@ class DataManagerTask(object):
         :param task: task to be performed
         '''
         self._event = Event()
+        self._lock = Lock()
         self._result = None
+        self._exc_info = None
+        self._started = False
+        self._cancelled = False
         self._task = task
 
     def execute(self, dataman):
@@ -49,22 +72,192 @@ class DataManagerTask(object):
         :type dataman: :class:`~kitty.data.data_manager.DataManager`
         :param dataman: the executing data manager
         '''
+        self._execute_deferred(dataman)
+        self._release()
+
+    def _execute_deferred(self, dataman):
+        '''
+        run the task, without releasing the waiters for its results,
+        until :func:`_release` is called (after the batch is committed)
+
+        :param dataman: the executing data manager
+        '''
+        with self._lock:
+            if self._cancelled:
+                return
+            self._started = True
         self._event.clear()
-        self._result = self._task(dataman)
+        self._result = None
+        self._exc_info = None
+        try:
+            self._result = self._task(dataman)
+        except Exception:
+            self._exc_info = sys.exc_info()
+
+    def _release(self):
+        '''
+        release the waiters for the task results
+        '''
+        self._event.set()
+
+    def cancel(self):
+        '''
+        Cancel the task, if it did not start yet
+
+        :return: True if the task was cancelled
+        '''
+        with self._lock:
+            if self._started:
+                return False
+            self._cancelled = True
         self._event.set()
+        return True
 
-    def get_results(self):
+    def cancelled(self):
+        '''
+        :return: True if the task was cancelled
         '''
+        return self._cancelled
+
+    def done(self):
+        '''
+        :return: True if the task was completed or cancelled
+        '''
+        return self._event.is_set()
+
+    def _wait(self, timeout):
+        if not self._event.wait(timeout):
+            raise KittyException('data manager task was not completed in %s seconds' % timeout)
+        if self._cancelled:
+            raise KittyException('data manager task was cancelled')
+
+    def exception(self, timeout=None):
+        '''
+        :param timeout: maximal time to wait for the task (in seconds), None to wait forever (default: None)
+        :raises: KittyException if the task was cancelled, or was not completed in time
+        :return: the exception that the task raised, None if it did not raise
+        '''
+        self._wait(timeout)
+        return self._exc_info[1] if self._exc_info else None
+
+    def get_results(self, timeout=None):
+        '''
+        :param timeout: maximal time to wait for the task (in seconds), None to wait forever (default: None)
+        :raises: KittyException if the task was cancelled, or was not completed in time,
+            or the exception that the task raised
         :return: result from running the task
         '''
-        self._event.wait()
+        self._wait(timeout)
+        if self._exc_info:
+            six.reraise(*self._exc_info)
         return self._result
 
 
+class _GroupCommitConnection(object):
+    '''
+    Wraps the database connection of the data manager,
+    and defers the commits of the tables while a batch of tasks is executed,
+    so the whole batch is committed in a single transaction.
+    '''
+
+    def __init__(self, connection):
+        '''
+        :param connection: the database connection
+        '''
+        self._connection = connection
+        self._batch = False
+        self._dirty = False
+
+    def begin_batch(self):
+        '''
+        Defer the commits until :func:`end_batch` is called
+        '''
+        self._batch = True
+
+    def end_batch(self):
+        '''
+        Commit the changes of the batch, if there are any
+        '''
+        self._batch = False
+        if self._dirty:
+            self._dirty = False
+            self._connection.commit()
+
+    def commit(self):
+        if self._batch:
+            self._dirty = True
+        else:
+            self._connection.commit()
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class _DataReader(object):
+    '''
+    Read-only view of the data manager over a separate connection,
+    passed to the tasks of :func:`~kitty.data.data_manager.DataManager.submit_read_task`.
+    '''
+
+    def __init__(self, dataman, connection):
+        '''
+        :param dataman: the data manager
+        :param connection: a read-only database connection
+        '''
+        self._dataman = dataman
+        self._connection = connection
+        self._cursor = connection.cursor()
+
+    def get_session_info_manager(self):
+        '''
+        :rtype: :class:`~kitty.data.data_manager.SessionInfoTable`
+        :return: session info manager
+        '''
+        return SessionInfoTable(self._connection, self._cursor, read_only=True)
+
+    def get_model_state_manager(self):
+        '''
+        :rtype: :class:`~kitty.data.data_manager.ModelStateTable`
+        :return: model state manager
+        '''
+        return ModelStateTable(self._connection, self._cursor, read_only=True)
+
+    def get_test_summaries_manager(self):
+        '''
+        :rtype: :class:`~kitty.data.data_manager.TestSummariesTable`
+        :return: test summaries manager
+        '''
+        return TestSummariesTable(self._connection, self._cursor, read_only=True)
+
+    def get_reports_manager(self):
+        '''
+        :rtype: :class:`~kitty.data.data_manager.ReportsTable`
+        :return: reports manager
+        '''
+        return ReportsTable(self._connection, self._cursor, read_only=True)
+
+    def get_test_info(self):
+        '''
+        :return: test info
+        '''
+        return self._dataman.get_test_info()
+
+
 class DataManager(Thread):
     '''
     Manages data on a dedicated thread. All calls to it should be done by
-    submitting DataManagerTask
+    submitting DataManagerTask.
+    The queue of pending tasks is bounded, so submitting a task blocks
+    while the data manager is behind (backpressure).
+
+    The tasks that are pending in the queue are executed as a batch,
+    and committed in a single transaction.
+    Tasks that should be committed together can be submitted at once with
+    :func:`~kitty.data.data_manager.DataManager.submit_batch`.
+    When the database is stored in a file, it is opened in WAL mode,
+    so read-only tasks (e.g. of the user interface) can be submitted with
+    :func:`~kitty.data.data_manager.DataManager.submit_read_task`,
+    and run on separate read-only connections, without waiting for the writes.
 
     :example:
 
@@ -79,54 +272,162 @@ class DataManager(Thread):
             session_info = get_info_task.get_results()
     '''
 
-    def __init__(self, dbname):
+    #  Maximal number of queued submissions (tasks or batches of tasks) that are committed in a single transaction
+    MAX_BATCH_TASKS = 100
+
+    def __init__(self, dbname, max_pending_tasks=1000, max_readers=4):
         '''
         :param dbname: database name for storing the data
+        :param max_pending_tasks: maximal number of tasks in the queue, 0 for no limit (default: 1000)
+        :param max_readers: maximal number of read-only connections (default: 4)
         '''
         super(DataManager, self).__init__()
-        self._queue = Queue()
+        self._queue = Queue(max_pending_tasks)
         self._dbname = dbname
+        self._opened = Event()
+        self._readers = Queue()
+        self._readers_lock = Lock()
+        self._num_readers = 0
+        self._max_readers = max_readers
         self._connection = None
         self._cursor = None
         self._session_info = None
         self._reports = None
         self._test_info = None
+        self._test_info_provider = None
 
     def run(self):
         '''
         thread function
         '''
         self.open()
-        while True:
-            task = self._queue.get()
-            if task is None:
-                break
-            task.execute(self)
+        running = True
+        while running:
+            tasks = [self._queue.get()]
+            while (tasks[-1] is not None) and (len(tasks) < self.MAX_BATCH_TASKS):
+                try:
+                    tasks.append(self._queue.get_nowait())
+                except Empty:
+                    break
+            done = []
+            self._connection.begin_batch()
+            try:
+                for task in tasks:
+                    if task is None:
+                        running = False
+                        break
+                    for subtask in (task if isinstance(task, list) else [task]):
+                        subtask._execute_deferred(self)
+                        done.append(subtask)
+            finally:
+                self._connection.end_batch()
+                # the results are available only after they are committed
+                for task in done:
+                    task._release()
+        self._reports.close()
+        self._close_readers()
 
-    def submit_task(self, task):
+    def submit_task(self, task, timeout=None):
         '''
-        submit a task to the data manager, to be proccessed in the DataManager context
+        submit a task to the data manager, to be proccessed in the DataManager context.
+        Blocks while the queue of pending tasks is full.
 
         :type task: :class:`~kitty.data.data_manager.DataManagerTask`
         :param task: task to perform
+        :param timeout: maximal time to wait for room in the queue (in seconds), None to wait forever (default: None)
+        :raises: KittyException if there was no room in the queue in time
+        '''
+        self._put(task, timeout)
+        return task
+
+    def submit_batch(self, tasks, timeout=None):
+        '''
+        Submit a batch of tasks to the data manager, with a single hand-off to the data manager thread.
+        The tasks are executed in order, and committed in a single transaction,
+        their results are available after the transaction is committed.
+
+        :type tasks: list of :class:`~kitty.data.data_manager.DataManagerTask`
+        :param tasks: tasks to perform
+        :param timeout: maximal time to wait for room in the queue (in seconds), None to wait forever (default: None)
+        :raises: KittyException if there was no room in the queue in time
+        :return: the tasks
+        '''
+        tasks = list(tasks)
+        if tasks:
+            self._put(tasks, timeout)
+        return tasks
+
+    def _put(self, item, timeout):
+        try:
+            self._queue.put(item, timeout=timeout)
+        except Full:
+            raise KittyException('data manager queue is full for %s seconds' % timeout)
+
+    def submit_read_task(self, task):
         '''
-        self._queue.put(task)
+        Perform a read-only task in the calling thread, on a read-only connection,
+        so it does not wait for the pending tasks of the data manager.
+        The task sees the data that was committed so far.
+        If the database is in memory, the task is submitted to the data manager.
+
+        :type task: :class:`~kitty.data.data_manager.DataManagerTask`
+        :param task: task to perform, it should not modify the data
+        '''
+        if (self._dbname == ':memory:') or (not self._opened.is_set()):
+            return self.submit_task(task)
+        connection = self._get_reader()
+        try:
+            task.execute(_DataReader(self, connection))
+        finally:
+            self._readers.put(connection)
         return task
 
+    def _get_reader(self):
+        '''
+        :return: a read-only connection from the pool, a new one if the pool is empty
+        '''
+        with self._readers_lock:
+            create = self._readers.empty() and (self._num_readers < self._max_readers)
+            if create:
+                self._num_readers += 1
+        if not create:
+            return self._readers.get()
+        connection = sqlite3.connect(self._dbname, check_same_thread=False)
+        connection.execute('PRAGMA query_only=1')
+        return connection
+
+    def _close_readers(self):
+        with self._readers_lock:
+            while not self._readers.empty():
+                self._readers.get().close()
+                self._num_readers -= 1
+
     def open(self):
         '''
         open the database
         '''
-        self._connection = sqlite3.connect(self._dbname)
+        connection = sqlite3.connect(self._dbname)
+        # a new database keeps its free pages, so it can be compacted incrementally
+        # (see :func:`~kitty.data.data_manager.ReportsTable.compact`)
+        connection.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        if self._dbname != ':memory:':
+            connection.execute('PRAGMA journal_mode=WAL')
+            # in WAL mode, NORMAL is safe from corruption, and does not sync on each commit
+            connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection = _GroupCommitConnection(connection)
         self._cursor = self._connection.cursor()
         self._session_info = SessionInfoTable(self._connection, self._cursor)
+        self._model_state = ModelStateTable(self._connection, self._cursor)
+        self._test_summaries = TestSummariesTable(self._connection, self._cursor)
         self._reports = ReportsTable(self._connection, self._cursor)
         self._test_info = {}
+        self._opened.set()
 
     def close(self):
         '''
         close the database connection
         '''
+        self._close_readers()
         self._connection.close()
 
     def get_session_info_manager(self):
@@ -136,6 +437,20 @@ class DataManager(Thread):
         '''
         return self._session_info
 
+    def get_model_state_manager(self):
+        '''
+        :rtype: :class:`~kitty.data.data_manager.ModelStateTable`
+        :return: model state manager
+        '''
+        return self._model_state
+
+    def get_test_summaries_manager(self):
+        '''
+        :rtype: :class:`~kitty.data.data_manager.TestSummariesTable`
+        :return: test summaries manager
+        '''
+        return self._test_summaries
+
     def get_reports_manager(self):
         '''
         :rtype: :class:`~kitty.data.data_manager.ReportsTable`
@@ -147,6 +462,8 @@ class DataManager(Thread):
         '''
         :return: test info
         '''
+        if self._test_info_provider is not None:
+            return self._test_info_provider()
         return self._test_info
 
     def set_test_info(self, test_info):
@@ -157,6 +474,17 @@ class DataManager(Thread):
         :param test_info: the test information to be set
         '''
         self._test_info = {k: v for (k, v) in test_info.items()}
+        self._test_info_provider = None
+
+    def set_test_info_provider(self, provider):
+        '''
+        Set a function that computes the test info when it is requested,
+        instead of setting the test info of each test in advance.
+
+        :type provider: func() -> dict
+        :param provider: the test info provider, called in the DataManager context
+        '''
+        self._test_info_provider = provider
 
 
 class Table(object):
@@ -166,21 +494,26 @@ class Table(object):
 
     __TABLE_FIELDS__ = []
     __TABLE_NAME__ = None
+    __TABLE_INDICES__ = []
 
-    def __init__(self, connection, cursor):
+    def __init__(self, connection, cursor, read_only=False):
         '''
         :param connection: the database connection
         :param cursor: the cursor for the database
+        :param read_only: the connection is read-only, do not create the table (default: False)
         '''
         self._connection = connection
         self._cursor = cursor
         self._name = type(self).__TABLE_NAME__
         self._fields = type(self).__TABLE_FIELDS__
-        self._create_table()
+        if not read_only:
+            self._create_table()
 
     def _create_table(self):
         '''
-        create the current table if not exists
+        create the current table if not exists,
+        add the fields that are missing in tables of older versions,
+        and create the indices of the table
         '''
         self._cursor.execute('''
             CREATE TABLE IF NOT EXISTS %(name)s ( %(fields)s )
@@ -188,6 +521,15 @@ class Table(object):
             'name': self._name,
             'fields': ','.join('%s %s' % (k, v) for (k, v) in self._fields)
         })
+        existing = set(row[1] for row in self._cursor.execute('PRAGMA table_info(%s)' % self._name).fetchall())
+        for (k, v) in self._fields:
+            if k not in existing:
+                self._cursor.execute('ALTER TABLE %s ADD COLUMN %s %s' % (self._name, k, v))
+        for field in type(self).__TABLE_INDICES__:
+            self._cursor.execute('CREATE INDEX IF NOT EXISTS %(name)s_%(field)s ON %(name)s (%(field)s)' % {
+                'name': self._name,
+                'field': field
+            })
         self._connection.commit()
 
     def select(self, to_select, where=None, sql_params=[]):
@@ -255,55 +597,375 @@ class Table(object):
         self._connection.commit()
         return self._cursor.lastrowid
 
+    def _serialize_dict(self, data):
+        '''
+        serializes a dictionary
+
+        :param data: data to serialize
+        '''
+        return zlib.compress(cPickle.dumps(data, protocol=2)).encode('base64')
+
+    def _deserialize_dict(self, data):
+        '''
+        deserializes a dictionary
+
+        :param data: data to deserialize
+        '''
+        return cPickle.loads(zlib.decompress(data.decode('base64')))
+
 
 class ReportsTable(Table):
     '''
-    Table for storing the reports
+    Table for storing the reports.
+    Along with the report itself, a summary of each report is stored in separate
+    fields, so the reports can be filtered and sorted without decoding them
+    (see :func:`~kitty.data.data_manager.ReportsTable.query`).
     '''
 
     __TABLE_NAME__ = 'reports'
+    # new fields should be added at the end, they are added to tables of older versions
     __TABLE_FIELDS__ = [
         ('id', 'INTEGER PRIMARY KEY'),
         ('test_id', 'INT'),
         ('content', 'BLOB'),
+        ('failed', 'INT'),
+        ('reason', 'TEXT'),
+        ('template', 'TEXT'),
+        ('fuzz_path', 'TEXT'),
+        ('timestamp', 'REAL'),
+        ('payload_length', 'INT'),
+        ('bucket', 'INT'),
     ]
+    __TABLE_INDICES__ = ['test_id', 'bucket']
 
-    def __init__(self, connection, cursor):
+    #  Fields of the report summary, reports can be sorted by any of them
+    SUMMARY_FIELDS = ['test_id', 'failed', 'reason', 'template', 'fuzz_path', 'timestamp', 'payload_length', 'bucket']
+    #  Maximal number of free pages to release in a single compaction
+    VACUUM_PAGES = 1000
+
+    def __init__(self, connection, cursor, read_only=False):
         '''
         :param connection: the database connection
         :param cursor: the cursor for the database
+        :param read_only: the connection is read-only, do not create the table (default: False)
+        '''
+        super(ReportsTable, self).__init__(connection, cursor, read_only)
+        self._codec = ReportCodec()
+        self._blobs = BlobsTable(connection, cursor, read_only)
+        self._buckets = BucketsTable(connection, cursor, read_only)
+        self._bucket_keys = None
+        self._max_bucket_reports = None
+        self._retention = None
+        self._archive = None
+
+    def set_failure_buckets(self, keys, max_reports):
+        '''
+        Group the failure reports into buckets by their signature,
+        and keep the full reports only for the first few reports of each bucket.
+
+        :param keys: report keys that make the signature of a failure
+            (see :func:`~kitty.data.data_manager.ReportsTable.find_value`)
+        :param max_reports: number of full reports to keep for each bucket
+        '''
+        self._bucket_keys = keys
+        self._max_bucket_reports = max_reports
+
+    def set_retention(self, max_reports=None, max_age_secs=None, max_bucket_reports=None,
+                      archive=None, archive_max_reports=None):
+        '''
+        Set the retention policy of the reports, which is applied by
+        :func:`~kitty.data.data_manager.ReportsTable.compact`.
+        Reports of failed tests are never removed, only reduced to their summaries.
+
+        :param max_reports: remove the oldest reports of passing tests while there are more reports than this (default: None)
+        :param max_age_secs: remove the reports of passing tests that are older than this (in seconds) (default: None)
+        :param max_bucket_reports: keep the full reports only for the first reports of each failure bucket,
+            the other reports are reduced to their summaries (default: None)
+        :param archive: prefix of the archive files, the removed reports are moved to them,
+            None to drop the removed reports (default: None)
+        :param archive_max_reports: number of reports in an archive file before it is rotated,
+            None for no limit (default: None)
+        '''
+        self.close()
+        self._retention = (max_reports, max_age_secs, max_bucket_reports)
+        if archive:
+            self._archive = ReportsArchive(archive, archive_max_reports)
+
+    def compact(self, batch_size=100):
+        '''
+        Apply the retention policy to a batch of reports, and release the free pages of the database.
+        A batch is small, so the compaction can be done while the session is running,
+        without blocking the other tasks of the data manager for long.
+
+        :param batch_size: maximal number of reports to remove or reduce (default: 100)
+        :return: number of reports that were removed or reduced to their summaries
+        '''
+        if not self._retention:
+            return 0
+        max_reports, max_age_secs, max_bucket_reports = self._retention
+        count = 0
+        if max_age_secs is not None:
+            ids = self._select_ids('failed=0 AND timestamp<?', [time.time() - max_age_secs], batch_size)
+            count += self._remove(ids)
+        if (max_reports is not None) and (count < batch_size):
+            excess = min(self.count() - max_reports, batch_size - count)
+            if excess > 0:
+                count += self._remove(self._select_ids('failed=0', [], excess))
+        if (max_bucket_reports is not None) and (count < batch_size):
+            count += self._reduce_buckets(max_bucket_reports, batch_size - count)
+        if count:
+            self._cursor.execute('PRAGMA incremental_vacuum(%d)' % self.VACUUM_PAGES).fetchall()
+        return count
+
+    def _reduce_buckets(self, max_bucket_reports, limit):
+        '''
+        Reduce the full reports of each failure bucket beyond its first ones,
+        bucket by bucket, using the bucket index
+
+        :param max_bucket_reports: number of full reports to keep in each bucket
+        :param limit: maximal number of reports to reduce
+        :return: number of reduced reports
+        '''
+        where = 'bucket IS NOT NULL AND content IS NOT NULL GROUP BY bucket HAVING COUNT(*)>?'
+        buckets = [row[0] for row in self.select('bucket', where, [max_bucket_reports]).fetchall()]
+        where = '''bucket=? AND content IS NOT NULL AND id NOT IN (
+            SELECT id FROM %s WHERE bucket=? AND content IS NOT NULL ORDER BY id LIMIT ?
+        )''' % self._name
+        count = 0
+        for bucket in buckets:
+            if count >= limit:
+                break
+            count += self._reduce(self._select_ids(where, [bucket, bucket, max_bucket_reports], limit - count))
+        return count
+
+    def _select_ids(self, where, params, limit):
         '''
-        super(ReportsTable, self).__init__(connection, cursor)
+        :return: ids of the oldest reports that match the where clause
+        '''
+        rows = self.select('id', '%s ORDER BY id LIMIT ?' % where, params + [limit]).fetchall()
+        return [row[0] for row in rows]
+
+    def _release(self, ids):
+        '''
+        Archive the reports, and release the blobs that they refer to
+
+        :param ids: ids of the reports
+        '''
+        rows = []
+        for report_id in ids:
+            self.select('*', 'id=?', [report_id])
+            rows.append(self.row_to_dict(self._cursor.fetchone()))
+        if self._archive:
+            self._archive.store(rows, self)
+        for row in rows:
+            if (row['content'] is not None) and self._codec.is_encoded(row['content']):
+                self._blobs.release(self._codec.get_blob_ids(row['content']))
+
+    def _remove(self, ids):
+        '''
+        :param ids: ids of the reports to remove
+        :return: number of removed reports
+        '''
+        self._release(ids)
+        self._cursor.executemany('DELETE FROM %s WHERE id=?' % self._name, [(report_id,) for report_id in ids])
+        self._connection.commit()
+        return len(ids)
+
+    def _reduce(self, ids):
+        '''
+        :param ids: ids of the reports to reduce to their summaries
+        :return: number of reduced reports
+        '''
+        self._release(ids)
+        self._cursor.executemany('UPDATE %s SET content=NULL WHERE id=?' % self._name, [(report_id,) for report_id in ids])
+        self._connection.commit()
+        return len(ids)
+
+    def close(self):
+        '''
+        Close the archive of the reports, if there is one
+        '''
+        if self._archive:
+            self._archive.close()
+            self._archive = None
+
+    def find_value(self, report, key):
+        '''
+        Find a value in a report or in its sub reports.
+        The key may be prefixed with the names of sub reports (e.g. 'target/response (raw)'),
+        otherwise the first sub report that has the key is used.
+
+        :param report: the report
+        :param key: the key to find
+        :return: the value of the key, None if not found
+        '''
+        value = report.get(key)
+        if (value is not None) and (not isinstance(value, Report)):
+            return value
+        for name in sorted(report.get('sub_reports') or []):
+            sub_key = key[len(name) + 1:] if key.startswith(name + '/') else key
+            value = self.find_value(report.get(name), sub_key)
+            if value is not None:
+                return value
+        return None
+
+    def _get_bucket(self, report, test_id):
+        '''
+        :return: tuple of (bucket id, number of reports in the bucket), (None, 0) if the report is not bucketed
+        '''
+        if (not self._bucket_keys) or (not report.is_failed()):
+            return None, 0
+        description = ' | '.join('%s=%r' % (key, self.find_value(report, key)) for key in self._bucket_keys)
+        signature = hashlib.sha1(description).hexdigest()
+        return self._buckets.add(signature, description, test_id)
+
+    def _store_blob(self, data):
+        '''
+        :param data: value of a raw field of a report
+        :return: id of the blob of the value, None if it is too small to be stored as a blob
+        '''
+        if len(data) < BlobsTable.MIN_BLOB_SIZE:
+            return None
+        return self._blobs.put(data)
 
     def store(self, report, test_id):
         '''
+        If failure buckets are set, and the bucket of the report already has enough reports,
+        only the summary of the report is stored.
+
         :param report: the report to store
         :param test_id: the id of the test reported
         :return: report id
         '''
-        report_d = report.to_dict()
-        content = self._serialize_dict(report_d)
+        bucket, bucket_count = self._get_bucket(report, test_id)
+        if (bucket is not None) and (bucket_count > self._max_bucket_reports):
+            content = None
+        else:
+            content = sqlite3.Binary(self._codec.encode(report, self._store_blob))
+        fuzz_path = self._to_text(report.get('fuzz_path'))
+        template = fuzz_path.split('->')[-1] if fuzz_path else None
+        payload = report.get('payload')
+        payload_length = payload.get('length') if isinstance(payload, Report) else None
         report_id = self.insert(
-            ['test_id', 'content'],
-            [test_id, content]
+            ['test_id', 'content', 'failed', 'reason', 'template', 'fuzz_path', 'timestamp', 'payload_length', 'bucket'],
+            [test_id, content, bool(report.is_failed()), self._to_text(self._get_failure_reason(report)),
+             template, fuzz_path, time.time(), payload_length, bucket]
         )
         return report_id
 
-    def get(self, test_id):
+    def _to_text(self, value):
+        '''
+        :param value: value of a summary text field
+        :return: the value as unicode (sqlite does not accept 8-bit byte strings as text)
+        '''
+        if isinstance(value, str):
+            return value.decode('utf-8', 'replace')
+        return value
+
+    def _get_failure_reason(self, report):
+        '''
+        :param report: the report
+        :return: failure reason of the report, or of the first failed sub report that has one
+        '''
+        reason = report.get('failure_reason')
+        if reason:
+            return reason
+        for key in report.get('sub_reports') or []:
+            reason = self._get_failure_reason(report.get(key))
+            if reason:
+                return reason
+        return None
+
+    def get(self, test_id, fields=None):
         '''
         get report by the test id
 
         :param test_id: test id
+        :param fields: names of the top-level fields and sub reports to decode,
+            None to decode all of them (default: None)
         :return: Report object
         '''
-        self.select('*', 'test_id=?', [test_id])
+        self.select('test_id, content, reason, fuzz_path, bucket', 'test_id=?', [test_id])
         row = self._cursor.fetchone()
         if not row:
             raise KeyError('No report with test id %s in the DB' % test_id)
+        return self._decode_row(row, fields)
+
+    def _decode_row(self, row, fields=None):
+        '''
+        :param row: (test_id, content, reason, fuzz_path, bucket) of a report
+        :param fields: names of the fields to decode, None to decode all of them
+        :return: Report object
+        '''
+        test_id, content, reason, fuzz_path, bucket = row
+        if content is None:
+            # only the summary of the report was stored
+            report = Report('summary')
+            report.failed(reason)
+            report.add('test_number', test_id)
+            report.add('fuzz_path', fuzz_path)
+            report.add('bucket', bucket)
+            report.add('bucket first test', self._buckets.get(bucket)['first_test_id'])
+            return report
+        if self._codec.is_encoded(content):
+            return self._codec.decode(content, fields, self._blobs.get)
+        # stored by an older version
+        return Report.from_dict(self._deserialize_dict(content))
 
-        values = self.row_to_dict(row)
-        content = self._deserialize_dict(values['content'])
-        return Report.from_dict(content)
+    def _iter_rows(self, to_select, min_test_id=None, max_test_id=None):
+        '''
+        Iterate over the reports in a test id range, ordered by test id,
+        with a separate cursor, without fetching all of them to memory.
+        '''
+        conditions = ['1']
+        params = []
+        if min_test_id is not None:
+            conditions.append('test_id>=?')
+            params.append(min_test_id)
+        if max_test_id is not None:
+            conditions.append('test_id<=?')
+            params.append(max_test_id)
+        cursor = self._connection.cursor()
+        cursor.execute('SELECT %s FROM %s WHERE %s ORDER BY test_id, id' % (to_select, self._name, ' AND '.join(conditions)), params)
+        while True:
+            rows = cursor.fetchmany(100)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+
+    def iter_reports(self, min_test_id=None, max_test_id=None, fields=None):
+        '''
+        Iterate over the stored reports, ordered by test id.
+
+        :param min_test_id: first test id (default: None)
+        :param max_test_id: last test id (default: None)
+        :param fields: names of the top-level fields and sub reports to decode,
+            None to decode all of them (default: None)
+        :return: generator of (report summary (dict), Report object)
+        '''
+        for summary, content in self._iter_summaries(min_test_id, max_test_id, True):
+            row = (summary['test_id'], content, summary['reason'], summary['fuzz_path'], summary['bucket'])
+            yield summary, self._decode_row(row, fields)
+
+    def iter_summaries(self, min_test_id=None, max_test_id=None):
+        '''
+        Iterate over the summaries of the stored reports, ordered by test id.
+
+        :param min_test_id: first test id (default: None)
+        :param max_test_id: last test id (default: None)
+        :return: generator of report summaries (dict)
+        '''
+        for summary, _ in self._iter_summaries(min_test_id, max_test_id, False):
+            yield summary
+
+    def _iter_summaries(self, min_test_id, max_test_id, with_content):
+        fields = ReportsTable.SUMMARY_FIELDS
+        to_select = fields + ['content'] if with_content else fields
+        for row in self._iter_rows(','.join(to_select), min_test_id, max_test_id):
+            summary = dict(zip(fields, row))
+            summary['failed'] = bool(summary['failed'])
+            yield summary, row[len(fields)] if with_content else None
 
     def get_report_test_ids(self):
         '''
@@ -315,21 +977,365 @@ class ReportsTable(Table):
             res.append(row[0])
         return res
 
-    def _serialize_dict(self, data):
+    def count(self):
         '''
-        serializes a dictionary
+        :return: number of stored reports
+        '''
+        self.select('COUNT(*)')
+        return self._cursor.fetchone()[0]
 
-        :param data: data to serialize
+    def get_blobs_manager(self):
         '''
-        return zlib.compress(cPickle.dumps(data, protocol=2)).encode('base64')
+        :rtype: :class:`~kitty.data.data_manager.BlobsTable`
+        :return: blobs manager
+        '''
+        return self._blobs
 
-    def _deserialize_dict(self, data):
+    def get_buckets_manager(self):
         '''
-        deserializes a dictionary
+        :rtype: :class:`~kitty.data.data_manager.BucketsTable`
+        :return: failure buckets manager
+        '''
+        return self._buckets
 
-        :param data: data to deserialize
+    def query(self, failed=None, reason=None, template=None, min_test_id=None, max_test_id=None,
+              bucket=None, sort='test_id', offset=0, limit=100):
         '''
-        return cPickle.loads(zlib.decompress(data.decode('base64')))
+        Query the summaries of the stored reports, without decoding the reports.
+
+        :param failed: only failed (True) or not failed (False) reports, None for both (default: None)
+        :param reason: only reports with failure reason that contains this string (default: None)
+        :param template: only reports of this template (default: None)
+        :param min_test_id: only reports with test id >= min_test_id (default: None)
+        :param max_test_id: only reports with test id <= max_test_id (default: None)
+        :param bucket: only reports of this failure bucket (default: None)
+        :param sort: summary field to sort by, prefixed with '-' for descending order (default: 'test_id')
+        :param offset: number of matching reports to skip (default: 0)
+        :param limit: maximal number of summaries to return (default: 100)
+        :return: tuple of (number of matching reports, list of report summaries (dict))
+
+        :example:
+
+            ::
+
+                total, summaries = reports.query(failed=True, sort='-timestamp', limit=20)
+        '''
+        conditions = []
+        params = []
+        if failed is not None:
+            conditions.append('failed=?')
+            params.append(bool(failed))
+        if reason is not None:
+            conditions.append('instr(reason, ?) > 0')
+            params.append(reason)
+        if template is not None:
+            conditions.append('template=?')
+            params.append(template)
+        if min_test_id is not None:
+            conditions.append('test_id>=?')
+            params.append(min_test_id)
+        if max_test_id is not None:
+            conditions.append('test_id<=?')
+            params.append(max_test_id)
+        if bucket is not None:
+            conditions.append('bucket=?')
+            params.append(bucket)
+        where = ' AND '.join(conditions)
+        order = 'DESC' if sort.startswith('-') else 'ASC'
+        sort = sort.lstrip('-')
+        if sort not in ReportsTable.SUMMARY_FIELDS:
+            raise KittyException('cannot sort reports by %s' % sort)
+        total = self.select('COUNT(*)', where, params).fetchone()[0]
+        fields = ReportsTable.SUMMARY_FIELDS
+        query = '%s ORDER BY %s %s, id %s LIMIT ? OFFSET ?' % (where or '1', sort, order, order)
+        rows = self.select(','.join(fields), query, params + [limit, offset]).fetchall()
+        summaries = []
+        for row in rows:
+            summary = dict(zip(fields, row))
+            summary['failed'] = bool(summary['failed'])
+            summaries.append(summary)
+        return total, summaries
+
+
+class BlobsTable(Table):
+    '''
+    Content-addressed store for the raw data of the reports (payloads, requests, responses),
+    so each unique value is stored once, regardless of the number of reports that contain it.
+    Each blob counts the reports that refer to it, and it is removed when they are all removed.
+    '''
+
+    __TABLE_NAME__ = 'blobs'
+    # new fields should be added at the end, they are added to tables of older versions
+    __TABLE_FIELDS__ = [
+        ('digest', 'TEXT PRIMARY KEY'),
+        ('content', 'BLOB'),
+        ('refs', 'INT'),
+    ]
+
+    #  Minimal size of a value to be stored as a blob, smaller values are stored in the report
+    MIN_BLOB_SIZE = 64
+
+    def put(self, data):
+        '''
+        :param data: the data to store
+        :return: the digest of the data, which is the id of its blob
+        '''
+        digest = hashlib.sha256(data).hexdigest()
+        self._cursor.execute(
+            'INSERT OR IGNORE INTO %s (digest, content, refs) VALUES (?, ?, 0)' % self._name,
+            (digest, sqlite3.Binary(data))
+        )
+        self._cursor.execute('UPDATE %s SET refs=refs+1 WHERE digest=?' % self._name, (digest,))
+        self._connection.commit()
+        return digest
+
+    def release(self, digests):
+        '''
+        Release a reference to each of the blobs, and remove the blobs that are no longer referred to.
+        Blobs that were stored by an older version are not counted, and never removed.
+
+        :param digests: digests of the blobs
+        '''
+        if not digests:
+            return
+        params = [(digest,) for digest in digests]
+        self._cursor.executemany('UPDATE %s SET refs=refs-1 WHERE digest=?' % self._name, params)
+        self._cursor.executemany('DELETE FROM %s WHERE digest=? AND refs<=0' % self._name, params)
+        self._connection.commit()
+
+    def get(self, digest):
+        '''
+        :param digest: digest of the data
+        :return: the stored data
+        '''
+        self.select('content', 'digest=?', [digest])
+        row = self._cursor.fetchone()
+        if not row:
+            raise KeyError('No blob with digest %s in the DB' % digest)
+        return str(row[0])
+
+    def iter_blobs(self):
+        '''
+        Iterate over the stored blobs, without fetching all of them to memory.
+
+        :return: generator of (digest, content)
+        '''
+        cursor = self._connection.cursor()
+        cursor.execute('SELECT digest, content FROM %s ORDER BY digest' % self._name)
+        while True:
+            rows = cursor.fetchmany(100)
+            if not rows:
+                break
+            for digest, content in rows:
+                yield digest, str(content)
+
+
+class ReportsArchive(object):
+    '''
+    Archive of the reports that were removed from the session by the retention policy
+    (see :func:`~kitty.data.data_manager.ReportsTable.set_retention`).
+    The archive files are session files that contain only the reports
+    (with their blobs and failure buckets), so they can be read, and exported,
+    like the session file itself.
+    When an archive file has enough reports, it is rotated,
+    and the next reports are archived in a new file.
+    '''
+
+    def __init__(self, prefix, max_reports=None):
+        '''
+        :param prefix: prefix of the archive files, a file number is appended to it
+        :param max_reports: number of reports in an archive file before it is rotated,
+            None for no limit (default: None)
+        '''
+        self._prefix = prefix
+        self._max_reports = max_reports
+        self._number = 0
+        while os.path.exists(self.get_filename(self._number + 1)):
+            self._number += 1
+        self._connection = None
+        self._reports = None
+        self._count = 0
+
+    def get_filename(self, number):
+        '''
+        :param number: number of the archive file
+        :return: name of the archive file
+        '''
+        return '%s.%d' % (self._prefix, number)
+
+    def _open(self):
+        connection = sqlite3.connect(self.get_filename(self._number))
+        self._connection = _GroupCommitConnection(connection)
+        self._reports = ReportsTable(self._connection, self._connection.cursor())
+        self._count = self._reports.count()
+
+    def store(self, rows, reports):
+        '''
+        :param rows: rows of the archived reports (dict)
+        :type reports: :class:`~kitty.data.data_manager.ReportsTable`
+        :param reports: the reports table that the rows are removed from
+        '''
+        while rows:
+            if self._connection is None:
+                self._open()
+            space = len(rows)
+            if self._max_reports:
+                space = min(space, self._max_reports - self._count)
+            if space <= 0:
+                self.close()
+                self._number += 1
+                continue
+            self._connection.begin_batch()
+            try:
+                for row in rows[:space]:
+                    self._store_row(row, reports)
+            finally:
+                self._connection.end_batch()
+            rows = rows[space:]
+
+    def _store_row(self, row, reports):
+        codec = reports._codec
+        if (row['content'] is not None) and codec.is_encoded(row['content']):
+            for digest in codec.get_blob_ids(row['content']):
+                self._reports.get_blobs_manager().put(reports.get_blobs_manager().get(digest))
+        if row['bucket'] is not None:
+            self._insert(self._reports.get_buckets_manager(), reports.get_buckets_manager().get(row['bucket']))
+        self._insert(self._reports, row)
+        self._count += 1
+
+    def _insert(self, table, row):
+        fields = sorted(row.keys())
+        self._connection.execute(
+            'INSERT OR REPLACE INTO %s (%s) VALUES (%s)' % (table._name, ','.join(fields), ','.join('?' * len(fields))),
+            [row[k] for k in fields]
+        )
+        self._connection.commit()
+
+    def close(self):
+        '''
+        Close the current archive file
+        '''
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+            self._reports = None
+
+
+class BucketsTable(Table):
+    '''
+    Table of failure buckets - groups of failure reports with the same signature
+    '''
+
+    __TABLE_NAME__ = 'buckets'
+    __TABLE_FIELDS__ = [
+        ('id', 'INTEGER PRIMARY KEY'),
+        ('signature', 'TEXT UNIQUE'),
+        ('description', 'TEXT'),
+        ('first_test_id', 'INT'),
+        ('count', 'INT'),
+    ]
+
+    def add(self, signature, description, test_id):
+        '''
+        Add a report to the bucket of its signature, create the bucket if needed
+
+        :param signature: signature of the failure
+        :param description: description of the signature
+        :param test_id: id of the failed test
+        :return: tuple of (bucket id, number of reports in the bucket)
+        '''
+        self.select('id, count', 'signature=?', [signature])
+        row = self._cursor.fetchone()
+        if row:
+            bucket_id, count = row[0], row[1] + 1
+            self.update({'count': count}, 'id=%d' % bucket_id)
+        else:
+            count = 1
+            bucket_id = self.insert(
+                ['signature', 'description', 'first_test_id', 'count'],
+                [signature, description, test_id, count]
+            )
+        return bucket_id, count
+
+    def get(self, bucket_id):
+        '''
+        :param bucket_id: id of the bucket
+        :return: the bucket (dict)
+        '''
+        self.select('*', 'id=?', [bucket_id])
+        row = self._cursor.fetchone()
+        if not row:
+            raise KeyError('No bucket with id %s in the DB' % bucket_id)
+        return self.row_to_dict(row)
+
+    def get_buckets(self, offset=0, limit=100):
+        '''
+        :param offset: number of buckets to skip (default: 0)
+        :param limit: maximal number of buckets to return (default: 100)
+        :return: tuple of (number of buckets, list of buckets (dict), largest first)
+        '''
+        total = self.select('COUNT(*)').fetchone()[0]
+        rows = self.select('*', '1 ORDER BY count DESC, id LIMIT ? OFFSET ?', [limit, offset]).fetchall()
+        return total, [self.row_to_dict(row) for row in rows]
+
+
+class TestSummariesTable(Table):
+    '''
+    Table with a compact summary of each test, with a fixed set of fields,
+    for analysis of all the tests without storing all the reports
+    '''
+
+    __TABLE_NAME__ = 'test_summaries'
+    __TABLE_FIELDS__ = [
+        ('test_id', 'INTEGER PRIMARY KEY'),
+        ('start_time', 'REAL'),
+        ('stop_time', 'REAL'),
+        ('transmit_latency', 'REAL'),
+        ('response_length', 'INT'),
+        ('response_digest', 'TEXT'),
+        ('failed', 'INT'),
+    ]
+
+    def store_batch(self, summaries):
+        '''
+        Store a batch of test summaries in a single statement.
+        A summary of a test that was already stored (e.g. in a resumed session) is replaced.
+
+        :param summaries: list of tuples, with the values of the table fields
+        '''
+        self._cursor.executemany(
+            'INSERT OR REPLACE INTO %s VALUES (%s)' % (self._name, ','.join('?' * len(self._fields))),
+            summaries
+        )
+        self._connection.commit()
+
+    def iter_summaries(self, min_test_id=None, max_test_id=None):
+        '''
+        Iterate over the test summaries, ordered by test id,
+        without fetching all of them to memory.
+
+        :param min_test_id: first test id (default: None)
+        :param max_test_id: last test id (default: None)
+        :return: generator of test summaries (dict)
+        '''
+        conditions = ['1']
+        params = []
+        if min_test_id is not None:
+            conditions.append('test_id>=?')
+            params.append(min_test_id)
+        if max_test_id is not None:
+            conditions.append('test_id<=?')
+            params.append(max_test_id)
+        cursor = self._connection.cursor()
+        cursor.execute('SELECT * FROM %s WHERE %s ORDER BY test_id' % (self._name, ' AND '.join(conditions)), params)
+        while True:
+            rows = cursor.fetchmany(100)
+            if not rows:
+                break
+            for row in rows:
+                summary = self.row_to_dict(row)
+                summary['failed'] = bool(summary['failed'])
+                yield summary
 
 
 class SessionInfoTable(Table):
@@ -348,12 +1354,13 @@ class SessionInfoTable(Table):
         ('data_model_hash', 'INT')
     ]
 
-    def __init__(self, connection, cursor):
+    def __init__(self, connection, cursor, read_only=False):
         '''
         :param connection: the database connection
         :param cursor: the cursor for the database
+        :param read_only: the connection is read-only, do not create the table (default: False)
         '''
-        super(SessionInfoTable, self).__init__(connection, cursor)
+        super(SessionInfoTable, self).__init__(connection, cursor, read_only)
         self.info = self.read_info()
 
     def read_info(self):
@@ -397,6 +1404,41 @@ class SessionInfoTable(Table):
             return None
 
 
+class ModelStateTable(Table):
+    '''
+    Table for storing a snapshot of the model state,
+    to restore the model without replaying its mutations
+    '''
+
+    __TABLE_NAME__ = 'model_state'
+    __TABLE_FIELDS__ = [
+        ('id', 'INTEGER PRIMARY KEY'),
+        ('content', 'BLOB'),
+    ]
+
+    def set_state(self, state):
+        '''
+        :type state: dict
+        :param state: the model state to store (replaces the stored state)
+        '''
+        content = self._serialize_dict(state)
+        self.select('id')
+        if self._cursor.fetchone():
+            self.update({'content': content})
+        else:
+            self.insert(['content'], [content])
+
+    def get_state(self):
+        '''
+        :return: the stored model state, None if there is no stored state
+        '''
+        self.select('content')
+        row = self._cursor.fetchone()
+        if not row:
+            return None
+        return self._deserialize_dict(row[0])
+
+
 class SessionInfo(object):
     '''
     session information manager
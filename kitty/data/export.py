@@ -0,0 +1,205 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+'''
+Offline export of the data of a fuzzing session, directly from the session file.
+'''
+import os
+import json
+import sqlite3
+from kitty.core import KittyException
+from kitty.data.data_manager import ReportsTable, TestSummariesTable
+
+
+def _dumps(obj):
+    '''
+    :return: JSON line of the object, strings that are not UTF-8 are decoded as latin-1
+    '''
+    try:
+        return json.dumps(obj)
+    except UnicodeDecodeError:
+        return json.dumps(obj, encoding='latin-1')
+
+
+class SessionExporter(object):
+    '''
+    Exports the reports, the report summaries and the payload blobs of a session file.
+    The session file is opened read-only, so it can be exported while the fuzzer runs,
+    and the data is streamed, so the memory usage does not depend on the session size.
+    Large sessions can be exported in parallel, by several exporters,
+    each exporting a different test id range (see
+    :func:`~kitty.data.export.SessionExporter.get_ranges`).
+
+    :example:
+
+        ::
+
+            exporter = SessionExporter('fuzz_session.sqlite')
+            with open('reports.jsonl', 'w') as f:
+                exporter.export_reports(f)
+            exporter.export_summary_columns('summaries')
+            exporter.close()
+    '''
+
+    def __init__(self, dbname):
+        '''
+        :param dbname: name of the session file
+        '''
+        if not os.path.exists(dbname):
+            raise KittyException('session file %s does not exist' % dbname)
+        self._connection = sqlite3.connect(dbname)
+        self._connection.execute('PRAGMA query_only=1')
+        self._reports = ReportsTable(self._connection, self._connection.cursor(), read_only=True)
+        self._test_summaries = TestSummariesTable(self._connection, self._connection.cursor(), read_only=True)
+
+    def close(self):
+        '''
+        close the session file
+        '''
+        self._connection.close()
+
+    def get_ranges(self, num_ranges, test_summaries=False):
+        '''
+        Split the test ids of the reports (or of the test summaries)
+        into ranges with similar number of entries
+
+        :param num_ranges: number of ranges
+        :param test_summaries: split the test summaries instead of the reports (default: False)
+        :return: list of (min test id, max test id)
+        '''
+        table = TestSummariesTable.__TABLE_NAME__ if test_summaries else ReportsTable.__TABLE_NAME__
+        cursor = self._connection.cursor()
+        cursor.execute('SELECT COUNT(*) FROM %s' % table)
+        count = cursor.fetchone()[0]
+        if not count:
+            return []
+        num_ranges = min(num_ranges, count)
+        bounds = []
+        for i in range(num_ranges):
+            offset = count * i // num_ranges
+            cursor.execute('SELECT test_id FROM %s ORDER BY test_id LIMIT 1 OFFSET ?' % table, (offset,))
+            bounds.append(cursor.fetchone()[0])
+        cursor.execute('SELECT MAX(test_id) FROM %s' % table)
+        last = cursor.fetchone()[0]
+        ranges = []
+        for i, low in enumerate(bounds):
+            high = bounds[i + 1] - 1 if i + 1 < len(bounds) else last
+            if high >= low:
+                ranges.append((low, high))
+        return ranges
+
+    def export_reports(self, out, min_test_id=None, max_test_id=None):
+        '''
+        Export the reports as JSON lines, each line is the summary of the report,
+        with the report (base64 encoded, as in the web API) under 'report'.
+
+        :param out: file object to write to
+        :param min_test_id: first test id to export (default: None)
+        :param max_test_id: last test id to export (default: None)
+        :return: number of exported reports
+        '''
+        count = 0
+        for summary, report in self._reports.iter_reports(min_test_id, max_test_id):
+            summary['report'] = report.to_dict('base64')
+            out.write(_dumps(summary) + '\n')
+            count += 1
+        return count
+
+    def export_summaries(self, out, min_test_id=None, max_test_id=None):
+        '''
+        Export the report summaries as JSON lines, without decoding the reports.
+
+        :param out: file object to write to
+        :param min_test_id: first test id to export (default: None)
+        :param max_test_id: last test id to export (default: None)
+        :return: number of exported summaries
+        '''
+        count = 0
+        for summary in self._reports.iter_summaries(min_test_id, max_test_id):
+            out.write(_dumps(summary) + '\n')
+            count += 1
+        return count
+
+    def export_summary_columns(self, directory, min_test_id=None, max_test_id=None):
+        '''
+        Export the report summaries in columnar layout - a file for each summary field,
+        with a JSON value per line, all the files have the same row order.
+
+        :param directory: directory to write the column files to (created if needed)
+        :param min_test_id: first test id to export (default: None)
+        :param max_test_id: last test id to export (default: None)
+        :return: number of exported summaries
+        '''
+        summaries = self._reports.iter_summaries(min_test_id, max_test_id)
+        return self._write_columns(directory, ReportsTable.SUMMARY_FIELDS, summaries)
+
+    def export_test_summaries(self, out, min_test_id=None, max_test_id=None):
+        '''
+        Export the test summaries (see :func:`~kitty.fuzzers.base.BaseFuzzer.set_store_test_summaries`)
+        as JSON lines.
+
+        :param out: file object to write to
+        :param min_test_id: first test id to export (default: None)
+        :param max_test_id: last test id to export (default: None)
+        :return: number of exported summaries
+        '''
+        count = 0
+        for summary in self._test_summaries.iter_summaries(min_test_id, max_test_id):
+            out.write(_dumps(summary) + '\n')
+            count += 1
+        return count
+
+    def export_test_summary_columns(self, directory, min_test_id=None, max_test_id=None):
+        '''
+        Export the test summaries in columnar layout (see
+        :func:`~kitty.data.export.SessionExporter.export_summary_columns`).
+
+        :param directory: directory to write the column files to (created if needed)
+        :param min_test_id: first test id to export (default: None)
+        :param max_test_id: last test id to export (default: None)
+        :return: number of exported summaries
+        '''
+        fields = [k for (k, _) in TestSummariesTable.__TABLE_FIELDS__]
+        summaries = self._test_summaries.iter_summaries(min_test_id, max_test_id)
+        return self._write_columns(directory, fields, summaries)
+
+    def _write_columns(self, directory, fields, rows):
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        files = dict((k, open(os.path.join(directory, '%s.jsonl' % k), 'w')) for k in fields)
+        count = 0
+        try:
+            for row in rows:
+                for k in fields:
+                    files[k].write(_dumps(row[k]) + '\n')
+                count += 1
+        finally:
+            for f in files.values():
+                f.close()
+        return count
+
+    def export_blobs(self, out):
+        '''
+        Export the payload blobs as JSON lines of digest and (base64 encoded) content.
+
+        :param out: file object to write to
+        :return: number of exported blobs
+        '''
+        count = 0
+        for digest, content in self._reports.get_blobs_manager().iter_blobs():
+            out.write(_dumps({'digest': digest, 'content': content.encode('base64')}) + '\n')
+            count += 1
+        return count
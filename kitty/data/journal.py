@@ -0,0 +1,109 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+'''
+A journal of the session progress between checkpoints of the session info.
+'''
+import os
+from threading import Lock
+
+
+class SessionJournal(object):
+    '''
+    An append-only file, next to the session file, with a line for each test
+    since the last checkpoint of the session info.
+    Appending a line is a buffered write, without a commit or fsync,
+    so it is much cheaper than storing the session info in the database,
+    and it survives a crash of the fuzzer process.
+    After each checkpoint, the journal is truncated up to its position
+    when the checkpoint was taken, so the entries that were appended
+    while the checkpoint was stored are kept.
+    '''
+
+    def __init__(self, filename):
+        '''
+        :param filename: name of the journal file
+        '''
+        self._filename = filename
+        self._lock = Lock()
+        self._file = open(filename, 'a')
+        # number of bytes that were removed from the start of the journal
+        self._removed = 0
+
+    def append(self, info):
+        '''
+        :type info: :class:`~kitty.data.data_manager.SessionInfo`
+        :param info: current session info
+        '''
+        with self._lock:
+            self._file.write('%d %d\n' % (info.current_index, info.failure_count))
+            self._file.flush()
+
+    def position(self):
+        '''
+        :return: position after the last entry of the journal, to truncate up to (see truncate)
+        '''
+        with self._lock:
+            return self._removed + os.fstat(self._file.fileno()).st_size
+
+    def truncate(self, position=None):
+        '''
+        Remove the entries from the journal (called after a checkpoint)
+
+        :param position: remove only the entries before this position (see position),
+            None to remove all the entries (default: None)
+        '''
+        with self._lock:
+            size = os.fstat(self._file.fileno()).st_size
+            if position is None:
+                count = size
+            else:
+                count = min(position - self._removed, size)
+            if count <= 0:
+                return
+            with open(self._filename, 'r') as f:
+                f.seek(count)
+                rest = f.read()
+            self._file.seek(0)
+            self._file.truncate()
+            self._file.write(rest)
+            self._file.flush()
+            self._removed += count
+
+    def read(self):
+        '''
+        :return: tuple of (current_index, failure_count) of the last entry, None if the journal is empty
+        '''
+        with self._lock:
+            if not os.path.exists(self._filename):
+                return None
+            last = None
+            with open(self._filename, 'r') as f:
+                for line in f:
+                    # the last line may be partial if the fuzzer crashed while writing it
+                    if line.endswith('\n'):
+                        last = line
+            if last is None:
+                return None
+            current_index, failure_count = (int(x) for x in last.split())
+            return current_index, failure_count
+
+    def close(self):
+        '''
+        Close the journal file
+        '''
+        with self._lock:
+            self._file.close()
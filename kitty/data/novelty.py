@@ -0,0 +1,88 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+'''
+Tracking of the responses of the target, to detect responses that were not seen before.
+'''
+import hashlib
+import struct
+from kitty.core import KittyException
+
+
+class ResponseIndex(object):
+    '''
+    A compact index of response fingerprints.
+    The fingerprint of a response is made of its length bucket
+    (the bit length of its length) and a digest of its content.
+    The fingerprints are stored in a bloom filter, so the memory of the index
+    is bounded, regardless of the number of responses.
+    As in any bloom filter, some new responses might be considered as seen
+    (false positives), but a seen response will never be considered new.
+
+    :example:
+
+        ::
+
+            index = ResponseIndex()
+            fingerprint, novel = index.add(response)
+    '''
+
+    def __init__(self, size_bits=20, num_hashes=4):
+        '''
+        :param size_bits: log2 of the number of bits in the index (default: 20, i.e. 128KB)
+        :param num_hashes: number of bits to set for each fingerprint (default: 4)
+        '''
+        if not (8 <= size_bits <= 32):
+            raise KittyException('size_bits (%d) not in range [8, 32]' % size_bits)
+        if not (1 <= num_hashes <= 5):
+            raise KittyException('num_hashes (%d) not in range [1, 5]' % num_hashes)
+        self._mask = (1 << size_bits) - 1
+        self._num_hashes = num_hashes
+        self._bits = bytearray(1 << (size_bits - 3))
+        self._count = 0
+
+    def fingerprint(self, response):
+        '''
+        :param response: the response
+        :return: fingerprint of the response
+        '''
+        return '%02x:%s' % (len(response).bit_length(), hashlib.md5(response).hexdigest()[:16])
+
+    def add(self, response):
+        '''
+        Add a response to the index.
+
+        :param response: the response
+        :return: tuple of (fingerprint, True if the response was not seen before)
+        '''
+        fingerprint = self.fingerprint(response)
+        words = struct.unpack('>5I', hashlib.sha1(fingerprint).digest())
+        novel = False
+        for word in words[:self._num_hashes]:
+            bit = word & self._mask
+            byte_idx, bit_mask = bit >> 3, 1 << (bit & 7)
+            if not (self._bits[byte_idx] & bit_mask):
+                self._bits[byte_idx] |= bit_mask
+                novel = True
+        if novel:
+            self._count += 1
+        return fingerprint, novel
+
+    def count(self):
+        '''
+        :return: number of unique responses that were added to the index
+        '''
+        return self._count
@@ -30,7 +30,23 @@ provides payloads to some server stack in a client fuzzing session.
 :class:`~kitty.fuzzers.server.ServerFuzzer` should be used when the fuzzer
 instantiates the communication, in cases such as fuzzing a server of some sort
 or when writing payloads to files.
+
+:class:`~kitty.fuzzers.parallel.ParallelServerFuzzer` should be used instead of
+:class:`~kitty.fuzzers.server.ServerFuzzer` to fuzz multiple targets in parallel,
+and :class:`~kitty.fuzzers.parallel.ConcurrentServerFuzzer` to keep multiple
+tests in flight against stateless network services.
+:class:`~kitty.fuzzers.distributed.DistributedServerFuzzer` coordinates
+a session between :class:`~kitty.fuzzers.distributed.DistributedWorker` objects
+on other hosts.
+
+The delay between tests is decided by a rate controller
+(:class:`~kitty.fuzzers.rate.RateController`),
+such as :class:`~kitty.fuzzers.rate.AimdRateController`,
+which adapts the rate of the tests to the responsiveness of the target.
 '''
 from kitty.fuzzers.base import BaseFuzzer
 from kitty.fuzzers.client import ClientFuzzer
 from kitty.fuzzers.server import ServerFuzzer
+from kitty.fuzzers.parallel import ParallelServerFuzzer, ConcurrentServerFuzzer
+from kitty.fuzzers.rate import RateController, AimdRateController
+from kitty.fuzzers.distributed import DistributedServerFuzzer, DistributedWorker
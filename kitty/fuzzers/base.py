@@ -15,25 +15,56 @@
 # You should have received a copy of the GNU General Public License
 # along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
 import sys
+import hashlib
+import logging
 import time
 import traceback
 import shlex
 import docopt
-from threading import Event
+from collections import deque
+from threading import Event, Lock
 from kitty.core import KittyException, KittyObject
 from kitty.data.data_manager import DataManager, SessionInfo, DataManagerTask
+from kitty.data.journal import SessionJournal
+from kitty.data.novelty import ResponseIndex
 from kitty.data.report import Report
 from pkg_resources import get_distribution
 
 
 class _Configuration:
 
-    def __init__(self, delay_secs, store_all_reports, session_file_name, max_failures):
+    def __init__(self, delay_secs, store_all_reports, session_file_name, max_failures, shard, rate_controller,
+                 checkpoint_tests, checkpoint_secs, model_snapshots, failure_buckets, test_summaries,
+                 report_retention, payload_history):
         self.delay_secs = delay_secs
+        self.payload_history = payload_history
+        self.report_retention = report_retention
+        self.test_summaries = test_summaries
+        self.rate_controller = rate_controller
+        self.checkpoint_tests = checkpoint_tests
+        self.checkpoint_secs = checkpoint_secs
+        self.model_snapshots = model_snapshots
+        self.failure_buckets = failure_buckets
         self.store_all_reports = store_all_reports
         self.session_file_name = session_file_name
         self.max_failures = max_failures
+        self.shard = shard
+
+
+def _get_store_report_task(report, test_id, logger):
+    '''
+    :return: data manager task that stores a report,
+        with the serialization of the report done in the data manager context
+    '''
+    def store_report_task(dataman):
+        try:
+            dataman.get_reports_manager().store(report, test_id)
+        except Exception as e:
+            logger.error('Error occurred while storing report of test %d: %s', test_id, repr(e))
+            logger.error(traceback.format_exc())
+    return DataManagerTask(store_report_task)
 
 
 def _get_current_version():
@@ -48,6 +79,9 @@ class BaseFuzzer(KittyObject):
     This class should not be instantiated, only subclassed.
     '''
 
+    #  Maximal time to wait for the results of a data manager task (in seconds)
+    DATA_MANAGER_TIMEOUT = 60
+
     def __init__(self, name='', logger=None, option_line=None):
         '''
         :param name: name of the object
@@ -64,6 +98,15 @@ class BaseFuzzer(KittyObject):
             store_all_reports=False,
             session_file_name=None,
             max_failures=None,
+            shard=None,
+            rate_controller=None,
+            checkpoint_tests=1,
+            checkpoint_secs=None,
+            model_snapshots=False,
+            failure_buckets=None,
+            test_summaries=None,
+            report_retention=None,
+            payload_history=None,
         )
         # user interface
         self.user_interface = None
@@ -72,9 +115,28 @@ class BaseFuzzer(KittyObject):
         # event to implement pause / continue
         self._continue_event = Event()
         self._continue_event.set()
+        # protects the model state from the test info provider,
+        # held when the model is mutated and when its templates are rendered
+        self._model_lock = Lock()
         self._fuzz_path = None
         self._fuzz_node = None
         self._last_payload = None
+        self._payload_history = None
+        self._response_index = ResponseIndex()
+        self._response_fingerprints = []
+        self._test_start_time = None
+        self._transmit_latency = None
+        self._response_length = 0
+        self._response_digest = None
+        self._test_summaries = []
+        self._journal = None
+        self._tests_since_checkpoint = 0
+        self._tests_since_snapshot = 0
+        self._last_checkpoint_time = 0
+        self._tests_since_compaction = 0
+        self._test_done = False
+        # set when the fuzzer is stopped by a signal, which may interrupt the main thread while it holds the model lock
+        self._signaled = False
         self._handle_options(option_line)
 
     def _handle_options(self, option_line):
@@ -91,12 +153,15 @@ class BaseFuzzer(KittyObject):
 
             Usage:
                 fuzzer [--session=<session-file>] [--start=<start-index>] [--end=<end-index>] [--delay=<delay>]
+                       [--shard=<shard>] [--shard-strategy=<strategy>]
 
             Options:
                 -d --delay <delay>              delay between tests in secodes, float number
                 -e --end <end-index>            fuzzing end index, ignored if session-file loaded
                 -f --session <session-file>     session file name to use
                 -s --start <start-index>        fuzzing start index, ignored if session-file loaded
+                --shard <shard>                 fuzz only a shard of the model, in the format <shard-id>/<shard-count>
+                --shard-strategy <strategy>     how to partition the model, stride or block [default: stride]
                 '''
             options = docopt.docopt(usage, shlex.split(option_line))
             s = options['--start']
@@ -111,6 +176,13 @@ class BaseFuzzer(KittyObject):
             delay = options['--delay']
             if delay is not None:
                 self.set_delay_between_tests(float(delay))
+            shard = options['--shard']
+            if shard is not None:
+                try:
+                    shard_id, num_shards = (int(x) for x in shard.split('/'))
+                except ValueError:
+                    raise KittyException('invalid shard format (%s), should be <shard-id>/<shard-count>' % shard)
+                self.set_shard(num_shards, shard_id, options['--shard-strategy'])
 
     def set_delay_duration(self, delay_duration):
         '''
@@ -128,6 +200,18 @@ class BaseFuzzer(KittyObject):
         self.config.delay_secs = delay_secs
         return self
 
+    def set_rate_controller(self, rate_controller):
+        '''
+        Set a rate controller to decide the delay between tests,
+        instead of the fixed delay of
+        :func:`~kitty.fuzzers.base.BaseFuzzer.set_delay_between_tests`
+
+        :type rate_controller: :class:`~kitty.fuzzers.rate.RateController`
+        :param rate_controller: the rate controller (None for a fixed delay)
+        '''
+        self.config.rate_controller = rate_controller
+        return self
+
     def set_store_all_reports(self, store_all_reports):
         '''
         :param store_all_reports: should all reports be stored
@@ -135,6 +219,91 @@ class BaseFuzzer(KittyObject):
         self.config.store_all_reports = store_all_reports
         return self
 
+    def set_failure_buckets(self, keys=None, max_reports=10):
+        '''
+        Group the failure reports into buckets by a signature of the failure,
+        and store the full reports only for the first few failures of each bucket.
+        The other failures are stored as summaries, that refer to their bucket.
+
+        :param keys: report keys that make the signature of a failure, e.g. failure reason,
+            stack hash that a monitor reports, or the response fingerprint (default: None, which means ['failure_reason'])
+        :param max_reports: number of full reports to store for each bucket (default: 10)
+
+        :example:
+
+            ::
+
+                fuzzer.set_failure_buckets(['failure_reason', 'controller/stack_hash'], max_reports=5)
+        '''
+        if max_reports < 1:
+            raise KittyException('number of reports per bucket (%d) < 1' % max_reports)
+        if keys is None:
+            keys = ['failure_reason']
+        self.config.failure_buckets = (list(keys), max_reports)
+        return self
+
+    def set_store_test_summaries(self, store=True, batch_size=100):
+        '''
+        Store a compact summary of each test in the session file:
+        start and stop times, transmit latency, response length and digest, and failure status.
+        The summaries are stored in batches, so they cost much less than storing all the reports
+        (see :func:`~kitty.fuzzers.base.BaseFuzzer.set_store_all_reports`).
+
+        :param store: should the test summaries be stored (default: True)
+        :param batch_size: number of summaries to store at once (default: 100)
+        '''
+        if batch_size < 1:
+            raise KittyException('test summaries batch size (%d) < 1' % batch_size)
+        self.config.test_summaries = batch_size if store else None
+        return self
+
+    def set_report_retention(self, max_reports=None, max_age_secs=None, max_bucket_reports=None,
+                             archive=None, archive_max_reports=None, interval=100, batch_size=100):
+        '''
+        Limit the size of the reports in the session file, for long sessions.
+        The retention policy is applied while the session is running, in small batches of reports,
+        and the free space of the session file is released incrementally.
+        Reports of failed tests are never removed, only reduced to their summaries.
+
+        :param max_reports: remove the oldest reports of passing tests while there are more reports than this (default: None)
+        :param max_age_secs: remove the reports of passing tests that are older than this (in seconds) (default: None)
+        :param max_bucket_reports: keep the full reports only for the first reports of each failure bucket
+            (see :func:`~kitty.fuzzers.base.BaseFuzzer.set_failure_buckets`) (default: None)
+        :param archive: prefix of archive files to move the removed reports to, None to drop them (default: None)
+        :param archive_max_reports: number of reports in an archive file before it is rotated, None for no limit (default: None)
+        :param interval: number of tests between compactions (default: 100)
+        :param batch_size: maximal number of reports to remove in each compaction (default: 100)
+
+        :example:
+
+            ::
+
+                fuzzer.set_report_retention(max_reports=100000, max_age_secs=24 * 3600,
+                                            archive='session.sqlite.archive', archive_max_reports=50000)
+        '''
+        if interval < 1:
+            raise KittyException('number of tests between compactions (%d) < 1' % interval)
+        if batch_size < 1:
+            raise KittyException('compaction batch size (%d) < 1' % batch_size)
+        retention = (max_reports, max_age_secs, max_bucket_reports, archive, archive_max_reports)
+        self.config.report_retention = (retention, interval, batch_size)
+        return self
+
+    def set_payload_history(self, size=100):
+        '''
+        Keep the last transmitted payloads in memory, and add them to the reports of failed tests,
+        to reproduce failures of stateful targets that were caused by the previous tests.
+        The history has no cost in the session file until a test fails.
+        The payloads are kept by reference, not copied,
+        and each unique payload is stored once, as a blob (see :class:`~kitty.data.data_manager.BlobsTable`).
+
+        :param size: number of payloads to keep, 0 to disable the history (default: 100)
+        '''
+        if size < 0:
+            raise KittyException('payload history size (%d) < 0' % size)
+        self.config.payload_history = size or None
+        return self
+
     def set_session_file(self, filename):
         '''
         Set session file name, to keep state between runs
@@ -144,6 +313,51 @@ class BaseFuzzer(KittyObject):
         self.config.session_file_name = filename
         return self
 
+    def set_checkpoint_interval(self, tests=1, secs=None):
+        '''
+        Store the session info in the session file every few tests (or seconds),
+        instead of after each test.
+        Between checkpoints, the progress is appended to a journal file next to the
+        session file, so a crash of the fuzzer does not lose it.
+        The session info is always stored when a failure is detected and when the fuzzer stops.
+
+        :param tests: number of tests between checkpoints (default: 1)
+        :param secs: maximal time between checkpoints (in seconds), None for no limit (default: None)
+
+        :example:
+
+            ::
+
+                fuzzer.set_checkpoint_interval(tests=1000, secs=5)
+        '''
+        if tests < 1:
+            raise KittyException('number of tests between checkpoints (%d) < 1' % tests)
+        self.config.checkpoint_tests = tests
+        self.config.checkpoint_secs = secs
+        return self
+
+    def set_model_snapshots(self, model_snapshots=True, tests=1000):
+        '''
+        Store a snapshot of the model state (see :func:`~kitty.model.high_level.base.BaseModel.get_state`)
+        in the session file every few tests, and restore it when the session is resumed,
+        instead of skipping the model to the session's index.
+        This keeps model state that is not a function of the mutation index,
+        such as the payloads that were already sent (to skip duplicates) and the adaptive scheduling scores.
+        As the size of the snapshot grows with the number of tests, it is only taken at the first
+        checkpoint after [tests] tests, and when the fuzzer stops.
+        When resumed from an older snapshot, the model is skipped from it to the session's index.
+        The schedule of an adaptive model depends on the feedback of the tests,
+        so it is snapshotted at each checkpoint, and resumed from the snapshot's test
+        if the session is ahead of it.
+
+        :param model_snapshots: should the model state be stored (default: True)
+        :param tests: minimal number of tests between snapshots (default: 1000)
+        '''
+        if tests < 1:
+            raise KittyException('number of tests between model snapshots (%d) < 1' % tests)
+        self.config.model_snapshots = tests if model_snapshots else False
+        return self
+
     def set_model(self, model):
         '''
         Set the model to fuzz
@@ -170,6 +384,18 @@ class BaseFuzzer(KittyObject):
         self.config.max_failures = max_failures
         return self
 
+    def set_shard(self, num_shards, shard_id, strategy='stride'):
+        '''
+        Fuzz only a single shard of the model,
+        see :func:`~kitty.model.high_level.base.BaseModel.partition`
+
+        :param num_shards: number of shards to split the model to
+        :param shard_id: index of the shard to fuzz (0 <= shard_id < num_shards)
+        :param strategy: partition strategy, 'stride' or 'block' (default: 'stride')
+        '''
+        self.config.shard = (num_shards, shard_id, strategy)
+        return self
+
     def set_range(self, start_index=0, end_index=None):
         '''
         Set range of tests to run
@@ -210,7 +436,10 @@ class BaseFuzzer(KittyObject):
         assert(self.user_interface)
         assert(self.target)
 
-        if self._load_session():
+        if self.config.shard:
+            self.model.partition(*self.config.shard)
+        loaded = self._load_session()
+        if loaded:
             self._check_session_validity()
         else:
             self.session_info.kitty_version = _get_current_version()
@@ -218,7 +447,7 @@ class BaseFuzzer(KittyObject):
             self.session_info.data_model_hash = self.model.hash()
         if self.session_info.end_index is None:
             self.session_info.end_index = self.model.last_index()
-        self._store_session()
+        self._checkpoint()
         if self.session_info.start_index > self.session_info.current_index:
             self.session_info.current_index = self.session_info.start_index
 
@@ -227,37 +456,159 @@ class BaseFuzzer(KittyObject):
         self.user_interface.set_continue_event(self._continue_event)
         self.user_interface.start()
 
+        self._set_test_info_provider()
         self.session_info.start_time = time.time()
         try:
-            self.model.skip(self.session_info.current_index)
+            snapshot = self._load_model_snapshot() if loaded else None
+            with self._model_lock:
+                if not self._restore_model_state(snapshot):
+                    self.model.skip(self.session_info.current_index)
             self._start()
         except Exception as e:
             self.logger.error('Error occurred while fuzzing: %s', repr(e))
             self.logger.error(traceback.format_exc())
             # raise
+        self._store_test_summaries()
+        self._checkpoint(snapshot=True)
 
     def _start(self):
         self.not_implemented('_start')
 
-    def _update_test_info(self):
-        test_info = self.model.get_test_info()
+    def _mutate(self):
+        '''
+        Mutate the model to the next test
 
-        def update_test_info(dataman):
-            dataman.set_test_info(test_info)
+        :return: True if mutated, False if not
+        '''
+        with self._model_lock:
+            return self.model.mutate()
 
-        task = DataManagerTask(update_test_info)
-        self.dataman.submit_task(task)
+    def _set_test_info_provider(self):
+        '''
+        Let the data manager compute the test info only when it is requested
+        (e.g. by the web interface), instead of computing it for each test
+        '''
+        def set_provider_task(dataman):
+            dataman.set_test_info_provider(self._get_current_test_info)
+        self.dataman.submit_task(DataManagerTask(set_provider_task))
+
+    def _get_current_test_info(self):
+        '''
+        :return: information of the current test (called in the data manager context)
+        '''
+        if self._test_start_time is None:
+            return {}
+        try:
+            with self._model_lock:
+                test_info = self.model.get_test_info()
+        except Exception as e:
+            self.logger.error('Error occurred while getting test info: %s', repr(e))
+            return {}
+        test_info.update(self._get_novelty_info())
+        test_info.update(self._get_rate_info())
+        return test_info
 
     def _pre_test(self):
         self.session_info.current_index = self.model.current_index()
+        self._test_done = False
         self.target.pre_test(self.model.current_index())
-        self._update_test_info()
+        self._response_fingerprints = []
+        self._transmit_latency = None
+        self._response_length = 0
+        self._response_digest = None
+        self._test_start_time = time.time()
+
+    def _record_payload(self, payload, name):
+        '''
+        Keep the payload that is transmitted to the target, and add it to the payload history
+
+        :param payload: the payload
+        :param name: name of the template of the payload
+        '''
+        self._last_payload = payload
+        size = self.config.payload_history
+        if not size:
+            return
+        if (self._payload_history is None) or (self._payload_history.maxlen != size):
+            self._payload_history = deque(maxlen=size)
+        self._payload_history.append((self.model.current_index(), name, time.time(), payload))
+
+    def _get_payload_history_report(self):
+        '''
+        :return: report of the payloads in the history, oldest first
+        '''
+        history = list(self._payload_history)
+        report = Report('payload history')
+        report.add('count', len(history))
+        width = len(str(len(history) - 1))
+        for i, (test_number, name, timestamp, payload) in enumerate(history):
+            message = Report('message %0*d' % (width, i))
+            message.add('test_number', test_number)
+            message.add('template', name)
+            message.add('time', timestamp)
+            message.add('raw', payload)
+            message.add('length', len(payload))
+            report.add(message.get_name(), message)
+        return report
+
+    def _record_response(self, response):
+        '''
+        Fingerprint a response of the target in the response index
+
+        :param response: the response
+        :return: True if the response was not seen before
+        '''
+        if response is None:
+            return False
+        self._response_length += len(response)
+        if self._response_digest is None:
+            self._response_digest = hashlib.md5()
+        self._response_digest.update(response)
+        fingerprint, novel = self._response_index.add(response)
+        self._response_fingerprints.append((fingerprint, novel))
+        return novel
+
+    def _get_novelty_info(self):
+        '''
+        :return: dictionary of the response novelty of the current test
+        '''
+        return {
+            'novelty/novel responses': sum(1 for _, novel in self._response_fingerprints if novel),
+            'novelty/response fingerprints': ' '.join(fp for fp, _ in self._response_fingerprints),
+            'novelty/unique responses': self._response_index.count(),
+        }
+
+    def _get_rate_info(self):
+        '''
+        :return: dictionary of the rate controller information
+        '''
+        if self.config.rate_controller is None:
+            return {}
+        return self.config.rate_controller.get_info()
+
+    def _get_delay(self, latency, report):
+        '''
+        :param latency: duration of the current test (in seconds)
+        :param report: the report of the current test
+        :return: delay before the next test (in seconds)
+        '''
+        rate_controller = self.config.rate_controller
+        if rate_controller is None:
+            return self.config.delay_secs
+        rate_controller.update(latency, report)
+        return rate_controller.get_delay()
 
     def _post_test(self):
         self.logger.debug('(current_index=%d)', self.model.current_index())
+        stop_time = time.time()
+        latency = stop_time - self._test_start_time
         failure_detected = False
         self.target.post_test(self.model.current_index())
         report = self.target.get_report()
+        novelty_info = self._get_novelty_info()
+        report.add('novel responses', novelty_info['novelty/novel responses'])
+        report.add('response fingerprints', novelty_info['novelty/response fingerprints'])
+        self.model.feedback(report)
 
         if report.get('failed'):
             self.logger.error('BaseFuzzer._post_test - failure detected')
@@ -268,11 +619,60 @@ class BaseFuzzer(KittyObject):
             self._store_report(report)
         if failure_detected:
             self.session_info.failure_count += 1
-        self._store_session()
-        time.sleep(self.config.delay_secs)
+        if self.config.test_summaries:
+            self._add_test_summary(stop_time, failure_detected)
+        if self.config.report_retention:
+            self._compact_reports()
+        self._test_done = True
+        self._store_session(force=failure_detected)
+        time.sleep(self._get_delay(latency, report))
         self.logger.debug('failure_detected=%d', failure_detected)
         return failure_detected
 
+    def _add_test_summary(self, stop_time, failed):
+        '''
+        Add the summary of the current test to the batch, and store the batch if it is full
+
+        :param stop_time: time the test stopped
+        :param failed: did the test fail
+        '''
+        digest = self._response_digest.hexdigest()[:16] if self._response_digest else None
+        self._test_summaries.append((
+            self.model.current_index(), self._test_start_time, stop_time,
+            self._transmit_latency, self._response_length, digest, failed
+        ))
+        if len(self._test_summaries) >= self.config.test_summaries:
+            self._store_test_summaries()
+
+    def _store_test_summaries(self):
+        '''
+        Submit the batch of test summaries to the data manager
+
+        :return: the data manager task, None if the batch is empty
+        '''
+        if not self._test_summaries:
+            return None
+        summaries = self._test_summaries
+        self._test_summaries = []
+
+        def store_test_summaries_task(dataman):
+            dataman.get_test_summaries_manager().store_batch(summaries)
+        return self.dataman.submit_task(DataManagerTask(store_test_summaries_task))
+
+    def _compact_reports(self):
+        '''
+        Submit a compaction of the reports to the data manager, if it is due
+        '''
+        _, interval, batch_size = self.config.report_retention
+        self._tests_since_compaction += 1
+        if self._tests_since_compaction < interval:
+            return
+        self._tests_since_compaction = 0
+
+        def compact_reports_task(dataman):
+            dataman.get_reports_manager().compact(batch_size)
+        self.dataman.submit_task(DataManagerTask(compact_reports_task))
+
     def _start_message(self):
         self.logger.info('''
                  --------------------------------------------------
@@ -314,8 +714,12 @@ class BaseFuzzer(KittyObject):
                          )
 
     def _test_info(self):
-        self.logger.info('----------------------------------------------')
-        fuzz_node_info = self.model.get_test_info()
+        self.logger.info('test %d: %s', self.model.current_index(), self.model.get_sequence_str())
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        self.logger.debug('----------------------------------------------')
+        with self._model_lock:
+            fuzz_node_info = self.model.get_test_info()
         keys = sorted(fuzz_node_info.keys())
         key_max_len = 0
         for key in keys:
@@ -327,8 +731,8 @@ class BaseFuzzer(KittyObject):
             pad = ' ' * (key_max_len - len(k) + 1)
             if len(v) > 70:
                 v = v[:70] + '...'
-            self.logger.info('%s:%s%s' % (k, pad, v))
-        self.logger.info('----------------------------------------------')
+            self.logger.debug('%s:%s%s' % (k, pad, v))
+        self.logger.debug('----------------------------------------------')
 
     def _check_pause(self):
         if not self._continue_event.is_set():
@@ -345,14 +749,37 @@ class BaseFuzzer(KittyObject):
         assert(self.target)
         self.user_interface.stop()
         self.target.teardown()
+        self._store_test_summaries()
+        try:
+            self._checkpoint(snapshot=True).get_results(self.DATA_MANAGER_TIMEOUT)
+        except KittyException as e:
+            self.logger.error('Failed to store the session info: %s', e)
+        if self._journal:
+            self._journal.close()
+            self._journal = None
         self.dataman.submit_task(None)
         self.unset_signal_handler()
 
     def _store_report(self, report):
+        '''
+        Submit the report to the data manager, without waiting for it to be stored
+        '''
         self.logger.debug('<in>')
+        self._complete_report(report)
+        self.dataman.submit_task(_get_store_report_task(report, self.model.current_index(), self.logger))
+
+    def _complete_report(self, report):
+        '''
+        Add the information of the current test to its report
+
+        :param report: the report of the current test
+        '''
         report.add('test_number', self.model.current_index())
         report.add('fuzz_path', self.model.get_sequence_str())
-        test_info = self.model.get_test_info()
+        with self._model_lock:
+            test_info = self.model.get_test_info()
+        test_info.update(self._get_novelty_info())
+        test_info.update(self._get_rate_info())
         data_model_report = Report(name='Data Model')
         for k, v in test_info.items():
             data_model_report.add(k, v)
@@ -361,59 +788,192 @@ class BaseFuzzer(KittyObject):
         if payload is not None:
             data_report = Report('payload')
             data_report.add('raw', payload)
-            data_report.add('hex', payload.encode('hex'))
             data_report.add('length', len(payload))
             report.add('payload', data_report)
         else:
             report.add('payload', None)
+        if report.get('failed') and self._payload_history:
+            report.add('payload history', self._get_payload_history_report())
+
+    def _store_session(self, force=False):
+        '''
+        Store the session info if a checkpoint is due,
+        otherwise append it to the journal.
+
+        :param force: store the session info anyway (default: False)
+        '''
+        self._tests_since_checkpoint += 1
+        self._tests_since_snapshot += 1
+        if not force:
+            force = self._tests_since_checkpoint >= self.config.checkpoint_tests
+        if (not force) and self.config.checkpoint_secs is not None:
+            force = time.time() - self._last_checkpoint_time >= self.config.checkpoint_secs
+        if force:
+            self._checkpoint()
+        elif self._journal:
+            self._journal.append(self.session_info)
+
+    def _checkpoint(self, snapshot=False):
+        '''
+        Store the session info in the session file, and truncate the journal.
+        A snapshot of the model state is stored as well if it is due.
+
+        :param snapshot: store a snapshot of the model state anyway (default: False)
+        :return: the data manager task of the checkpoint
+        '''
+        self._tests_since_checkpoint = 0
+        self._last_checkpoint_time = time.time()
+        model_snapshot = None
+        if self.config.model_snapshots and self.model and self.model.is_adaptive():
+            # an adaptive model can not be skipped to a later index without the feedback of the skipped tests
+            snapshot = True
+        if snapshot or (self.config.model_snapshots and self._tests_since_snapshot >= self.config.model_snapshots):
+            model_snapshot = self._get_model_snapshot()
+            if model_snapshot:
+                self._tests_since_snapshot = 0
+        return self._set_session_info(model_snapshot)
+
+    def _get_model_snapshot(self):
+        '''
+        :return: snapshot of the model state for the session file, None if there is nothing to store
+        '''
+        if not (self.config.model_snapshots and self.model):
+            return None
+        current_index = self.model.current_index()
+        if current_index == -1:
+            return None
+        if not self._model_lock.acquire(not self._signaled):
+            # the model is in the middle of a mutation or a render, its state is not consistent
+            self.logger.warning('Model is busy, its state is not stored')
+            return None
+        try:
+            state = self.model.get_state()
+        finally:
+            self._model_lock.release()
+        if state['current_index'] != current_index:
+            # the model is ahead of the current test (e.g. it prepares tests in advance)
+            return None
+        return {'state': state, 'test_done': self._test_done}
 
-        def store_report_task(dataman):
-            reportman = dataman.get_reports_manager()
-            reportman.store(report, self.model.current_index())
-            return reportman.get(self.model.current_index())
-        self.dataman.submit_task(DataManagerTask(store_report_task)).get_results()
+    def _load_model_snapshot(self):
+        '''
+        :return: the snapshot of the model state from the session file, None if there is no snapshot
+        '''
+        if not self.config.model_snapshots:
+            return None
+
+        def get_model_state_task(dataman):
+            return dataman.get_model_state_manager().get_state()
+        return self.dataman.submit_task(DataManagerTask(get_model_state_task)).get_results(self.DATA_MANAGER_TIMEOUT)
+
+    def _restore_model_state(self, snapshot):
+        '''
+        Restore the model from a snapshot of its state.
+        If the test of the snapshot was done, it is not repeated.
 
-    def _store_session(self):
-        self._set_session_info()
+        :param snapshot: snapshot from the session file (or None)
+        :return: True if the model was restored, False if it should be skipped to the session's index
+        '''
+        if not snapshot:
+            return False
+        snapshot_index = snapshot['state']['current_index']
+        current_index = self.session_info.current_index
+        if (snapshot_index > current_index) or ((snapshot_index == current_index) and not snapshot['test_done']):
+            return False
+        self.logger.info('Restoring model state of test %d', snapshot_index)
+        self.model.set_state(snapshot['state'])
+        if snapshot_index < current_index:
+            if self.model.is_adaptive():
+                # the schedule depends on the feedback of the tests after the snapshot, so they are repeated
+                self.logger.warning('Resuming adaptive model from test %d, not from test %d', snapshot_index, current_index)
+                self.session_info.current_index = snapshot_index
+            else:
+                self.model.skip(current_index - snapshot_index - 1)
+        return True
 
     def _get_session_info(self):
         def get_session_info_task(dataman):
             session_manager = dataman.get_session_info_manager()
             return session_manager.get_session_info()
         task = DataManagerTask(get_session_info_task)
-        info = self.dataman.submit_task(task).get_results()
+        info = self.dataman.submit_task(task).get_results(self.DATA_MANAGER_TIMEOUT)
         return info
 
     def _get_test_info(self):
         def get_test_info_task(dataman):
             return dataman.get_test_info()
         task = DataManagerTask(get_test_info_task)
-        info = self.dataman.submit_task(task).get_results()
+        info = self.dataman.submit_task(task).get_results(self.DATA_MANAGER_TIMEOUT)
         return info
 
-    def _set_session_info(self):
+    def _set_session_info(self, model_snapshot=None):
+        journal = self._journal
+        # entries that are journaled after this point are newer than the checkpoint
+        journal_position = journal.position() if journal else None
+
         def set_session_info_task(dataman):
             session_manager = dataman.get_session_info_manager()
             session_manager.set_session_info(self.session_info)
+            if model_snapshot:
+                dataman.get_model_state_manager().set_state(model_snapshot)
+            if journal:
+                journal.truncate(journal_position)
         task = DataManagerTask(set_session_info_task)
         self.dataman.submit_task(task)
+        return task
 
     def _load_session(self):
         if not self.config.session_file_name:
             self.config.session_file_name = ':memory:'
         self.dataman = DataManager(self.config.session_file_name)
         self.dataman.start()
+        tasks = []
+        if self.config.failure_buckets:
+            keys, max_reports = self.config.failure_buckets
+
+            def set_failure_buckets_task(dataman):
+                dataman.get_reports_manager().set_failure_buckets(keys, max_reports)
+            tasks.append(DataManagerTask(set_failure_buckets_task))
+        if self.config.report_retention:
+            retention = self.config.report_retention[0]
+
+            def set_retention_task(dataman):
+                dataman.get_reports_manager().set_retention(*retention)
+            tasks.append(DataManagerTask(set_retention_task))
+        for task in self.dataman.submit_batch(tasks):
+            task.get_results(self.DATA_MANAGER_TIMEOUT)
+        if (self.config.session_file_name != ':memory:') and (self.config.checkpoint_tests > 1 or self.config.checkpoint_secs is not None):
+            self._journal = SessionJournal(self.config.session_file_name + '.journal')
         info = self._get_session_info()
         if info:
             self.logger.info('Loaded session from DB')
             self.session_info = info
+            self._replay_journal()
             return True
         else:
             self.logger.info('No session loaded')
             self._set_session_info()
             return False
 
+    def _replay_journal(self):
+        '''
+        Update the loaded session info with the progress that was journaled after its last checkpoint
+        '''
+        journal = self._journal
+        if journal is None:
+            journal_filename = self.config.session_file_name + '.journal'
+            if not os.path.exists(journal_filename):
+                return
+            journal = SessionJournal(journal_filename)
+        entry = journal.read()
+        if journal is not self._journal:
+            journal.close()
+        if entry and (entry[0] > self.session_info.current_index):
+            self.logger.info('Replaying session journal, current index: %d -> %d', self.session_info.current_index, entry[0])
+            self.session_info.current_index, self.session_info.failure_count = entry
+
     def _exit_now(self, signal, frame):
+        self._signaled = True
         self.stop()
         sys.exit(0)
 
@@ -44,6 +44,7 @@ class ClientFuzzer(BaseFuzzer):
         self._trigger_stop_evt = Event()
         self._target_control_thread.set_func_stop_event(self._trigger_stop_evt)
         self._index_in_path = 0
+        self._prerendered = None
         # self._do_fuzz = Event()
 
     def stop(self):
@@ -65,17 +66,31 @@ class ClientFuzzer(BaseFuzzer):
     def _do_trigger(self):
         self.logger.debug('_do_trigger called')
         self._check_pause()
-        if self.model.mutate() and self._keep_running():
+        if self._mutate() and self._keep_running():
             self._fuzz_path = self.model.get_sequence()
             self._index_in_path = 0
             self._pre_test()
             self._test_info()
+            self._prerender()
             self.target.trigger()
             self._post_test()
         else:
             self._end_message()
             self._trigger_stop_evt.wait()
 
+    def _prerender(self):
+        '''
+        Render the payload of the mutated node before the target is triggered,
+        so the stack's request is answered without rendering the payload.
+        Nodes with Dynamic fields are rendered on request,
+        as their payload depends on the session data of the request.
+        '''
+        self._prerendered = None
+        node = self._fuzz_path[-1].dst
+        if hasattr(node, 'get_dynamic_fields') and not node.get_dynamic_fields():
+            with self._model_lock:
+                self._prerendered = (node, node.render().tobytes())
+
     def _start(self):
         self._start_message()
         self.target.setup()
@@ -110,9 +125,14 @@ class ClientFuzzer(BaseFuzzer):
         if self._keep_running():
             fuzz_node = self._fuzz_path[self._index_in_path].dst
             if self._should_fuzz_node(fuzz_node, stage):
-                fuzz_node.set_session_data(data)
-                payload = fuzz_node.render().tobytes()
-                self._last_payload = payload
+                prerendered = self._prerendered
+                if prerendered and (prerendered[0] is fuzz_node):
+                    payload = prerendered[1]
+                else:
+                    with self._model_lock:
+                        fuzz_node.set_session_data(data)
+                        payload = fuzz_node.render().tobytes()
+                self._record_payload(payload, fuzz_node.get_name())
             else:
                 self._index_in_path += 1
                 if self._index_in_path >= len(self._fuzz_path):
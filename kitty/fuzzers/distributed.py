@@ -0,0 +1,363 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+'''
+Distributed fuzzing - a coordinator that owns the session,
+and workers on other hosts that lease batches of tests from it over RPC.
+'''
+import time
+import traceback
+from threading import Thread, Event, Lock
+from kitty.core import KittyException, KittyObject
+from kitty.remote.rpc import RpcClient, RpcHttpServer, RpcHandler
+from kitty.fuzzers.parallel import ParallelServerFuzzer, _WorkerFuzzer
+
+
+class _RemoteTargets(object):
+    '''
+    Stands for the targets of the remote workers in the coordinator
+    '''
+
+    def set_fuzzer(self, fuzzer):
+        pass
+
+    def setup(self):
+        pass
+
+    def teardown(self):
+        pass
+
+    def get_description(self):
+        return 'targets of remote workers'
+
+
+class _CoordinatorRpc(object):
+    '''
+    The methods that the coordinator exposes to the workers over RPC
+    '''
+
+    def __init__(self, coordinator):
+        self._coordinator = coordinator
+
+    def register(self, name, model_hash):
+        return self._coordinator._register(name, model_hash)
+
+    def lease(self, worker_id, count):
+        return self._coordinator._lease(worker_id, count)
+
+    def renew(self, lease_id):
+        return self._coordinator._renew(lease_id)
+
+    def complete(self, lease_id, results, test_info):
+        return self._coordinator._complete(lease_id, results, test_info)
+
+
+class DistributedServerFuzzer(ParallelServerFuzzer):
+    '''
+    DistributedServerFuzzer coordinates a fuzzing session between workers on other hosts
+    (:class:`~kitty.fuzzers.distributed.DistributedWorker`).
+    It owns the mutation index space of the model, the session and the user interface,
+    and the workers lease batches of mutation indices from it over RPC,
+    run them against their local targets, and return the failures and their reports.
+
+    If a worker does not complete (or renew) a lease in time, the lease expires,
+    and its indices are leased to other workers.
+    The session's current index is the highest index below which all the tests are done,
+    so a resumed session never skips a test.
+    Adaptive models are not supported, as the workers mutate their own copies
+    of the model, and the feedback of their tests never reaches the coordinator.
+
+    The coordinator listens on 127.0.0.1 by default.
+    To accept workers from other hosts, listen on an external address
+    with :func:`~kitty.fuzzers.distributed.DistributedServerFuzzer.set_listen_address`.
+    The RPC is not authenticated, so only do so on a trusted network.
+
+    :example:
+
+        ::
+
+            # on the coordinator host, accept workers from the (trusted) lab network
+            fuzzer = DistributedServerFuzzer()
+            fuzzer.set_model(get_model())
+            fuzzer.set_listen_address('10.0.0.1', 26010)
+            fuzzer.set_interface(WebInterface())
+            fuzzer.start()
+
+            # on each worker host
+            worker = DistributedWorker()
+            worker.set_model_factory(get_model)
+            worker.set_target(TcpTarget('target', '127.0.0.1', 80))
+            worker.set_coordinator('coordinator-host', 26010)
+            worker.start()
+    '''
+
+    def __init__(self, name='DistributedServerFuzzer', logger=None, option_line=None):
+        '''
+        :param name: name of the object
+        :param logger: logger for the object (default: None)
+        :param option_line: cmd line options to the fuzzer
+        '''
+        super(DistributedServerFuzzer, self).__init__(name, logger, option_line)
+        self._host = '127.0.0.1'
+        self._port = 26010
+        self._lease_timeout = 60
+        self._lock = Lock()
+        self._model_hash = None
+        self._workers = []
+        self._leases = {}
+        self._expired = {}
+        self._next_lease_id = 0
+        self._outstanding = set([])
+        self._retry = []
+        self._next = None
+        self._stopped = False
+        self.set_target(_RemoteTargets())
+
+    def set_listen_address(self, host, port):
+        '''
+        :param host: address to listen on for workers (default: 127.0.0.1)
+        :param port: port to listen on for workers (default: 26010)
+
+        .. note::
+
+            The RPC has no authentication, anyone who can reach the address can
+            lease tests and submit reports. Listen on an external address
+            (or 0.0.0.0) only on a trusted network.
+        '''
+        self._host = host
+        self._port = port
+        return self
+
+    def set_lease_timeout(self, lease_timeout):
+        '''
+        :param lease_timeout: seconds before a lease that was not completed or renewed expires (default: 60)
+        '''
+        self._lease_timeout = lease_timeout
+        return self
+
+    def set_target_factory(self, factory, num_workers):
+        raise KittyException('DistributedServerFuzzer targets are created by the workers')
+
+    def _start(self):
+        if self.model.is_adaptive():
+            raise KittyException('%s can not be used with an adaptive model' % type(self).__name__)
+        self._start_message()
+        self._model_hash = self.model.hash()
+        self._next = self._next_index(self.model.current_index())
+        server = RpcHttpServer((self._host, self._port), RpcHandler, _CoordinatorRpc(self), None)
+        server.timeout = 0.2
+        serving = Event()
+        serving.set()
+
+        def serve():
+            while serving.is_set():
+                server.handle_request()
+        thread = Thread(target=serve)
+        thread.daemon = True
+        thread.start()
+        self.logger.info('waiting for workers on %s:%d' % (self._host, self._port))
+        try:
+            while not self._finished():
+                time.sleep(0.1)
+        finally:
+            serving.clear()
+            thread.join()
+            server.server_close()
+        self.model.skip(max(0, self.session_info.current_index - self.model.current_index()))
+        self._end_message()
+
+    def _finished(self):
+        '''
+        Expire the overdue leases, and check if the session is over
+        '''
+        with self._lock:
+            now = time.time()
+            for lease_id, (worker_id, indices, deadline) in self._leases.items():
+                if deadline < now:
+                    self.logger.warning('lease %d of worker %s expired', lease_id, self._workers[worker_id])
+                    del self._leases[lease_id]
+                    self._expired[lease_id] = indices
+                    self._retry.extend(i for i in indices if i in self._outstanding)
+            self._retry.sort()
+            if self.config.max_failures and (self.session_info.failure_count >= self.config.max_failures):
+                self._stopped = True
+            if self._stopped:
+                return not self._leases
+            return (self._next is None) and (not self._outstanding)
+
+    def _register(self, name, model_hash):
+        if model_hash != self._model_hash:
+            raise KittyException('worker %s model hash (%s) != session model hash (%s)' % (name, model_hash, self._model_hash))
+        with self._lock:
+            self._workers.append(name)
+            self.logger.info('worker %s registered', name)
+            return {
+                'worker_id': len(self._workers) - 1,
+                'lease_timeout': self._lease_timeout,
+                'delay_secs': self.config.delay_secs,
+                'store_all_reports': self.config.store_all_reports,
+            }
+
+    def _lease(self, worker_id, count):
+        with self._lock:
+            if self._stopped or ((self._next is None) and (not self._outstanding)):
+                return {'done': True, 'lease_id': -1, 'indices': []}
+            indices = []
+            if self._continue_event.is_set():
+                while self._retry and (len(indices) < count):
+                    indices.append(self._retry.pop(0))
+                while (self._next is not None) and (len(indices) < count):
+                    indices.append(self._next)
+                    self._outstanding.add(self._next)
+                    self._next = self._next_index(self._next)
+            if not indices:
+                return {'done': False, 'lease_id': -1, 'indices': []}
+            lease_id = self._next_lease_id
+            self._next_lease_id += 1
+            self._leases[lease_id] = (worker_id, indices, time.time() + self._lease_timeout)
+            return {'done': False, 'lease_id': lease_id, 'indices': indices}
+
+    def _renew(self, lease_id):
+        with self._lock:
+            if lease_id not in self._leases:
+                return False
+            worker_id, indices, _ = self._leases[lease_id]
+            self._leases[lease_id] = (worker_id, indices, time.time() + self._lease_timeout)
+            return True
+
+    def _complete(self, lease_id, results, test_info):
+        '''
+        :param lease_id: id of the completed lease
+        :param results: list of [index, failed, report dictionaries] of the tests with reports
+        :param test_info: test information of the last test in the lease
+        '''
+        with self._lock:
+            if lease_id in self._leases:
+                indices = self._leases.pop(lease_id)[1]
+            else:
+                # the lease expired, but its tests are done anyway
+                indices = self._expired.pop(lease_id, [])
+            results = dict((index, (failed, reports)) for index, failed, reports in results)
+            for index in indices:
+                if index not in self._outstanding:
+                    continue
+                self._outstanding.discard(index)
+                if index in self._retry:
+                    self._retry.remove(index)
+                failed, reports = results.get(index, (False, []))
+                self._handle_result(index, failed, reports, None)
+            if test_info:
+                self._set_worker_test_info(test_info)
+            self._update_done_index(self._outstanding, self._next)
+            return True
+
+
+class DistributedWorker(KittyObject):
+    '''
+    A worker of a distributed fuzzing session.
+    It leases batches of tests from a
+    :class:`~kitty.fuzzers.distributed.DistributedServerFuzzer`,
+    runs them against its target, and returns the results.
+
+    As a worker may get tests that are lower than its current mutation index
+    (from expired leases of other workers), it creates the model with a factory,
+    and recreates it when it needs to go back.
+    '''
+
+    def __init__(self, name='DistributedWorker', logger=None):
+        '''
+        :param name: name of the worker
+        :param logger: logger for the object (default: None)
+        '''
+        super(DistributedWorker, self).__init__(name, logger)
+        self._model_factory = None
+        self._target = None
+        self._host = None
+        self._port = None
+        self._batch_size = 100
+
+    def set_model_factory(self, factory):
+        '''
+        :type factory: func() -> BaseModel
+        :param factory: function that creates the model, should create the same model as the coordinator's
+        '''
+        self._model_factory = factory
+        return self
+
+    def set_target(self, target):
+        '''
+        :param target: the target to run the tests against
+        '''
+        self._target = target
+        return self
+
+    def set_coordinator(self, host, port):
+        '''
+        :param host: address of the coordinator
+        :param port: port of the coordinator
+        '''
+        self._host = host
+        self._port = port
+        return self
+
+    def set_batch_size(self, batch_size):
+        '''
+        :param batch_size: number of tests to lease at a time (default: 100)
+        '''
+        self._batch_size = batch_size
+        return self
+
+    def start(self):
+        '''
+        Run tests until the coordinator's session is over
+        '''
+        assert(self._model_factory)
+        assert(self._target)
+        assert(self._host)
+        client = RpcClient(self._host, self._port)
+        model = self._model_factory()
+        info = client.register(name=self.name, model_hash=model.hash())
+        worker = _WorkerFuzzer(self.name, self.logger, model, self._target)
+        worker.set_delay_between_tests(info['delay_secs'])
+        worker.set_store_all_reports(info['store_all_reports'])
+        renew_interval = info['lease_timeout'] / 3.0
+        self._target.setup()
+        try:
+            while True:
+                lease = client.lease(worker_id=info['worker_id'], count=self._batch_size)
+                if lease['done']:
+                    break
+                if not lease['indices']:
+                    time.sleep(1)
+                    continue
+                last_renew = time.time()
+                results = []
+                test_info = None
+                for index in lease['indices']:
+                    if index <= worker.model.current_index():
+                        worker.model = self._model_factory()
+                    failed, reports, test_info = worker.run_test(index)
+                    if failed or reports:
+                        results.append([index, failed, reports])
+                    if time.time() - last_renew > renew_interval:
+                        client.renew(lease_id=lease['lease_id'])
+                        last_renew = time.time()
+                client.complete(lease_id=lease['lease_id'], results=results, test_info=test_info)
+        except Exception as e:
+            self.logger.error('Error occurred while fuzzing: %s', repr(e))
+            self.logger.error(traceback.format_exc())
+        finally:
+            self._target.teardown()
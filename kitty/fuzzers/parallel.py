@@ -0,0 +1,482 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+'''
+Fuzzing multiple targets in parallel, with a pool of worker processes or threads.
+'''
+import traceback
+import Queue
+import multiprocessing
+from threading import Thread
+from kitty.core import KittyException
+from kitty.fuzzers.base import _get_store_report_task
+from kitty.fuzzers.server import ServerFuzzer, _PreparedTestModel, _prepare_test
+from kitty.data.data_manager import DataManagerTask
+from kitty.data.report import Report
+from kitty.interfaces.base import EmptyInterface
+
+
+class _TargetPool(object):
+    '''
+    Stands for the targets of the workers in the main process
+    '''
+
+    def __init__(self, num_workers):
+        self.num_workers = num_workers
+
+    def set_fuzzer(self, fuzzer):
+        pass
+
+    def setup(self):
+        pass
+
+    def teardown(self):
+        pass
+
+    def get_description(self):
+        return 'pool of %d parallel targets' % self.num_workers
+
+
+class _WorkerFuzzer(ServerFuzzer):
+    '''
+    Runs the tests of a single worker process.
+    Instead of storing the reports and the test information,
+    it keeps them to be sent to the main process.
+    '''
+
+    def __init__(self, name, logger, model, target):
+        '''
+        :param name: name of the worker
+        :param logger: logger for the worker
+        :param model: the model (or a stand-in for it)
+        :param target: the target of the worker
+        '''
+        super(_WorkerFuzzer, self).__init__(name=name, logger=logger)
+        self.model = model
+        self.user_interface = EmptyInterface()
+        self.set_target(target)
+        self._reports = []
+        self._task_index = None
+
+    def get_task_index(self, task):
+        '''
+        :param task: task from the main process (mutation index)
+        :return: mutation index of the task
+        '''
+        return task
+
+    def run_test(self, task):
+        '''
+        Run a single test.
+        The test is run at the exact index of the task, even if its payload
+        is a duplicate of an earlier test, as each worker only sees
+        the tests that were handed out to it.
+
+        :param task: task from the main process (mutation index)
+        :return: tuple of (failed, list of report dictionaries, test information)
+        '''
+        index = task
+        if not self.model.mutate_to(index):
+            raise KittyException('worker can not move from index %d to index %d' % (self.model.current_index(), index))
+        self._task_index = index
+        return self._run_current_test()
+
+    def _run_current_test(self):
+        self._reports = []
+        failure_count = self.session_info.failure_count
+        self._run_sequence(self.model.get_sequence())
+        failed = self.session_info.failure_count > failure_count
+        return failed, self._reports, self._get_current_test_info()
+
+    def _complete_report(self, report):
+        super(_WorkerFuzzer, self)._complete_report(report)
+        report.add('test_number', self._task_index)
+
+    def _store_report(self, report):
+        self._complete_report(report)
+        self._reports.append(report.to_dict())
+
+    def _store_session(self, force=False):
+        pass
+
+    def _store_test_summaries(self):
+        '''
+        The worker has no data manager, the summaries are sent to the main process
+        with the results of the tests (see pop_test_summaries)
+        '''
+        pass
+
+    def pop_test_summaries(self):
+        '''
+        :return: summaries of the tests since the last call
+        '''
+        summaries = self._test_summaries
+        self._test_summaries = []
+        return summaries
+
+    def _compact_reports(self):
+        '''
+        The reports are stored, and compacted, by the main process
+        '''
+        pass
+
+
+def _worker_main(fuzzer, worker_id, tasks, results):
+    '''
+    Main function of a worker (process or thread).
+    Receives tasks until it receives None,
+    and returns a result for each of them.
+    '''
+    try:
+        worker = fuzzer._create_worker(worker_id)
+    except Exception as e:
+        fuzzer.logger.error(traceback.format_exc())
+        results.put((worker_id, None, None, None, None, None, 'worker setup failed: %s' % repr(e)))
+        return
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        index = worker.get_task_index(task)
+        try:
+            failed, reports, test_info = worker.run_test(task)
+            results.put((worker_id, index, failed, reports, test_info, worker.pop_test_summaries(), None))
+        except Exception as e:
+            fuzzer.logger.error(traceback.format_exc())
+            results.put((worker_id, index, None, None, None, None, repr(e)))
+            break
+    worker.target.teardown()
+
+
+class ParallelServerFuzzer(ServerFuzzer):
+    '''
+    ParallelServerFuzzer runs the tests of a model on multiple targets in parallel.
+    Each worker process has its own target (with its own controller and monitors),
+    created by a user factory, and the main process hands out disjoint mutation
+    indices to the workers.
+    The reports of all the workers are stored in a single session,
+    and presented by a single user interface.
+
+    The session's current index is the highest index for which all
+    the tests up to it were done, so resuming a session never skips a test,
+    but it may repeat up to a test per worker.
+
+    Adaptive models are not supported, as the feedback of each test
+    would only reach the model of the worker that ran it.
+    If a worker dies, no more tests are handed out.
+
+    :example:
+
+        ::
+
+            def get_target(worker_id):
+                target = TcpTarget('target_%d' % worker_id, '10.0.0.%d' % (worker_id + 1), 80)
+                target.set_controller(MyController('controller_%d' % worker_id, worker_id))
+                return target
+
+            fuzzer = ParallelServerFuzzer()
+            fuzzer.set_model(model)
+            fuzzer.set_target_factory(get_target, 16)
+            fuzzer.set_interface(WebInterface())
+            fuzzer.start()
+    '''
+
+    #  Maximal time to wait for a result before checking that the workers are alive (in seconds)
+    RESULT_TIMEOUT = 1
+
+    def __init__(self, name='ParallelServerFuzzer', logger=None, option_line=None):
+        '''
+        :param name: name of the object
+        :param logger: logger for the object (default: None)
+        :param option_line: cmd line options to the fuzzer
+        '''
+        super(ParallelServerFuzzer, self).__init__(name, logger, option_line)
+        self._target_factory = None
+        self._num_workers = 0
+
+    def set_target_factory(self, factory, num_workers):
+        '''
+        :type factory: func(worker_id) -> ServerTarget
+        :param factory: function that creates the target of a worker, called in the worker process
+        :param num_workers: number of worker processes
+        '''
+        if num_workers < 1:
+            raise KittyException('number of workers (%d) < 1' % num_workers)
+        self._target_factory = factory
+        self._num_workers = num_workers
+        self.set_target(_TargetPool(num_workers))
+        return self
+
+    def set_pipeline_depth(self, depth):
+        raise KittyException('ParallelServerFuzzer does not support pipelining')
+
+    def _start(self):
+        if self.model.is_adaptive():
+            raise KittyException('%s can not be used with an adaptive model' % type(self).__name__)
+        self._start_message()
+        tasks = [self._create_queue() for _ in range(self._num_workers)]
+        results = self._create_queue()
+        workers = []
+        for worker_id in range(self._num_workers):
+            worker = self._create_worker_runner(worker_id, tasks[worker_id], results)
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+        try:
+            self._dispatch(tasks, results, workers)
+        finally:
+            for task_queue in tasks:
+                task_queue.put(None)
+            for worker in workers:
+                worker.join()
+        # bring the model to the session's index, for the end message
+        self.model.skip(max(0, self.session_info.current_index - self.model.current_index()))
+        self._end_message()
+
+    def _create_queue(self):
+        return multiprocessing.Queue()
+
+    def _create_worker_runner(self, worker_id, tasks, results):
+        return multiprocessing.Process(target=_worker_main, args=(self, worker_id, tasks, results))
+
+    def _create_worker(self, worker_id):
+        '''
+        Create the worker fuzzer and its target, called in the worker process
+        '''
+        target = self._target_factory(worker_id)
+        worker = _WorkerFuzzer('%s/worker_%d' % (self.name, worker_id), self.logger, self.model, target)
+        worker.config = self.config
+        target.setup()
+        return worker
+
+    def _get_task(self, index):
+        '''
+        :param index: mutation index of the test
+        :return: task to send to a worker
+        '''
+        return index
+
+    def _next_index(self, index):
+        '''
+        :return: the next index to test after index, None if there are no more tests
+        '''
+        index = self.model._next_partition_index(index + 1)
+        if (index is None) or (index > self.session_info.end_index):
+            return None
+        return index
+
+    def _dispatch(self, tasks, results, workers):
+        '''
+        Hand out the mutation indices to the workers (up to two at a time per worker),
+        and handle their results.
+        If a worker fails (or dies), no more indices are handed out,
+        and the indices it did not finish are kept above the session's index.
+        '''
+        next_index = self._next_index(self.model.current_index())
+        in_flight = {}
+        idle = []
+        for worker_id in range(self._num_workers):
+            idle.extend([worker_id, worker_id])
+        pending = set([])
+        lost = set([])
+        stopped = False
+        while True:
+            while idle and (not stopped) and (next_index is not None) and self._should_dispatch(len(pending)):
+                worker_id = idle.pop(0)
+                tasks[worker_id].put(self._get_task(next_index))
+                in_flight.setdefault(worker_id, []).append(next_index)
+                pending.add(next_index)
+                next_index = self._next_index(next_index)
+            if not (pending - lost):
+                break
+            try:
+                result = results.get(timeout=self.RESULT_TIMEOUT)
+            except Queue.Empty:
+                for worker_id, worker in enumerate(workers):
+                    if (not worker.is_alive()) and in_flight.get(worker_id):
+                        self.logger.error('Worker %d died', worker_id)
+                        lost.update(in_flight.pop(worker_id))
+                        stopped = True
+                continue
+            worker_id, index, failed, reports, test_info, summaries, error = result
+            if error:
+                self.logger.error('Error occurred in worker %d: %s', worker_id, error)
+                lost.update(in_flight.pop(worker_id, []))
+                stopped = True
+                continue
+            in_flight[worker_id].remove(index)
+            pending.discard(index)
+            idle.append(worker_id)
+            self._handle_result(index, failed, reports, test_info, summaries)
+            self._update_done_index(pending, next_index)
+
+    def _should_dispatch(self, num_pending):
+        '''
+        :param num_pending: number of tests in flight
+        :return: True if another test should be handed out
+        '''
+        self._check_pause()
+        if self.config.max_failures:
+            if self.session_info.failure_count >= self.config.max_failures:
+                return False
+        return True
+
+    def _handle_result(self, index, failed, reports, test_info, summaries=None):
+        '''
+        Store the reports, the test information and the test summaries of a test that was run by a worker
+        '''
+        for report_dict in reports:
+            self._store_worker_report(index, Report.from_dict(report_dict))
+        if failed:
+            self.logger.error('%s - failure detected in test %d', self.name, index)
+            self.user_interface.failure_detected()
+            self.session_info.failure_count += 1
+            self._store_session(force=True)
+        if test_info is not None:
+            self._set_worker_test_info(test_info)
+        if summaries:
+            self._test_summaries.extend(summaries)
+            if len(self._test_summaries) >= self.config.test_summaries:
+                self._store_test_summaries()
+        if self.config.report_retention:
+            self._compact_reports()
+
+    def _set_worker_test_info(self, test_info):
+        '''
+        :param test_info: test information of the last test that was run by a worker
+        '''
+        def update_test_info(dataman):
+            dataman.set_test_info(test_info)
+        self.dataman.submit_task(DataManagerTask(update_test_info))
+
+    def _update_done_index(self, pending, next_index):
+        '''
+        Update the session's current index to the highest index
+        below which all the tests are done, and store the session
+
+        :param pending: indices that were handed out but are not done
+        :param next_index: next index to hand out (None if there is no such index)
+        '''
+        first_pending = min(pending) if pending else next_index
+        if first_pending is None:
+            done_index = self.session_info.end_index
+        else:
+            done_index = first_pending - 1
+        self.session_info.current_index = max(self.session_info.current_index, done_index)
+        self._store_session()
+
+    def _store_worker_report(self, index, report):
+        self.dataman.submit_task(_get_store_report_task(report, index, self.logger))
+
+
+class _ThreadWorkerFuzzer(_WorkerFuzzer):
+    '''
+    Runs the tests of a single worker thread.
+    The tests are prepared by the main thread from the shared model.
+    '''
+
+    def get_task_index(self, task):
+        '''
+        :param task: prepared test
+        :return: mutation index of the test
+        '''
+        return task.index
+
+    def run_test(self, task):
+        '''
+        Run a single test
+
+        :param task: prepared test
+        :return: tuple of (failed, list of report dictionaries, test information)
+        '''
+        self.model.set_test(task)
+        self._task_index = task.index
+        return self._run_current_test()
+
+    def _get_prepared_payloads(self):
+        return self.model.get_payloads()
+
+
+class ConcurrentServerFuzzer(ParallelServerFuzzer):
+    '''
+    ConcurrentServerFuzzer keeps multiple independent tests in flight,
+    each in a worker thread with its own target (and connection).
+    It is intended for stateless network services, which can handle many
+    sessions at a time, where the fuzzer mostly waits for responses.
+
+    The main thread mutates the model and renders the payloads of each test,
+    and hands them out to the workers, so the number of concurrent tests
+    is bounded by the number of workers.
+    If a rate controller is set, the number of tests in flight
+    is also bounded by its concurrency hint.
+    As the payloads are rendered before they are transmitted,
+    templates with Dynamic fields are not supported.
+    As in :class:`ParallelServerFuzzer`, each test is run at its exact index,
+    even if its payloads are duplicates of an earlier test.
+    Edge callbacks are called from the worker threads,
+    with the worker's fuzzer object.
+
+    :example:
+
+        ::
+
+            fuzzer = ConcurrentServerFuzzer()
+            fuzzer.set_model(model)
+            fuzzer.set_target_factory(lambda worker_id: TcpTarget('target_%d' % worker_id, host, port), 100)
+            fuzzer.set_interface(WebInterface())
+            fuzzer.start()
+    '''
+
+    def __init__(self, name='ConcurrentServerFuzzer', logger=None, option_line=None):
+        '''
+        :param name: name of the object
+        :param logger: logger for the object (default: None)
+        :param option_line: cmd line options to the fuzzer
+        '''
+        super(ConcurrentServerFuzzer, self).__init__(name, logger, option_line)
+
+    def _create_queue(self):
+        return Queue.Queue()
+
+    def _create_worker_runner(self, worker_id, tasks, results):
+        return Thread(target=_worker_main, args=(self, worker_id, tasks, results))
+
+    def _create_worker(self, worker_id):
+        target = self._target_factory(worker_id)
+        model = _PreparedTestModel(self.model, self._model_lock)
+        worker = _ThreadWorkerFuzzer('%s/worker_%d' % (self.name, worker_id), self.logger, model, target)
+        worker.config = self.config
+        target.setup()
+        return worker
+
+    def _get_task(self, index):
+        with self._model_lock:
+            if not self.model.mutate_to(index):
+                raise KittyException('can not move from index %d to index %d' % (self.model.current_index(), index))
+            test = _prepare_test(self.model)
+        if test.payloads is None:
+            raise KittyException('ConcurrentServerFuzzer does not support templates with Dynamic fields (%s)' % self.model.get_sequence_str())
+        return test
+
+    def _should_dispatch(self, num_pending):
+        if not super(ConcurrentServerFuzzer, self)._should_dispatch(num_pending):
+            return False
+        rate_controller = self.config.rate_controller
+        if rate_controller is not None:
+            concurrency = rate_controller.get_concurrency()
+            if (concurrency is not None) and (num_pending >= concurrency):
+                return False
+        return True
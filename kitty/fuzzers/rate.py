@@ -0,0 +1,194 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+'''
+Rate controllers decide how long the fuzzer waits between tests,
+and how many tests may be in flight at a time,
+based on the latency and the reports of the previous tests.
+'''
+import math
+import time
+from threading import Lock
+from kitty.core import KittyException, KittyObject
+
+
+class RateController(KittyObject):
+    '''
+    Base class for rate controllers.
+    This controller keeps a fixed delay between tests,
+    the same as :func:`~kitty.fuzzers.base.BaseFuzzer.set_delay_between_tests`.
+    '''
+
+    def __init__(self, delay_secs=0, name='RateController', logger=None):
+        '''
+        :param delay_secs: delay between tests (in seconds) (default: 0)
+        :param name: name of the object (default: RateController)
+        :param logger: logger for the object (default: None)
+        '''
+        super(RateController, self).__init__(name, logger)
+        self._delay_secs = delay_secs
+
+    def update(self, latency, report):
+        '''
+        Called by the fuzzer after each test.
+
+        :param latency: duration of the test (in seconds)
+        :type report: :class:`~kitty.data.report.Report`
+        :param report: the report of the test
+        '''
+        pass
+
+    def get_delay(self):
+        '''
+        Called by the fuzzer before it waits between tests.
+
+        :return: how long to wait before the next test (in seconds)
+        '''
+        return self._delay_secs
+
+    def get_concurrency(self):
+        '''
+        :return: how many tests may be in flight at a time, None if there is no limit
+        '''
+        return None
+
+    def get_info(self):
+        '''
+        :rtype: dict
+        :return: information about the rate controller
+        '''
+        return {'rate/delay': self._delay_secs}
+
+
+class AimdRateController(RateController):
+    '''
+    Token bucket rate controller with additive increase / multiplicative decrease of the rate.
+
+    The rate (tests per second) grows slowly as long as the target responds in time,
+    and drops sharply when the target is congested - when a test fails,
+    or when its latency is much higher than the average latency.
+    The delay between tests is the time until the bucket has a token for the next test,
+    and the concurrency hint is the rate times the average latency (Little's law).
+
+    :example:
+
+        ::
+
+            fuzzer.set_rate_controller(AimdRateController(initial_rate=50, max_rate=1000))
+    '''
+
+    #  Weight of the last test in the average latency
+    LATENCY_WEIGHT = 0.1
+    #  Number of tests before a latency spike is considered congestion
+    LATENCY_MIN_SAMPLES = 10
+
+    def __init__(self, initial_rate=10.0, min_rate=0.1, max_rate=None, increase=1.0, decrease=0.5,
+                 latency_threshold=3.0, burst=1, max_concurrency=None,
+                 name='AimdRateController', logger=None):
+        '''
+        :param initial_rate: initial rate (tests per second) (default: 10.0)
+        :param min_rate: minimal rate (default: 0.1)
+        :param max_rate: maximal rate, None for no limit (default: None)
+        :param increase: rate increase (tests per second) per second of uncongested tests (default: 1.0)
+        :param decrease: rate multiplier on congestion, in range (0, 1) (default: 0.5)
+        :param latency_threshold: a latency higher than the average latency times this is congestion (default: 3.0)
+        :param burst: number of tests that may be run without delay after an idle period (default: 1)
+        :param max_concurrency: maximal concurrency hint, None for no limit (default: None)
+        :param name: name of the object (default: AimdRateController)
+        :param logger: logger for the object (default: None)
+        '''
+        super(AimdRateController, self).__init__(0, name, logger)
+        if not (0 < min_rate <= initial_rate):
+            raise KittyException('initial rate (%s) should be at least min rate (%s) > 0' % (initial_rate, min_rate))
+        if (max_rate is not None) and (max_rate < initial_rate):
+            raise KittyException('max rate (%s) < initial rate (%s)' % (max_rate, initial_rate))
+        if not (0 < decrease < 1):
+            raise KittyException('decrease (%s) not in range (0, 1)' % decrease)
+        self._rate = float(initial_rate)
+        self._min_rate = float(min_rate)
+        self._max_rate = max_rate
+        self._increase = float(increase)
+        self._decrease = decrease
+        self._latency_threshold = latency_threshold
+        self._burst = burst
+        self._max_concurrency = max_concurrency
+        self._lock = Lock()
+        self._tokens = float(burst)
+        self._last_refill = None
+        self._latency = None
+        self._samples = 0
+        self._last_decrease = 0
+        self._congestion_count = 0
+
+    def update(self, latency, report):
+        with self._lock:
+            congested = bool(report.get('failed'))
+            if (self._samples >= self.LATENCY_MIN_SAMPLES) and (latency > self._latency * self._latency_threshold):
+                congested = True
+            if self._latency is None:
+                self._latency = latency
+            else:
+                self._latency += (latency - self._latency) * self.LATENCY_WEIGHT
+            self._samples += 1
+            if congested:
+                self._congestion_count += 1
+                # decrease once per round trip, a burst of slow tests is a single congestion event
+                now = time.time()
+                if now - self._last_decrease > max(self._latency, 1.0 / self._rate):
+                    self._last_decrease = now
+                    self._rate = max(self._min_rate, self._rate * self._decrease)
+                    self.logger.info('congestion detected, rate decreased to %.2f tests/sec', self._rate)
+            else:
+                self._rate += self._increase / self._rate
+                if self._max_rate is not None:
+                    self._rate = min(self._rate, self._max_rate)
+
+    def get_delay(self):
+        with self._lock:
+            now = time.time()
+            if self._last_refill is not None:
+                self._tokens = min(self._burst, self._tokens + (now - self._last_refill) * self._rate)
+            self._last_refill = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+            return -self._tokens / self._rate
+
+    def get_concurrency(self):
+        with self._lock:
+            if self._latency is None:
+                concurrency = 1
+            else:
+                concurrency = max(1, int(math.ceil(self._rate * self._latency)))
+            if self._max_concurrency is not None:
+                concurrency = min(concurrency, self._max_concurrency)
+            return concurrency
+
+    def get_rate(self):
+        '''
+        :return: current rate (tests per second)
+        '''
+        return self._rate
+
+    def get_info(self):
+        info = {
+            'rate/tests per second': '%.2f' % self._rate,
+            'rate/congestion events': self._congestion_count,
+            'rate/concurrency': self.get_concurrency(),
+        }
+        if self._latency is not None:
+            info['rate/average latency'] = '%.4f' % self._latency
+        return info
@@ -15,10 +15,203 @@
 # You should have received a copy of the GNU General Public License
 # along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
 
+import time
 import traceback
+import Queue
+from threading import Thread, Event, Lock
+from kitty.core import KittyException
 from kitty.fuzzers.base import BaseFuzzer
 
 
+class _PreparedTest(object):
+    '''
+    A test that was prepared by the pipeline before it is run
+    '''
+
+    def __init__(self, index, sequence, test_info, payloads):
+        '''
+        :param index: mutation index of the test
+        :param sequence: sequence of the test
+        :param test_info: description of the test (see _describe_test)
+        :param payloads: rendered payloads of the sequence nodes, None if rendered when transmitted
+        '''
+        self.index = index
+        self.sequence = sequence
+        self.test_info = test_info
+        self.payloads = payloads
+        # set when the test is over, the pipeline waits for it before mutating a test that is rendered when transmitted
+        self.done = Event()
+
+
+def _describe_test(model):
+    '''
+    The full test info of the model renders the mutated template again,
+    so prepared tests only keep a short description of the test,
+    which does not change when the model is mutated to the next tests.
+
+    :param model: the model, at the mutation index of the test
+    :return: description of the current test of the model
+    '''
+    return {
+        'sequence/current': model.get_sequence_str(),
+        'current mutation index': '%s/%s' % (model.current_index(), model.last_index()),
+    }
+
+
+def _prepare_test(model):
+    '''
+    :param model: the model, at the mutation index of the test
+    :return: _PreparedTest for the current test of the model
+    '''
+    sequence = model.get_sequence()
+    payloads = []
+    for edge in sequence:
+        node = edge.dst
+        if hasattr(node, 'get_dynamic_fields') and node.get_dynamic_fields():
+            payloads = None
+            break
+        payloads.append(node.render().tobytes())
+    return _PreparedTest(model.current_index(), sequence, _describe_test(model), payloads)
+
+
+class _PreparedTestModel(object):
+    '''
+    Stands for the model in a fuzzer that runs prepared tests,
+    it provides the state of the prepared test that is currently run.
+    '''
+
+    def __init__(self, model, lock):
+        '''
+        :param model: the model the tests are prepared from
+        :param lock: lock for the model
+        '''
+        self._model = model
+        self._lock = lock
+        self._current = None
+        # index of the model before any test was prepared, the model itself may move ahead of it
+        self._initial_index = model.current_index()
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    def set_test(self, test):
+        '''
+        :param test: the prepared test that is currently run
+        '''
+        self._current = test
+
+    def current_index(self):
+        return self._current.index if self._current else self._initial_index
+
+    def get_sequence(self):
+        return self._current.sequence[:]
+
+    def get_sequence_str(self):
+        return '->'.join(e.dst.name for e in self._current.sequence)
+
+    def get_test_info(self):
+        return dict(self._current.test_info)
+
+    def get_payloads(self):
+        '''
+        :return: rendered payloads of the current test, None if they should be rendered when transmitted
+        '''
+        return self._current.payloads
+
+    def feedback(self, report):
+        with self._lock:
+            self._model.feedback(report)
+
+    def get_state(self):
+        with self._lock:
+            return self._model.get_state()
+
+
+class _PipelinedModel(_PreparedTestModel):
+    '''
+    Prepares the next tests of a model in a separate thread, while the current test runs.
+    The fuzzer uses it instead of the model, and it provides the state of the test that is currently run.
+
+    The payloads of a test are rendered in advance, unless one of its templates has
+    Dynamic fields, whose values are only known when the test is run.
+    In such case, the pipeline stops at this test until it is over,
+    and the payloads are rendered when transmitted.
+    '''
+
+    def __init__(self, model, depth, end_index, logger):
+        '''
+        :param model: the model to prepare the tests of
+        :param depth: maximal number of prepared tests
+        :param end_index: last mutation index to prepare
+        :param logger: logger for the pipeline
+        '''
+        super(_PipelinedModel, self).__init__(model, Lock())
+        self._end_index = end_index
+        self._logger = logger
+        self._queue = Queue.Queue(maxsize=depth)
+        self._stop_event = Event()
+        self._thread = None
+        self._finished = False
+        self._error = None
+
+    def start(self):
+        self._thread = Thread(target=self._produce)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._current:
+            self._current.done.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _produce(self):
+        try:
+            while not self._stop_event.is_set():
+                with self._lock:
+                    if (self._model.current_index() >= self._end_index) or (not self._model.mutate()):
+                        break
+                    test = _prepare_test(self._model)
+                self._put(test)
+                if test.payloads is None:
+                    while not (test.done.wait(0.1) or self._stop_event.is_set()):
+                        pass
+        except Exception as e:
+            self._logger.error('Error occurred while preparing test: %s', repr(e))
+            self._logger.error(traceback.format_exc())
+            self._error = e
+        self._put(None)
+
+    def _put(self, test):
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(test, timeout=0.1)
+                return
+            except Queue.Full:
+                pass
+
+    def mutate(self):
+        '''
+        Move to the next prepared test
+
+        :return: True if moved to the next test, False if there are no more tests
+        '''
+        if self._current:
+            self._current.done.set()
+        if self._finished:
+            return False
+        test = self._queue.get()
+        if test is None:
+            self._finished = True
+            if self._error:
+                raise self._error
+            return False
+        self._current = test
+        return True
+
+
 class ServerFuzzer(BaseFuzzer):
     '''
     ServerFuzzer is a class that is designed to fuzz servers.
@@ -34,21 +227,50 @@ class ServerFuzzer(BaseFuzzer):
         :param option_line: cmd line options to the fuzzer
         '''
         super(ServerFuzzer, self).__init__(name, logger, option_line)
+        self._pipeline_depth = 0
+
+    def set_pipeline_depth(self, depth):
+        '''
+        Prepare (mutate and render) up to [depth] tests in advance in a separate thread,
+        so rendering overlaps with the communication with the target.
+        The tests are still run in the same order.
+        As the model is ahead of the test that is run, pipelining can not be used
+        with adaptive models (their feedback would apply to a later test)
+        or with models that have edge callbacks (they would modify templates that were already rendered).
+
+        :param depth: maximal number of tests to prepare in advance, 0 to disable (default: 0)
+        '''
+        self._pipeline_depth = depth
+        return self
 
     def _start(self):
+        model = self.model
+        if self._pipeline_depth:
+            if model.is_adaptive():
+                raise KittyException('pipelining can not be used with an adaptive model')
+            if model.has_callbacks():
+                raise KittyException('pipelining can not be used with a model that has edge callbacks')
         self._start_message()
         self.target.setup()
 
-        self.logger.info('should keep running? %s' % self._keep_running())
-        while self._keep_running() and self.model.mutate():
-            sequence = self.model.get_sequence()
-            try:
-                self._run_sequence(sequence)
-            except Exception as e:
-                self.logger.error('Error occurred while fuzzing: %s', repr(e))
-                self.logger.error(traceback.format_exc())
-                break
-        self._end_message()
+        if self._pipeline_depth:
+            self.model = _PipelinedModel(model, self._pipeline_depth, self.session_info.end_index, self.logger)
+            self.model.start()
+        try:
+            self.logger.info('should keep running? %s' % self._keep_running())
+            while self._keep_running() and self._mutate():
+                sequence = self.model.get_sequence()
+                try:
+                    self._run_sequence(sequence)
+                except Exception as e:
+                    self.logger.error('Error occurred while fuzzing: %s', repr(e))
+                    self.logger.error(traceback.format_exc())
+                    break
+            self._end_message()
+        finally:
+            if self.model is not model:
+                self.model.stop()
+                self.model = model
 
     def _run_sequence(self, sequence):
         '''
@@ -58,28 +280,47 @@ class ServerFuzzer(BaseFuzzer):
         self._pre_test()
         session_data = self.target.get_session_data()
         self._test_info()
+        payloads = self._get_prepared_payloads()
         resp = None
-        for edge in sequence:
+        for i, edge in enumerate(sequence):
             if edge.callback:
                 edge.callback(self, edge, resp)
-            session_data = self.target.get_session_data()
             node = edge.dst
-            node.set_session_data(session_data)
-            resp = self._transmit(node)
+            if payloads is None:
+                session_data = self.target.get_session_data()
+                with self._model_lock:
+                    node.set_session_data(session_data)
+                    payload = node.render().tobytes()
+                resp = self._transmit(node, payload)
+            else:
+                resp = self._transmit(node, payloads[i])
+            self._record_response(resp)
         self._post_test()
 
-    def _transmit(self, node):
+    def _get_prepared_payloads(self):
+        '''
+        :return: payloads of the current test if they were rendered in advance, None otherwise
+        '''
+        return self.model.get_payloads() if self._pipeline_depth else None
+
+    def _transmit(self, node, payload=None):
         '''
         Transmit node data to target.
 
         :type node:  Template
         :param node: node to transmit
+        :param payload: rendered node data, if rendered in advance (default: None)
         :return: response if there is any
         '''
-        payload = node.render().tobytes()
-        self._last_payload = payload
+        if payload is None:
+            with self._model_lock:
+                payload = node.render().tobytes()
+        self._record_payload(payload, node.get_name())
+        start_time = time.time()
         try:
             return self.target.transmit(payload)
         except Exception as e:
             self.logger.error('Error in transmit: %s', e)
             raise
+        finally:
+            self._transmit_latency = (self._transmit_latency or 0) + time.time() - start_time
@@ -24,11 +24,19 @@ import time
 from urlparse import urlparse, parse_qs
 import os
 
+from kitty.core import KittyException
 from kitty.interfaces.base import EmptyInterface
 from kitty.core.threading_utils import FuncThread
 from kitty.data.data_manager import DataManagerTask
 
 
+class _BadRequestError(KittyException):
+    '''
+    The query parameters of an API request are invalid
+    '''
+    pass
+
+
 class _WebInterfaceServer(BaseHTTPServer.HTTPServer):
     '''
     http://docs.python.org/lib/module-BaseHTTPServer.html
@@ -59,6 +67,12 @@ class _WebInterfaceHandler(BaseHTTPServer.BaseHTTPRequestHandler):
     '''
     Our HTTP request handler
     '''
+
+    #  Maximal number of report summaries in a single response
+    MAX_QUERY_LIMIT = 1000
+    #  Maximal time to wait for the session data (in seconds)
+    DATA_TIMEOUT = 10
+
     def __init__(self, request, client_address, server):
         '''
         :param request: the request from the client
@@ -158,23 +172,108 @@ class _WebInterfaceHandler(BaseHTTPServer.BaseHTTPRequestHandler):
             eta = average_test_time * tests_left
             return str(datetime.timedelta(seconds=int(eta)))
 
+    def _read_data(self, task):
+        '''
+        :type task: function(:class:`~kitty.data.data_manager.DataManager`) -> object
+        :param task: read-only task
+        :return: result of the task
+        '''
+        return self.data.submit_read_task(DataManagerTask(task)).get_results(self.DATA_TIMEOUT)
+
     def _get_test_info(self):
         def get_test_info_task(dataman):
             return dataman.get_test_info()
-        test_info = self.data.submit_task(DataManagerTask(get_test_info_task)).get_results()
+        test_info = self._read_data(get_test_info_task)
         return test_info
 
-    def _get_report_list(self):
+    def _get_report_count(self):
         def task(dataman):
             manager = dataman.get_reports_manager()
-            return manager.get_report_test_ids()
-        return self.data.submit_task(DataManagerTask(task)).get_results()
+            return manager.count()
+        return self._read_data(task)
+
+    def _get_int_param(self, query, name, default=None):
+        '''
+        :param query: parsed query of the request
+        :param name: name of the parameter
+        :param default: value if the parameter is not in the query (default: None)
+        :raises: _BadRequestError if the value is not an integer
+        :return: integer value of the parameter
+        '''
+        if name not in query:
+            return default
+        try:
+            return int(query[name][0])
+        except ValueError:
+            raise _BadRequestError('%s is not an integer: %s' % (name, query[name][0]))
+
+    def _get_offset(self, query):
+        '''
+        :param query: parsed query of the request
+        :raises: _BadRequestError if the offset is not a non-negative integer
+        :return: offset of the first result (default: 0)
+        '''
+        offset = self._get_int_param(query, 'offset', 0)
+        if offset < 0:
+            raise _BadRequestError('offset is negative: %d' % offset)
+        return offset
+
+    def _get_limit(self, query):
+        '''
+        :param query: parsed query of the request
+        :raises: _BadRequestError if the limit is not an integer
+        :return: maximal number of results, between 1 and MAX_QUERY_LIMIT (default: 100)
+        '''
+        limit = self._get_int_param(query, 'limit', 100)
+        return max(1, min(limit, self.MAX_QUERY_LIMIT))
+
+    def _get_report_query(self):
+        '''
+        Query the report summaries, the query parameters are the parameters of
+        :func:`~kitty.data.data_manager.ReportsTable.query`, e.g.
+        /api/reports?failed=1&sort=-timestamp&offset=0&limit=50
+        '''
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        kwargs = {}
+        for k in ['reason', 'template', 'sort']:
+            if k in query:
+                kwargs[k] = query[k][0]
+        for k in ['failed', 'min_test_id', 'max_test_id', 'bucket']:
+            if k in query:
+                kwargs[k] = self._get_int_param(query, k)
+        kwargs['offset'] = self._get_offset(query)
+        kwargs['limit'] = self._get_limit(query)
+
+        def task(dataman):
+            manager = dataman.get_reports_manager()
+            try:
+                total, summaries = manager.query(**kwargs)
+                return {'total': total, 'offset': kwargs['offset'], 'reports': summaries}
+            except Exception as ex:
+                return {'error': str(ex)}
+        return json.dumps(self._read_data(task))
+
+    def _get_buckets(self):
+        '''
+        Get the failure buckets, largest first, e.g. /api/buckets?offset=0&limit=50
+        '''
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        offset = self._get_offset(query)
+        limit = self._get_limit(query)
+
+        def task(dataman):
+            manager = dataman.get_reports_manager().get_buckets_manager()
+            total, buckets = manager.get_buckets(offset, limit)
+            return {'total': total, 'offset': offset, 'buckets': buckets}
+        return json.dumps(self._read_data(task))
 
     def _get_session_stats(self):
         def task(dataman):
             sessman = dataman.get_session_info_manager()
             return sessman.get_session_info()
-        return self.data.submit_task(DataManagerTask(task)).get_results()
+        return self._read_data(task)
 
     def _get_stats(self):
         is_paused = self.server.interface.is_paused()
@@ -185,7 +284,7 @@ class _WebInterfaceHandler(BaseHTTPServer.BaseHTTPRequestHandler):
             'eta': eta_s,
             'stats': session_info.as_dict(),
             'current_test': self._get_test_info(),
-            'reports': self._get_report_list()
+            'report_count': self._get_report_count()
         }
         return json.dumps(resp_dict)
 
@@ -194,19 +293,32 @@ class _WebInterfaceHandler(BaseHTTPServer.BaseHTTPRequestHandler):
         path = parsed.path.lower()[5:]
 
         response = None
+        status = 200
         data_type = 'text/json'
-        if path == 'stats.json':
-            response = self._get_stats()
-        elif path.startswith('report'):
-            response = self._get_report()
-        elif path == 'action/pause':
-            response = ''
-            self._pause_fuzzer()
-        elif path == 'action/resume':
-            response = ''
-            self._resume_fuzzer()
+        try:
+            if path == 'stats.json':
+                response = self._get_stats()
+            elif path == 'reports':
+                response = self._get_report_query()
+            elif path == 'buckets':
+                response = self._get_buckets()
+            elif path.startswith('report'):
+                response = self._get_report()
+            elif path == 'action/pause':
+                response = ''
+                self._pause_fuzzer()
+            elif path == 'action/resume':
+                response = ''
+                self._resume_fuzzer()
+        except _BadRequestError as ex:
+            status = 400
+            response = json.dumps({'error': str(ex)})
+        except KittyException as ex:
+            # the session data was not read in time (see DATA_TIMEOUT)
+            status = 503
+            response = json.dumps({'error': str(ex)})
         if response:
-            self.send_response(200)
+            self.send_response(status)
             self.send_header('Content-type', data_type)
             self.end_headers()
         return response
@@ -231,7 +343,7 @@ class _WebInterfaceHandler(BaseHTTPServer.BaseHTTPRequestHandler):
                     return manager.get(key)
                 except Exception:
                     return None
-            report = self.data.submit_task(DataManagerTask(task)).get_results()
+            report = self._read_data(task)
             if report:
                 response = {
                     'encoding': encoding,
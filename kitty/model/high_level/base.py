@@ -15,7 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
 
-from kitty.core import KittyObject, khash
+from kitty.core import KittyObject, KittyException, khash
 
 
 class Connection(object):
@@ -45,6 +45,11 @@ class BaseModel(KittyObject):
     .. note:: This class should not be instantiated directly.
     '''
 
+    #  Partition strategy - each shard gets every num_shards-th index
+    PARTITION_STRIDE = 'stride'
+    #  Partition strategy - each shard gets a contiguous block of indices
+    PARTITION_BLOCK = 'block'
+
     def __init__(self, name='BaseModel'):
         '''
         :param name: name of the model (default: BaseModel)
@@ -54,6 +59,7 @@ class BaseModel(KittyObject):
         self._sequence = None
         self._current_index = -1
         self._ready = False
+        self._partition = None
 
     def current_index(self):
         '''
@@ -81,7 +87,7 @@ class BaseModel(KittyObject):
         self._get_ready()
         skipped = 0
         for i in range(count):
-            if self.mutate():
+            if self._next():
                 skipped += 1
             else:
                 break
@@ -89,17 +95,186 @@ class BaseModel(KittyObject):
 
     def mutate(self):
         '''
-        Mutate to next state
+        Mutate to next state.
+        If the model is partitioned, cases that do not belong to the
+        partition are skipped.
+        Cases that are duplicates of earlier cases are skipped as well.
 
         :return: True if mutated, False if not
         '''
         self._get_ready()
+        while True:
+            if self._partition:
+                next_index = self._next_partition_index(self._current_index + 1)
+                if next_index is None:
+                    return False
+                to_skip = next_index - self._current_index - 1
+                if to_skip and (self.skip(to_skip) < to_skip):
+                    return False
+            if not self._next():
+                return False
+            if not self.is_duplicate():
+                return True
+
+    def mutate_to(self, index):
+        '''
+        Mutate to a given index, regardless of the partition.
+        Unlike :func:`~kitty.model.high_level.base.BaseModel.mutate`,
+        the case is not skipped if it is a duplicate of an earlier case,
+        so the caller can check :func:`~kitty.model.high_level.base.BaseModel.is_duplicate`.
+
+        :param index: mutation index, higher than the current index
+        :return: True if mutated, False if the index can not be reached
+        '''
+        self._get_ready()
+        to_skip = index - self._current_index - 1
+        if (to_skip < 0) or (self.skip(to_skip) < to_skip):
+            return False
+        return self._next()
+
+    def _next(self):
+        '''
+        Mutate to the next index, regardless of the partition
+
+        :return: True if mutated, False if not
+        '''
         if self._is_last_index():
             return False
         self._current_index += 1
         self._mutate()
         return True
 
+    def is_duplicate(self):
+        '''
+        The default implementation never detects duplicates.
+
+        :return: True if the current case is a duplicate of an earlier case
+        '''
+        return False
+
+    def is_adaptive(self):
+        '''
+        :return: True if the order of the mutations depends on the feedback of the tests
+        '''
+        return False
+
+    def has_callbacks(self):
+        '''
+        :return: True if the sequences of the model may have edge callbacks
+        '''
+        return False
+
+    def feedback(self, report):
+        '''
+        Called by the fuzzer after each test with the report of the target,
+        so the model can adapt the order of the next mutations.
+        The default implementation does nothing.
+
+        :type report: :class:`~kitty.data.report.Report`
+        :param report: the report of the current test
+        '''
+        pass
+
+    def get_state(self):
+        '''
+        Get a snapshot of the mutation state of the model,
+        including state that is not a function of the mutation index,
+        so the model can be restored with
+        :func:`~kitty.model.high_level.base.BaseModel.set_state`
+
+        :rtype: dict
+        :return: the model state
+        '''
+        return {'current_index': self._current_index}
+
+    def set_state(self, state):
+        '''
+        Restore the model to a state from
+        :func:`~kitty.model.high_level.base.BaseModel.get_state`.
+        The base implementation skips to the mutation index of the state.
+
+        :type state: dict
+        :param state: the model state
+        :raise: KittyException if the model was already mutated
+        '''
+        if self._current_index != -1:
+            raise KittyException('state can only be restored to a model that was not mutated')
+        self.skip(state['current_index'] + 1)
+        return self
+
+    def partition(self, num_shards, shard_id, strategy=PARTITION_STRIDE):
+        '''
+        Restrict the model to a single shard of its mutation index space,
+        so multiple fuzzers can split the mutations between them without overlap.
+        The mutation indices are not changed by the partition,
+        so reports of all shards refer to the same test cases.
+
+        :param num_shards: number of shards to split the model to
+        :param shard_id: index of the shard to fuzz (0 <= shard_id < num_shards)
+        :param strategy: BaseModel.PARTITION_STRIDE or BaseModel.PARTITION_BLOCK (default: PARTITION_STRIDE)
+        :raise: KittyException if the partition parameters are invalid
+
+        :example:
+
+            ::
+
+                # fuzz the 4th shard out of 32 shards
+                model.partition(32, 3)
+        '''
+        if strategy not in [BaseModel.PARTITION_STRIDE, BaseModel.PARTITION_BLOCK]:
+            raise KittyException('invalid partition strategy: %s' % strategy)
+        if num_shards < 1:
+            raise KittyException('number of shards (%d) < 1' % num_shards)
+        if not (0 <= shard_id < num_shards):
+            raise KittyException('shard id (%d) not in range [0, %d)' % (shard_id, num_shards))
+        self._partition = (num_shards, shard_id, strategy)
+        return self
+
+    def get_partition(self):
+        '''
+        :return: tuple of (num_shards, shard_id, strategy), or None if the model is not partitioned
+        '''
+        return self._partition
+
+    def in_partition(self, index):
+        '''
+        :param index: mutation index
+        :return: True if the mutation index belongs to the model's partition
+        '''
+        if (index < 0) or (index > self.last_index()):
+            return False
+        return self._next_partition_index(index) == index
+
+    def _block_range(self):
+        '''
+        :return: (first, last) indices of the block of a block partition
+        '''
+        num_shards, shard_id, _ = self._partition
+        block, remainder = divmod(self.num_mutations(), num_shards)
+        first = shard_id * block + min(shard_id, remainder)
+        size = block + (1 if shard_id < remainder else 0)
+        return first, first + size - 1
+
+    def _next_partition_index(self, index):
+        '''
+        :param index: mutation index
+        :return: the first index in the partition that is not lower than index, None if there is no such index
+        '''
+        if not self._partition:
+            next_index = index
+        else:
+            num_shards, shard_id, strategy = self._partition
+            if strategy == BaseModel.PARTITION_STRIDE:
+                next_index = index + ((shard_id - index) % num_shards)
+            else:
+                first, last = self._block_range()
+                next_index = max(index, first)
+                if next_index > last:
+                    return None
+        if next_index > self.last_index():
+            return None
+        return next_index
+
     def get_model_info(self):
         '''
         :rtype: dict
@@ -117,6 +292,8 @@ class BaseModel(KittyObject):
             'sequence/current': self.get_sequence_str(),
             'current mutation index': '%s/%s' % (self._current_index, self.last_index())
         }
+        if self._partition:
+            res['partition'] = '%s %s/%s' % (self._partition[2], self._partition[1], self._partition[0])
         return res
 
     def get_sequence(self):
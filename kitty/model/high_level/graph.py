@@ -19,6 +19,9 @@
 Model with a graph structure, all paths in the graph will be fuzzed.
 The last node in each path will be mutated until exhaustion.
 '''
+import math
+import hashlib
+from bisect import bisect_right
 from kitty.model.high_level.base import BaseModel
 from kitty.model.high_level.base import Connection
 from kitty.core import KittyException, khash
@@ -32,6 +35,201 @@ class _RootNode(object):
         return khash(self.get_name())
 
 
+class _AdaptiveSchedule(object):
+    '''
+    Decide which unit (range of mutations of a single field in a single path)
+    is mutated next, based on the feedback of the previous tests.
+    The mutations of each unit are performed in their original order,
+    every unit is mutated at least once before any unit is mutated again,
+    and from then on, the unit with the highest priority is selected -
+    the decaying average of the rewards of its tests, with a bonus for rarely tested units.
+    '''
+
+    #  Reward for a test that caused a failure
+    FAILURE_REWARD = 1.0
+    #  Reward for a test that got a response which was not seen before
+    NOVEL_RESPONSE_REWARD = 0.5
+    #  Reward for a test that got a response length that differs from the previous one of the unit
+    LENGTH_CHANGE_REWARD = 0.25
+    #  Reward for a test with an exceptionally long response time
+    LATENCY_OUTLIER_REWARD = 0.25
+    #  Weight of a new reward in the decaying average of a unit
+    DECAY = 0.3
+    #  Weight of the bonus for rarely tested units
+    EXPLORATION = 0.1
+    #  Number of standard deviations above the mean latency for a latency outlier
+    LATENCY_DEVIATIONS = 3
+    #  Minimal number of latency samples before detecting outliers
+    LATENCY_MIN_SAMPLES = 30
+    #  Maximal number of response hashes to remember
+    MAX_RESPONSE_HASHES = 0x10000
+
+    def __init__(self, units, batch):
+        '''
+        :param units: list of (sequence index, name, first mutation index, mutation count)
+        :param batch: number of consecutive mutations of a unit before selecting the next unit
+        '''
+        self.units = units
+        self.batch = batch
+        self.cursors = [0] * len(units)
+        self.scores = [0.0] * len(units)
+        self.last_lengths = [None] * len(units)
+        self.remaining = {}
+        for seq_idx, _, _, count in units:
+            self.remaining[seq_idx] = self.remaining.get(seq_idx, 0) + count
+        self.total = 0
+        self.current = None
+        self.left_in_batch = 0
+        self.response_hashes = set([])
+        self.latency_count = 0
+        self.latency_mean = 0.0
+        self.latency_m2 = 0.0
+
+    def _select(self):
+        '''
+        :return: index of the next unit to mutate, None if all units are exhausted
+        '''
+        best = None
+        best_priority = None
+        log_total = math.log(self.total + 1)
+        for i, unit in enumerate(self.units):
+            tested = self.cursors[i]
+            if tested >= unit[3]:
+                continue
+            if not tested:
+                return i
+            priority = self.scores[i] + self.EXPLORATION * math.sqrt(log_total / tested)
+            if (best is None) or (priority > best_priority):
+                best = i
+                best_priority = priority
+        return best
+
+    def advance(self, count):
+        '''
+        Advance the schedule by count mutations, without feedback for the skipped ones.
+
+        :param count: number of mutations to advance
+        :return: (sequence index, node mutation index) of the last mutation
+        '''
+        while count:
+            current = self.current
+            if (current is None) or (not self.left_in_batch) or (self.cursors[current] >= self.units[current][3]):
+                current = self._select()
+                if current is None:
+                    raise KittyException('Internal error in adaptive schedule. all units are exhausted')
+                self.current = current
+                self.left_in_batch = self.batch
+            step = min(count, self.left_in_batch, self.units[current][3] - self.cursors[current])
+            self.cursors[current] += step
+            self.remaining[self.units[current][0]] -= step
+            self.left_in_batch -= step
+            self.total += step
+            count -= step
+        seq_idx, _, first, _ = self.units[self.current]
+        return seq_idx, first + self.cursors[self.current] - 1
+
+    def is_exhausted(self, seq_idx):
+        '''
+        :param seq_idx: sequence index
+        :return: True if all mutations of the sequence were performed
+        '''
+        return not self.remaining[seq_idx]
+
+    def get_current_unit(self):
+        '''
+        :return: (name, score) of the current unit
+        '''
+        return self.units[self.current][1], self.scores[self.current]
+
+    def feedback(self, report):
+        '''
+        Update the score of the current unit with the reward of the current test.
+
+        :param report: the report of the current test
+        '''
+        if self.current is None:
+            return
+        reward = 0.0
+        if report.get('failed'):
+            reward += self.FAILURE_REWARD
+        if report.get('novel responses'):
+            reward += self.NOVEL_RESPONSE_REWARD
+        transmission = self._get_last_transmission(report)
+        if transmission:
+            response = transmission.get('response (raw)')
+            if response is not None:
+                if report.get('novel responses') is None:
+                    # the fuzzer does not track novelty, check it locally
+                    response_hash = hash(response)
+                    if response_hash not in self.response_hashes:
+                        if len(self.response_hashes) < self.MAX_RESPONSE_HASHES:
+                            self.response_hashes.add(response_hash)
+                        reward += self.NOVEL_RESPONSE_REWARD
+                length = len(response)
+                last_length = self.last_lengths[self.current]
+                if (last_length is not None) and (length != last_length):
+                    reward += self.LENGTH_CHANGE_REWARD
+                self.last_lengths[self.current] = length
+            request_time = transmission.get('request time')
+            response_time = transmission.get('response time')
+            if (request_time is not None) and (response_time is not None):
+                if self._is_latency_outlier(response_time - request_time):
+                    reward += self.LATENCY_OUTLIER_REWARD
+        reward = min(reward, 1.0)
+        score = self.scores[self.current]
+        self.scores[self.current] = score + self.DECAY * (reward - score)
+
+    def get_state(self):
+        '''
+        :return: the state of the schedule that is not a function of the mutation index
+        '''
+        return {
+            'cursors': self.cursors[:],
+            'scores': self.scores[:],
+            'last_lengths': self.last_lengths[:],
+            'remaining': dict(self.remaining),
+            'total': self.total,
+            'current': self.current,
+            'left_in_batch': self.left_in_batch,
+            'response_hashes': set(self.response_hashes),
+            'latency': (self.latency_count, self.latency_mean, self.latency_m2),
+        }
+
+    def set_state(self, state):
+        '''
+        :param state: schedule state from get_state
+        '''
+        self.cursors = state['cursors'][:]
+        self.scores = state['scores'][:]
+        self.last_lengths = state['last_lengths'][:]
+        self.remaining = dict(state['remaining'])
+        self.total = state['total']
+        self.current = state['current']
+        self.left_in_batch = state['left_in_batch']
+        self.response_hashes = set(state['response_hashes'])
+        self.latency_count, self.latency_mean, self.latency_m2 = state['latency']
+
+    def _get_last_transmission(self, report):
+        names = [n for n in (report.get('sub_reports') or []) if n.startswith('transmission_')]
+        if not names:
+            return None
+        return report.get(max(names))
+
+    def _is_latency_outlier(self, latency):
+        '''
+        Check if the latency is an outlier, and add it to the running (Welford) statistics.
+        '''
+        outlier = False
+        if self.latency_count >= self.LATENCY_MIN_SAMPLES:
+            stddev = math.sqrt(self.latency_m2 / (self.latency_count - 1))
+            outlier = latency > self.latency_mean + self.LATENCY_DEVIATIONS * stddev
+        self.latency_count += 1
+        delta = latency - self.latency_mean
+        self.latency_mean += delta / self.latency_count
+        self.latency_m2 += delta * (latency - self.latency_mean)
+        return outlier
+
+
 class GraphModel(BaseModel):
     '''
     The GraphModel is built of a simple digraph, where the nodes are templates, and on each edge there's a callback function.
@@ -87,8 +285,39 @@ class GraphModel(BaseModel):
                     logger.error('Got an empty response for request %s' % edge.src.get_name())
 
             model.connect(A, B, log_if_empty_response)
+
+    By default, each path is fuzzed until exhaustion before moving to the next one.
+    To get early coverage of all the paths, the mutations of the paths can be
+    interleaved in rounds, where each round performs a quota of mutations on each path.
+    The scheduling is deterministic, so each mutation index still identifies a single test.
+
+    :example:
+
+        ::
+
+            # 10 mutations of D for each single mutation of any other path
+            model.set_scheduling(GraphModel.SCHEDULE_INTERLEAVED, quotas={'A->B->D': 10, 'A->C->D': 10})
+
+    The scheduling can also adapt to the behavior of the target.
+    In the adaptive scheduling, each field of each path is a separate unit.
+    Each unit is mutated at least once, and from then on, the fuzzer's
+    feedback (failures, new responses, response length changes and slow responses)
+    steers the fuzzing toward the units that produce new behavior.
+    The mutations of each unit are still performed in their order, and all of
+    them are performed eventually.
+
+    .. note:: In the adaptive scheduling, the mutation order depends on the feedback,
+        so a mutation index does not identify a single test across sessions,
+        and the model can not be partitioned.
     '''
 
+    #  Scheduling strategy - fuzz the paths one after the other
+    SCHEDULE_SEQUENTIAL = 'sequential'
+    #  Scheduling strategy - interleave the mutations of all paths in rounds
+    SCHEDULE_INTERLEAVED = 'interleaved'
+    #  Scheduling strategy - prioritize the fields that produce new behavior
+    SCHEDULE_ADAPTIVE = 'adaptive'
+
     def __init__(self, name='GraphModel'):
         '''
         :param name: name for this model
@@ -102,6 +331,40 @@ class GraphModel(BaseModel):
         self._current_node = None
         self._unique_set = set([])
         self._duplication_count = 0
+        self._duplicate = False
+        self._schedule = GraphModel.SCHEDULE_SEQUENTIAL
+        self._quota = 1
+        self._quotas = {}
+        self._segments = None
+        self._segment_starts = None
+        self._unique_sets = {}
+        self._node_positions = {}
+        self._adaptive = None
+
+    def set_scheduling(self, strategy, quota=1, quotas=None):
+        '''
+        Set the order in which the paths of the graph are fuzzed.
+
+        :param strategy: GraphModel.SCHEDULE_SEQUENTIAL, GraphModel.SCHEDULE_INTERLEAVED or GraphModel.SCHEDULE_ADAPTIVE
+        :param quota: number of consecutive mutations of each path in a round,
+            or of each field in the adaptive scheduling (default: 1)
+        :type quotas: dict
+        :param quotas: quota for specific paths, keyed by the path string (e.g. 'A->B->D') (default: None)
+        :raise: KittyException if the strategy or quotas are invalid, or if the model was already mutated
+        '''
+        if strategy not in [GraphModel.SCHEDULE_SEQUENTIAL, GraphModel.SCHEDULE_INTERLEAVED, GraphModel.SCHEDULE_ADAPTIVE]:
+            raise KittyException('invalid scheduling strategy: %s' % strategy)
+        quotas = quotas if quotas else {}
+        for q in [quota] + quotas.values():
+            if q < 1:
+                raise KittyException('scheduling quota (%d) < 1' % q)
+        if self._current_index != -1:
+            raise KittyException('scheduling can not be changed after the model was mutated')
+        self._schedule = strategy
+        self._quota = quota
+        self._quotas = dict(quotas)
+        self._ready = False
+        return self
 
     def _get_ready(self):
         if not self._ready:
@@ -112,9 +375,87 @@ class GraphModel(BaseModel):
             for sequence in self._sequences:
                 num += sequence[-1].dst.num_mutations()
             self._num_mutations = num
+            if self._schedule == GraphModel.SCHEDULE_INTERLEAVED:
+                self._segments = self._calculate_segments()
+                self._segment_starts = [segment[0] for segment in self._segments]
+            elif self._schedule == GraphModel.SCHEDULE_ADAPTIVE:
+                if self._partition:
+                    raise KittyException('adaptive scheduling can not be used with a partitioned model')
+                self._adaptive = _AdaptiveSchedule(self._get_units(), self._quota)
             self._ready = True
             self._update_state(0)
 
+    def _get_path_quota(self, sequence):
+        path = '->'.join(e.dst.get_name() for e in sequence)
+        return self._quotas.get(path, self._quota)
+
+    def _calculate_segments(self):
+        '''
+        Split the interleaved rounds to segments of rounds with the same structure.
+        In each round, every path contributes its quota, except for its last round,
+        in which it contributes the remaining mutations.
+
+        :return: list of (start index, first round, round count, round size, [(sequence index, mutations in round)])
+        '''
+        paths = []
+        for i, sequence in enumerate(self._sequences):
+            size = sequence[-1].dst.num_mutations()
+            if size:
+                quota = self._get_path_quota(sequence)
+                paths.append((i, size, quota, (size + quota - 1) // quota))
+        bounds = set([0])
+        for _, _, _, rounds in paths:
+            bounds.add(rounds - 1)
+            bounds.add(rounds)
+        bounds = sorted(bounds)
+        segments = []
+        start = 0
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            parts = []
+            for i, size, quota, rounds in paths:
+                if first < rounds - 1:
+                    parts.append((i, quota))
+                elif first == rounds - 1:
+                    parts.append((i, size - first * quota))
+            round_size = sum(count for _, count in parts)
+            if round_size:
+                segments.append((start, first, last - first, round_size, parts))
+                start += round_size * (last - first)
+        return segments
+
+    def _get_units(self):
+        '''
+        Split the mutations of the graph to units, one per field in each path.
+
+        :return: list of (sequence index, unit name, first mutation index, mutation count)
+        '''
+        units = []
+        for i, sequence in enumerate(self._sequences):
+            node = sequence[-1].dst
+            num_mutations = node.num_mutations()
+            path = '->'.join(e.dst.get_name() for e in sequence)
+            ranges = node.get_mutation_ranges() if hasattr(node, 'get_mutation_ranges') else []
+            if sum(count for _, _, count in ranges) != num_mutations:
+                ranges = [(node.get_name(), 0, num_mutations)] if num_mutations else []
+            for field_path, first, count in ranges:
+                units.append((i, '%s:%s' % (path, field_path), first, count))
+        return units
+
+    def _locate(self, index):
+        '''
+        :param index: mutation index of the model
+        :return: tuple of (sequence index, mutation index of the sequence's last node)
+        '''
+        segment_idx = bisect_right(self._segment_starts, index) - 1
+        start, first, _, round_size, parts = self._segments[segment_idx]
+        round_idx, offset = divmod(index - start, round_size)
+        for seq_idx, count in parts:
+            if offset < count:
+                quota = self._get_path_quota(self._sequences[seq_idx])
+                return seq_idx, (first + round_idx) * quota + offset
+            offset -= count
+        raise KittyException('Internal error in locate. index (%#x) out of range' % index)
+
     def _get_node(self):
         return self._current_node
 
@@ -126,6 +467,13 @@ class GraphModel(BaseModel):
 
     def skip(self, count):
         self._get_ready()
+        if self._schedule != GraphModel.SCHEDULE_SEQUENTIAL:
+            # nodes are positioned on the next mutation, no need to touch them now
+            skipped = min(count, self.last_index() - self._current_index)
+            if skipped and self._adaptive:
+                self._adaptive.advance(skipped)
+            self._current_index += skipped
+            return skipped
         skipped = 0
         for i in range(self._sequence_idx, len(self._sequences)):
             if skipped == count:
@@ -141,19 +489,94 @@ class GraphModel(BaseModel):
         return skipped
 
     def _mutate(self):
+        if self._schedule != GraphModel.SCHEDULE_SEQUENTIAL:
+            return self._mutate_scheduled()
         for i in range(self._sequence_idx, len(self._sequences)):
             self._update_state(i)
             node = self._get_node()
-            while node.mutate():
-                rendered = node.render().tobytes()
-                if rendered not in self._unique_set:
-                    self._unique_set.add(rendered)
-                    return
-                self._current_index += 1
-                self._duplication_count += 1
+            if node.mutate():
+                rendered = hashlib.md5(node.render().tobytes()).digest()
+                self._set_duplicate(rendered, self._unique_set)
+                return
             node.reset()
             self._unique_set = set([])
 
+    def _mutate_scheduled(self):
+        if self._adaptive:
+            seq_idx, node_idx = self._adaptive.advance(1)
+        else:
+            seq_idx, node_idx = self._locate(self._current_index)
+        self._update_state(seq_idx)
+        node = self._get_node()
+        self._position_node(node, node_idx)
+        rendered = hashlib.md5(node.render().tobytes()).digest()
+        unique_set = self._unique_sets.setdefault(seq_idx, set([]))
+        if self._adaptive:
+            path_done = self._adaptive.is_exhausted(seq_idx)
+        else:
+            path_done = node_idx == node.num_mutations() - 1
+        if path_done:
+            # last mutation of the path, no need to remember its payloads
+            del self._unique_sets[seq_idx]
+        self._set_duplicate(rendered, unique_set)
+
+    def _set_duplicate(self, rendered, unique_set):
+        '''
+        Mark the current mutation as a duplicate if its payload was already
+        rendered. The mutation index is not advanced here, so the caller
+        decides whether to skip the duplicate or run it at its exact index.
+
+        :param rendered: digest of the rendered payload
+        :param unique_set: set of digests of the payloads of the current path
+        '''
+        self._duplicate = rendered in unique_set
+        if self._duplicate:
+            self._duplication_count += 1
+        else:
+            unique_set.add(rendered)
+
+    def is_duplicate(self):
+        '''
+        :return: True if the payload of the current mutation was already rendered in the current path
+        '''
+        return self._duplicate
+
+    def _position_node(self, node, index):
+        '''
+        Bring the mutated node to a given mutation index.
+        As nodes may be shared between paths, the other nodes in the current
+        sequence are reset, so they will be rendered with their default values.
+
+        :param node: the mutated node
+        :param index: mutation index of the node
+        '''
+        for conn in self._sequence[:-1]:
+            if self._node_positions.get(conn.dst, -1) != -1:
+                conn.dst.reset()
+                self._node_positions[conn.dst] = -1
+        position = self._node_positions.get(node, -1)
+        if position >= index:
+            node.reset()
+            position = -1
+        node.skip(index - position - 1)
+        node.mutate()
+        self._node_positions[node] = index
+
+    def is_adaptive(self):
+        return self._schedule == GraphModel.SCHEDULE_ADAPTIVE
+
+    def has_callbacks(self):
+        return any(conn.callback for conns in self._graph.values() for conn in conns)
+
+    def feedback(self, report):
+        '''
+        Update the adaptive scheduling with the report of the current test.
+
+        :param report: the report of the current test
+        '''
+        if self._adaptive:
+            self._adaptive.feedback(report)
+
     def connect(self, src, dst=None, callback=None):
         '''
         :param src: source node, if dst is None it will be destination node and the root (dummy) node will be source
@@ -190,13 +613,35 @@ class GraphModel(BaseModel):
                 t_hashed = conn.dst.hash()
                 self.logger.info('hash of template %s is %s' % (conn.dst.get_name(), t_hashed))
                 hashed = khash(hashed, t_hashed)
+        if self._schedule != GraphModel.SCHEDULE_SEQUENTIAL:
+            # the scheduling changes the meaning of the mutation indices
+            hashed = khash(hashed, self._schedule, self._quota, str(sorted(self._quotas.items())))
         self.logger.info('hash of model is %s' % hashed)
         return hashed
 
+    def get_state(self):
+        state = super(GraphModel, self).get_state()
+        state['duplication_count'] = self._duplication_count
+        state['unique_set'] = set(self._unique_set)
+        state['unique_sets'] = dict((k, set(v)) for k, v in self._unique_sets.items())
+        if self._adaptive:
+            state['adaptive'] = self._adaptive.get_state()
+        return state
+
+    def set_state(self, state):
+        super(GraphModel, self).set_state(state)
+        self._duplication_count = state['duplication_count']
+        self._unique_set = set(state['unique_set'])
+        self._unique_sets = dict((k, set(v)) for k, v in state['unique_sets'].items())
+        if self._adaptive:
+            self._adaptive.set_state(state['adaptive'])
+        return self
+
     def get_model_info(self):
         info = {}
         info['model name'] = self.name
         info['sequence count'] = len(self._sequences)
+        info['scheduling'] = self._schedule
         return info
 
     def get_test_info(self):
@@ -206,6 +651,10 @@ class GraphModel(BaseModel):
             info['node/%s' % k] = v
         info['sequence/index'] = self._sequence_idx
         info['duplicate (skipped) test count'] = self._duplication_count
+        if self._adaptive and (self._current_index != -1):
+            unit, score = self._adaptive.get_current_unit()
+            info['schedule/unit'] = unit
+            info['schedule/unit score'] = score
         return info
 
     def check_loops_in_grpah(self, current=None, visited=[]):
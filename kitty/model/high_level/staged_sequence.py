@@ -55,6 +55,7 @@ class Stage(KittyObject):
         self._min_sequence = None
         self._max_sequence = None
         self._r = random.Random()
+        self._current_sequence_templates = None
         self._seed = seed
         if seed:
             self._r.seed(seed)
@@ -127,6 +128,24 @@ class Stage(KittyObject):
         '''
         return self._current_sequence_templates
 
+    def get_state(self):
+        '''
+        :return: the RNG state and the current templates of the stage
+        '''
+        templates = self._current_sequence_templates
+        if templates is not None:
+            templates = [self._templates.index(t) for t in templates]
+        return {'random': self._r.getstate(), 'templates': templates}
+
+    def set_state(self, state):
+        '''
+        :param state: stage state from get_state
+        '''
+        self._get_ready()
+        self._r.setstate(state['random'])
+        if state['templates'] is not None:
+            self._current_sequence_templates = tuple(self._templates[i] for i in state['templates'])
+
     def __repr__(self):
         return '%s(%s from %s)' % (self.name, self._strategy, len(self._templates))
 
@@ -188,6 +207,7 @@ class StagedSequenceModel(BaseModel):
         '''
         super(StagedSequenceModel, self).__init__(name)
         self._stages = []
+        self._has_callbacks = bool(callback_generator)
         if not callback_generator:
             def null_generator(src, dst):
                 src = dst
@@ -211,10 +231,20 @@ class StagedSequenceModel(BaseModel):
         if not self._ready:
             self._ready = True
 
+    def has_callbacks(self):
+        return self._has_callbacks
+
     def _mutate(self):
-        current_sequence_templates = []
         for stage in self._stages:
             stage.mutate()
+        self._update_sequence()
+
+    def _update_sequence(self):
+        '''
+        Build the sequence from the current templates of the stages
+        '''
+        current_sequence_templates = []
+        for stage in self._stages:
             current_sequence_templates.extend(stage.get_sequence_templates())
         sequence = []
         cb = self.callback_generator(None, current_sequence_templates[0])
@@ -226,6 +256,25 @@ class StagedSequenceModel(BaseModel):
             prev = t
         self._sequence = sequence
 
+    def get_state(self):
+        state = super(StagedSequenceModel, self).get_state()
+        state['stages'] = [stage.get_state() for stage in self._stages]
+        return state
+
+    def set_state(self, state):
+        '''
+        Restore the RNG state of the stages, instead of replaying the mutations
+        '''
+        if self._current_index != -1:
+            raise KittyException('state can only be restored to a model that was not mutated')
+        self._get_ready()
+        for stage, stage_state in zip(self._stages, state['stages']):
+            stage.set_state(stage_state)
+        self._current_index = state['current_index']
+        if self._current_index != -1:
+            self._update_sequence()
+        return self
+
     def get_model_info(self):
         '''
         :return: dictionary of information about this model
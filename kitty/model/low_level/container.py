@@ -32,6 +32,9 @@ class Container(BaseField):
     A logical unit to group multiple fields together
     '''
     _encoder_type_ = BitsEncoder
+    #  enclosed fields are mutated one after the other, in order
+    #  (only used by classes that do not override _mutate, see _delegates_mutations)
+    _sequential_mutations_ = True
 
     def __init__(self, fields=[], encoder=ENC_BITS_DEFAULT, fuzzable=True, name=None):
         '''
@@ -116,6 +119,33 @@ class Container(BaseField):
             field.reset()
         self._field_idx = 0
 
+    def skip(self, count):
+        '''
+        Skip up to [count] cases.
+        Since the enclosed fields are mutated one after the other,
+        the skip is delegated to the enclosed fields instead of performing
+        each mutation.
+
+        :param count: number of cases to skip
+        :rtype: int
+        :return: number of cases skipped
+        '''
+        if not self._delegates_mutations():
+            return super(Container, self).skip(count)
+        self._get_ready()
+        skipped = 0
+        while (skipped < count) and (not self._exhausted()):
+            field = self._current_field()
+            field_skipped = field.skip(count - skipped)
+            skipped += field_skipped
+            self._current_index += field_skipped
+            if skipped < count:
+                field.reset()
+                self._field_idx += 1
+        if skipped:
+            self._mutating = True
+        return skipped
+
     def resolve_field(self, field):
         '''
         Resolve a field from name
@@ -168,6 +198,17 @@ class Container(BaseField):
             self._calculate_mutations(num)
             self._ready = True
 
+    def _delegates_mutations(self):
+        '''
+        Skips and mutation ranges are delegated to the enclosed fields
+        only if they are mutated one after the other, in order.
+        A subclass that overrides _mutate may mutate them in any other way,
+        so it never delegates.
+
+        :return: True if skips and mutation ranges are delegated to the enclosed fields
+        '''
+        return self._sequential_mutations_ and type(self)._mutate == Container._mutate
+
     def _mutate(self):
         '''
         Mutate enclosed fields
@@ -203,6 +244,45 @@ class Container(BaseField):
         else:
             return super(Container, self).get_info()
 
+    def get_dynamic_fields(self):
+        '''
+        :return: list of the Dynamic fields in the container and its enclosed containers
+        '''
+        res = []
+        for field in self._fields:
+            if isinstance(field, Dynamic):
+                res.append(field)
+            elif isinstance(field, Container):
+                res.extend(field.get_dynamic_fields())
+        return res
+
+    def get_mutation_ranges(self):
+        '''
+        Get the range of mutation indices of each of the enclosed fields.
+        Enclosed containers are split to the ranges of their own fields,
+        unless their fields are not mutated one after the other.
+
+        :return: list of (field path, first mutation index, mutation count), in mutation order
+        '''
+        num_mutations = self.num_mutations()
+        if not num_mutations:
+            return []
+        if not self._delegates_mutations():
+            return [('/'.join(self._get_enclosing_path()), 0, num_mutations)]
+        ranges = []
+        offset = 0
+        for field in self._fields:
+            count = field.num_mutations()
+            if not count:
+                continue
+            if isinstance(field, Container):
+                for path, first, field_count in field.get_mutation_ranges():
+                    ranges.append((path, offset + first, field_count))
+            else:
+                ranges.append(('/'.join(field._get_enclosing_path()), offset, count))
+            offset += count
+        return ranges
+
     def get_tree(self, depth=0):
         '''
         Get a string representation of the field tree
@@ -299,6 +379,7 @@ class ForEach(Container):
     '''
     Perform all mutations of enclosed fields for each mutation of mutated_field
     '''
+    _sequential_mutations_ = False
 
     def __init__(self, mutated_field, fields=[], encoder=ENC_BITS_DEFAULT, fuzzable=True, name=None):
         '''
@@ -358,6 +439,175 @@ class ForEach(Container):
             self._mutated_field.reset()
 
 
+class CoveringArray(Container):
+    '''
+    Mutate the enclosed fields together, so that each combination of values
+    of any [strength] enclosed fields appears in at least one mutation
+    (a t-wise covering array).
+    A field's values are its default value and each of its mutations.
+
+    This covers the interactions between the fields with a fraction of the
+    mutations that nested ForEach containers (the full product) would need.
+    The mutations are based on an orthogonal array of polynomials over a prime field,
+    so each mutation is calculated directly from its index.
+    If the full product is smaller than the array, the full product is used.
+    '''
+    _sequential_mutations_ = False
+
+    def __init__(self, fields=[], strength=2, encoder=ENC_BITS_DEFAULT, fuzzable=True, name=None):
+        '''
+        :param fields: enclosed field(s) (default: [])
+        :param strength: number of fields whose value combinations are covered (default: 2)
+        :type encoder: BitsEncoder
+        :param encoder: encoder for the container (default: ENC_BITS_DEFAULT)
+        :param fuzzable: is container fuzzable (default: True)
+        :param name: (unique) name of the container (default: None)
+
+        :example:
+
+            ::
+
+                CoveringArray([
+                    Group(['GET', 'POST', 'PUT'], name='method'),
+                    Group(['1.0', '1.1'], name='version'),
+                    Group(['close', 'keep-alive'], name='connection'),
+                ])
+                # covers all the pairs of values with 24 mutations (the full product has 35)
+        '''
+        super(CoveringArray, self).__init__(fields=fields, encoder=encoder, fuzzable=fuzzable, name=name)
+        kassert.is_int(strength)
+        if strength < 2:
+            raise KittyException('strength (%d) < 2' % strength)
+        self._strength = strength
+        self._levels = []
+        self._field_levels = []
+        self._columns = []
+        self._prime = None
+        self._product_size = 0
+
+    def copy(self):
+        '''
+        :return: a copy of the container
+        '''
+        dup = super(CoveringArray, self).copy()
+        dup._field_levels = list(self._field_levels)
+        return dup
+
+    def hash(self):
+        hashed = super(CoveringArray, self).hash()
+        return khash(hashed, self._strength)
+
+    def _calculate_mutations(self, num):
+        self._levels = [field.num_mutations() + 1 for field in self._fields]
+        self._field_levels = [0] * len(self._fields)
+        self._columns = [i for i, levels in enumerate(self._levels) if levels > 1]
+        self._product_size = 1
+        for levels in self._levels:
+            self._product_size *= levels
+        self._prime = None
+        num_rows = self._product_size
+        if len(self._columns) > self._strength:
+            prime = self._next_prime(max([len(self._columns)] + self._levels))
+            if prime ** self._strength < num_rows:
+                self._prime = prime
+                num_rows = prime ** self._strength
+        # the first row is the default value of all fields
+        self._num_mutations = num_rows - 1
+
+    def _next_prime(self, num):
+        '''
+        :return: the smallest prime that is not lower than num
+        '''
+        num = max(num, 2)
+        while any(num % d == 0 for d in range(2, int(num ** 0.5) + 1)):
+            num += 1
+        return num
+
+    def _get_row(self, row_idx):
+        '''
+        :param row_idx: index of the row in the array
+        :return: list of the levels of the enclosed fields in the row
+        '''
+        row = [0] * len(self._fields)
+        if self._prime is None:
+            for i, levels in enumerate(self._levels):
+                row_idx, row[i] = divmod(row_idx, levels)
+        else:
+            # row_idx holds the coefficients of a polynomial of degree < strength,
+            # each column is the value of the polynomial at a different point
+            coefficients = []
+            for _ in range(self._strength):
+                row_idx, coefficient = divmod(row_idx, self._prime)
+                coefficients.append(coefficient)
+            for point, i in enumerate(self._columns):
+                value = 0
+                for coefficient in reversed(coefficients):
+                    value = (value * point + coefficient) % self._prime
+                row[i] = value % self._levels[i]
+        return row
+
+    def _set_field_level(self, field_idx, level):
+        '''
+        Bring an enclosed field to a level (0 - default value, n - mutation n-1)
+        '''
+        field = self._fields[field_idx]
+        current = self._field_levels[field_idx]
+        if level == current:
+            return
+        if (level < current) or (level == 0):
+            field.reset()
+            current = 0
+        if level > current + 1:
+            field.skip(level - current - 1)
+        if level:
+            field.mutate()
+        self._field_levels[field_idx] = level
+
+    def _mutate(self):
+        row = self._get_row(self._current_index + 1)
+        for i, level in enumerate(row):
+            self._set_field_level(i, level)
+
+    def skip(self, count):
+        '''
+        Skip up to [count] cases, the mutation is calculated directly from the new index.
+
+        :param count: number of cases to skip
+        :rtype: int
+        :return: number of cases skipped
+        '''
+        self._get_ready()
+        skipped = max(0, min(count, self._last_index() - self._current_index))
+        if skipped:
+            self._current_index += skipped
+            self._mutating = True
+            self._mutate()
+        return skipped
+
+    def reset(self):
+        '''
+        Reset the state of the container and its internal fields
+        '''
+        super(CoveringArray, self).reset()
+        self._field_levels = [0] * len(self._fields)
+
+    def get_info(self):
+        '''
+        Get info regarding the current combination of the enclosed fields
+
+        :return: info dictionary
+        '''
+        self._get_ready()
+        info = BaseField.get_info(self)
+        info['covering array/strength'] = self._strength
+        info['covering array/full product mutations'] = self._product_size - 1
+        info['covering array/levels'] = ', '.join(
+            '%s:%s' % (field.get_name() if field.get_name() else '<no name>', level)
+            for field, level in zip(self._fields, self._field_levels)
+        )
+        return info
+
+
 class If(Container):
     '''
     Render only if condition evalutes to True
@@ -528,6 +778,7 @@ class Repeat(Container):
     '''
     Repeat the enclosed fields. When not mutated, the repeat count is min_times
     '''
+    _sequential_mutations_ = False
 
     def __init__(self, fields=[], min_times=1, max_times=1, step=1, encoder=ENC_BITS_DEFAULT, fuzzable=True, name=None):
         '''
@@ -592,6 +843,7 @@ class OneOf(Container):
     '''
     Render a single field from the fields (also mutates only one field each time)
     '''
+    _sequential_mutations_ = False
 
     def render(self):
         '''
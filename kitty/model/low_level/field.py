@@ -740,8 +740,9 @@ class Dynamic(BaseField):
 
     def render(self):
         if self._mutating:
+            # flip a single bit of the current value, so rendering again returns the same payload
             xor_bits = Bits(uint=1 << self._current_index, length=self._length * 8)
-            self._current_rendered = self._current_rendered ^ xor_bits
+            self._current_rendered = self._encode_value(self._current_value) ^ xor_bits
         return self._current_rendered
 
     def skip(self, count):
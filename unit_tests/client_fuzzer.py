@@ -0,0 +1,64 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+from kitty.model import Template, GraphModel, String, Dynamic
+from kitty.fuzzers import ClientFuzzer
+from kitty.targets.client import ClientTarget
+
+
+class TestClientFuzzer(unittest.TestCase):
+
+    def _prepare(self, template):
+        self.model = GraphModel()
+        self.model.connect(template)
+        self.target = ClientTarget('client_target')
+        self.fuzzer = ClientFuzzer(name='TestClientFuzzer')
+        self.fuzzer.set_model(self.model)
+        self.fuzzer.set_target(self.target)
+        self.fuzzer.session_info.end_index = self.model.last_index()
+        self.assertTrue(self.fuzzer._mutate())
+        self.fuzzer._fuzz_path = self.model.get_sequence()
+        self.fuzzer._index_in_path = 0
+        self.fuzzer._prerender()
+
+    def test_prerendered_mutation(self):
+        template = Template(name='simple_str_template', fields=[String(name='str1', value='kitty')])
+        self._prepare(template)
+        expected = template.render().tobytes()
+
+        def render():
+            raise Exception('payload was rendered on request')
+        template.render = render
+        payload = self.fuzzer.get_mutation(stage='simple_str_template', data={})
+        self.assertEqual(payload, expected)
+        self.assertTrue(self.target.response_sent_event.is_set())
+
+    def test_dynamic_fields_rendered_on_request(self):
+        template = Template(name='dynamic_template', fields=[
+            String(name='str1', value='kitty'),
+            Dynamic(key='session', default_value='\x00\x00'),
+        ])
+        self._prepare(template)
+        self.assertIsNone(self.fuzzer._prerendered)
+        payload = self.fuzzer.get_mutation(stage='dynamic_template', data={'session': '\x01\x02'})
+        self.assertTrue(payload.endswith('\x01\x02'))
+
+    def test_other_stage(self):
+        template = Template(name='simple_str_template', fields=[String(name='str1', value='kitty')])
+        self._prepare(template)
+        self.assertIsNone(self.fuzzer.get_mutation(stage='other_stage', data={}))
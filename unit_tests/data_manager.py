@@ -0,0 +1,724 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import json
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from threading import Event
+from kitty.data.data_manager import DataManager, DataManagerTask, SessionInfo
+from kitty.core import KittyException
+from kitty.data.codec import ReportCodec
+from kitty.data.export import SessionExporter
+from kitty.data.journal import SessionJournal
+from kitty.data.report import Report
+
+
+class TestDataManager(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.dbname = os.path.join(self.tmpdir, 'session.sqlite')
+        self.dataman = None
+
+    def tearDown(self):
+        if self.dataman:
+            self.dataman.submit_task(None)
+            self.dataman.join()
+        shutil.rmtree(self.tmpdir)
+
+    def _start(self, dbname):
+        self.dataman = DataManager(dbname)
+        self.dataman.start()
+
+    def _store_reports(self, count):
+        def store_task(test_id):
+            def task(dataman):
+                return dataman.get_reports_manager().store(Report('report_%d' % test_id), test_id)
+            return DataManagerTask(task)
+        tasks = [self.dataman.submit_task(store_task(i)) for i in range(count)]
+        for task in tasks:
+            task.get_results()
+
+    def _get_report_test_ids(self, dataman):
+        return dataman.get_reports_manager().get_report_test_ids()
+
+    def test_journal_truncate_positions(self):
+        journal = SessionJournal(os.path.join(self.tmpdir, 'session.journal'))
+        info = SessionInfo()
+        for current_index in [1, 2]:
+            info.current_index = current_index
+            journal.append(info)
+        first = journal.position()
+        info.current_index = 3
+        journal.append(info)
+        second = journal.position()
+        info.current_index = 4
+        journal.append(info)
+        journal.truncate(first)
+        self.assertEqual(journal.read(), (4, 0))
+        # positions taken before a truncation still refer to the same entries
+        journal.truncate(second)
+        self.assertEqual(journal.read(), (4, 0))
+        journal.truncate(journal.position())
+        self.assertIsNone(journal.read())
+        journal.close()
+
+    def test_wal_mode(self):
+        self._start(self.dbname)
+        self._store_reports(1)
+        connection = sqlite3.connect(self.dbname)
+        mode = connection.execute('PRAGMA journal_mode').fetchone()[0]
+        connection.close()
+        self.assertEqual(mode, 'wal')
+
+    def test_pending_tasks_committed_in_single_transaction(self):
+        self._start(self.dbname)
+        self._store_reports(1)
+        commits = []
+        blocker = Event()
+
+        class CountingConnection(object):
+            def __init__(self, connection):
+                self._connection = connection
+
+            def commit(self):
+                commits.append(1)
+                self._connection.commit()
+
+            def __getattr__(self, name):
+                return getattr(self._connection, name)
+
+        def block_task(dataman):
+            dataman._connection._connection = CountingConnection(dataman._connection._connection)
+            # block the data manager until all the reports are queued
+            blocker.wait()
+        self.dataman.submit_task(DataManagerTask(block_task))
+        tasks = []
+        for i in range(10):
+            task = DataManagerTask(lambda dataman, i=i: dataman.get_reports_manager().store(Report('r'), i + 1))
+            tasks.append(self.dataman.submit_task(task))
+        blocker.set()
+        for task in tasks:
+            task.get_results()
+        test_ids = self.dataman.submit_task(DataManagerTask(self._get_report_test_ids)).get_results()
+        self.assertEqual(len(test_ids), 11)
+        self.assertEqual(len(commits), 1)
+
+    def _block(self):
+        '''
+        :return: event that blocks the data manager until it is set
+        '''
+        blocker = Event()
+        self.dataman.submit_task(DataManagerTask(lambda dataman: blocker.wait()))
+        return blocker
+
+    def test_task_exception(self):
+        self._start(self.dbname)
+
+        def task(dataman):
+            raise ValueError('task failed')
+        failed = self.dataman.submit_task(DataManagerTask(task))
+        self.assertRaises(ValueError, failed.get_results)
+        self.assertIsInstance(failed.exception(), ValueError)
+        # the data manager keeps running after a task failed
+        self._store_reports(2)
+        self.assertIsNone(self.dataman.submit_task(DataManagerTask(self._get_report_test_ids)).exception())
+
+    def test_task_timeout(self):
+        self._start(self.dbname)
+        blocker = self._block()
+        task = self.dataman.submit_task(DataManagerTask(self._get_report_test_ids))
+        self.assertRaises(KittyException, task.get_results, 0.05)
+        self.assertFalse(task.done())
+        blocker.set()
+        self.assertEqual(task.get_results(), [])
+        self.assertTrue(task.done())
+
+    def test_task_cancel(self):
+        self._start(self.dbname)
+        blocker = self._block()
+        executed = []
+        task = self.dataman.submit_task(DataManagerTask(lambda dataman: executed.append(1)))
+        self.assertTrue(task.cancel())
+        self.assertTrue(task.cancelled())
+        self.assertTrue(task.done())
+        self.assertRaises(KittyException, task.get_results)
+        blocker.set()
+        self.dataman.submit_task(DataManagerTask(self._get_report_test_ids)).get_results()
+        self.assertEqual(executed, [])
+
+    def test_task_cancel_after_completion(self):
+        self._start(self.dbname)
+        task = self.dataman.submit_task(DataManagerTask(self._get_report_test_ids))
+        task.get_results()
+        self.assertFalse(task.cancel())
+        self.assertFalse(task.cancelled())
+
+    def test_submit_batch(self):
+        self._start(':memory:')
+        self._store_reports(1)
+        commits = []
+
+        class CountingConnection(object):
+            def __init__(self, connection):
+                self._connection = connection
+
+            def commit(self):
+                commits.append(1)
+                self._connection.commit()
+
+            def __getattr__(self, name):
+                return getattr(self._connection, name)
+
+        def wrap_task(dataman):
+            dataman._connection._connection = CountingConnection(dataman._connection._connection)
+        self.dataman.submit_task(DataManagerTask(wrap_task)).get_results()
+        del commits[:]
+        order = []
+        tasks = []
+        for i in range(5):
+            def task(dataman, i=i):
+                order.append(i)
+                return dataman.get_reports_manager().store(Report('r'), i + 1)
+            tasks.append(DataManagerTask(task))
+        self.assertEqual(self.dataman.submit_batch(tasks), tasks)
+        for task in tasks:
+            task.get_results()
+        self.assertEqual(order, range(5))
+        self.assertEqual(len(commits), 1)
+        self.assertEqual(self.dataman.submit_batch([]), [])
+
+    def test_submit_timeout(self):
+        self.dataman = DataManager(self.dbname, max_pending_tasks=1)
+        self.dataman.start()
+        blocker = self._block()
+        try:
+            # the blocking task may not have been taken from the queue yet
+            self.dataman.submit_task(DataManagerTask(self._get_report_test_ids), timeout=0.05)
+            self.dataman.submit_task(DataManagerTask(self._get_report_test_ids), timeout=0.05)
+            self.fail('submit_task did not time out')
+        except KittyException:
+            pass
+        finally:
+            blocker.set()
+
+    def test_read_task_sees_committed_data(self):
+        self._start(self.dbname)
+        self._store_reports(5)
+        task = self.dataman.submit_read_task(DataManagerTask(self._get_report_test_ids))
+        self.assertEqual(sorted(task.get_results()), range(5))
+
+    def test_read_task_connection_is_read_only(self):
+        self._start(self.dbname)
+        self._store_reports(1)
+
+        def task(dataman):
+            try:
+                dataman.get_reports_manager().store(Report('report'), 10)
+                return True
+            except sqlite3.OperationalError:
+                return False
+        self.assertFalse(self.dataman.submit_read_task(DataManagerTask(task)).get_results())
+
+    def test_read_task_session_info(self):
+        self._start(self.dbname)
+
+        def set_info(dataman):
+            info = SessionInfo()
+            info.current_index = 17
+            dataman.get_session_info_manager().set_session_info(info)
+        self.dataman.submit_task(DataManagerTask(set_info)).get_results()
+
+        def get_info(dataman):
+            return dataman.get_session_info_manager().get_session_info()
+        info = self.dataman.submit_read_task(DataManagerTask(get_info)).get_results()
+        self.assertEqual(info.current_index, 17)
+
+    def test_read_task_in_memory(self):
+        self._start(':memory:')
+        self._store_reports(3)
+        task = self.dataman.submit_read_task(DataManagerTask(self._get_report_test_ids))
+        self.assertEqual(sorted(task.get_results()), range(3))
+
+    def _store_failure_reports(self):
+        def task(dataman):
+            manager = dataman.get_reports_manager()
+            for i in range(10):
+                report = Report('report_%d' % i)
+                report.add('fuzz_path', 'login->cmd_%d' % (i % 2))
+                payload = Report('payload')
+                payload.add('length', i * 10)
+                report.add('payload', payload)
+                if i % 3 == 0:
+                    target_report = Report('target')
+                    target_report.failed('crash %d' % i)
+                    report.add('target', target_report)
+                manager.store(report, i)
+        self.dataman.submit_task(DataManagerTask(task)).get_results()
+
+    def _query(self, **kwargs):
+        def task(dataman):
+            return dataman.get_reports_manager().query(**kwargs)
+        return self.dataman.submit_read_task(DataManagerTask(task)).get_results()
+
+    def test_report_summary(self):
+        self._start(self.dbname)
+        self._store_failure_reports()
+        total, summaries = self._query(max_test_id=3)
+        self.assertEqual(total, 4)
+        self.assertEqual([s['test_id'] for s in summaries], [0, 1, 2, 3])
+        summary = summaries[3]
+        self.assertTrue(summary['failed'])
+        self.assertEqual(summary['reason'], 'crash 3')
+        self.assertEqual(summary['template'], 'cmd_1')
+        self.assertEqual(summary['fuzz_path'], 'login->cmd_1')
+        self.assertEqual(summary['payload_length'], 30)
+        self.assertFalse(summaries[1]['failed'])
+        self.assertIsNone(summaries[1]['reason'])
+
+    def test_report_summary_binary_reason(self):
+        self._start(self.dbname)
+
+        def task(dataman):
+            report = Report('report')
+            report.failed('bad byte \xff')
+            dataman.get_reports_manager().store(report, 0)
+        self.dataman.submit_task(DataManagerTask(task)).get_results()
+        total, summaries = self._query()
+        self.assertEqual(summaries[0]['reason'], u'bad byte \ufffd')
+
+    def test_report_query_filter(self):
+        self._start(self.dbname)
+        self._store_failure_reports()
+        total, summaries = self._query(failed=True)
+        self.assertEqual(total, 4)
+        self.assertEqual([s['test_id'] for s in summaries], [0, 3, 6, 9])
+        total, summaries = self._query(template='cmd_0', failed=True)
+        self.assertEqual([s['test_id'] for s in summaries], [0, 6])
+        total, summaries = self._query(reason='crash 9')
+        self.assertEqual([s['test_id'] for s in summaries], [9])
+
+    def test_report_query_sort_and_paginate(self):
+        self._start(self.dbname)
+        self._store_failure_reports()
+        total, summaries = self._query(sort='-payload_length', offset=2, limit=3)
+        self.assertEqual(total, 10)
+        self.assertEqual([s['test_id'] for s in summaries], [7, 6, 5])
+
+    def test_report_query_invalid_sort(self):
+        self._start(self.dbname)
+        self._store_failure_reports()
+
+        def task(dataman):
+            try:
+                dataman.get_reports_manager().query(sort='content')
+                return True
+            except KittyException:
+                return False
+        self.assertFalse(self.dataman.submit_task(DataManagerTask(task)).get_results())
+
+    def test_old_reports_table_upgraded(self):
+        connection = sqlite3.connect(self.dbname)
+        connection.execute('CREATE TABLE reports (id INTEGER PRIMARY KEY, test_id INT, content BLOB)')
+        connection.commit()
+        connection.close()
+        self._start(self.dbname)
+        self._store_reports(2)
+        total, summaries = self._query()
+        self.assertEqual(total, 2)
+
+        def get_task(dataman):
+            return dataman.get_reports_manager().get(1).get_name()
+        self.assertEqual(self.dataman.submit_read_task(DataManagerTask(get_task)).get_results(), 'report_1')
+        connection = sqlite3.connect(self.dbname)
+        indices = [row[1] for row in connection.execute('PRAGMA index_list(reports)')]
+        connection.close()
+        self.assertIn('reports_test_id', indices)
+
+    def test_legacy_report_readable(self):
+        self._start(self.dbname)
+        report = Report('legacy')
+        report.failed('legacy failure')
+        report.add('raw', '\x00\x01\x02')
+
+        def task(dataman):
+            manager = dataman.get_reports_manager()
+            manager.insert(['test_id', 'content'], [5, manager._serialize_dict(report.to_dict())])
+            return manager.get(5)
+        stored = self.dataman.submit_task(DataManagerTask(task)).get_results()
+        self.assertEqual(stored.get('failure_reason'), 'legacy failure')
+        self.assertEqual(stored.get('raw'), '\x00\x01\x02')
+
+    def test_report_stored_encoded(self):
+        self._start(self.dbname)
+        self._store_reports(1)
+        connection = sqlite3.connect(self.dbname)
+        content = connection.execute('SELECT content FROM reports').fetchone()[0]
+        connection.close()
+        self.assertTrue(ReportCodec.is_encoded(content))
+
+    def _store_payload_reports(self, payloads):
+        def task(dataman):
+            for i, raw in enumerate(payloads):
+                report = Report('report_%d' % i)
+                payload = Report('payload')
+                payload.add('raw', raw)
+                payload.add('hex', raw.encode('hex'))
+                report.add('payload', payload)
+                target = Report('target')
+                target.add('request (raw)', raw)
+                target.add('request (hex)', raw.encode('hex'))
+                report.add('target', target)
+                dataman.get_reports_manager().store(report, i)
+        self.dataman.submit_task(DataManagerTask(task)).get_results()
+
+    def _get_report(self, test_id):
+        def task(dataman):
+            return dataman.get_reports_manager().get(test_id)
+        return self.dataman.submit_read_task(DataManagerTask(task)).get_results()
+
+    def _count_blobs(self):
+        connection = sqlite3.connect(self.dbname)
+        count = connection.execute('SELECT COUNT(*) FROM blobs').fetchone()[0]
+        connection.close()
+        return count
+
+    def test_payload_blobs_shared(self):
+        self._start(self.dbname)
+        big = 'A' * 100 + '\x00\xff'
+        other = 'B' * 100
+        self._store_payload_reports([big, big, other])
+        self.assertEqual(self._count_blobs(), 2)
+        for test_id, raw in [(0, big), (1, big), (2, other)]:
+            report = self._get_report(test_id)
+            self.assertEqual(report.get('payload').get('raw'), raw)
+            self.assertEqual(report.get('payload').get('hex'), raw.encode('hex'))
+            self.assertEqual(report.get('target').get('request (raw)'), raw)
+            self.assertEqual(report.get('target').get('request (hex)'), raw.encode('hex'))
+
+    def test_small_payload_not_in_blobs(self):
+        self._start(self.dbname)
+        self._store_payload_reports(['small'])
+        self.assertEqual(self._count_blobs(), 0)
+        report = self._get_report(0)
+        self.assertEqual(report.get('payload').get('raw'), 'small')
+        self.assertEqual(report.get('payload').get('hex'), 'small'.encode('hex'))
+
+    def test_failure_buckets(self):
+        self._start(self.dbname)
+
+        def task(dataman):
+            manager = dataman.get_reports_manager()
+            manager.set_failure_buckets(['failure_reason', 'target/stack_hash'], 2)
+            for i in range(10):
+                report = Report('report_%d' % i)
+                target = Report('target')
+                target.failed('crash')
+                target.add('stack_hash', 'hash_%d' % (i % 2))
+                report.add('target', target)
+                manager.store(report, i)
+            manager.store(Report('not failed'), 10)
+            return manager.get_buckets_manager().get_buckets()
+        total, buckets = self.dataman.submit_task(DataManagerTask(task)).get_results()
+        self.assertEqual(total, 2)
+        self.assertEqual([(b['first_test_id'], b['count']) for b in buckets], [(0, 5), (1, 5)])
+        self.assertIn("'hash_1'", buckets[1]['description'])
+        total, summaries = self._query(bucket=buckets[1]['id'])
+        self.assertEqual([s['test_id'] for s in summaries], [1, 3, 5, 7, 9])
+        self.assertEqual(self._get_report(3).get('target').get('stack_hash'), 'hash_1')
+        summary = self._get_report(5)
+        self.assertIsNone(summary.get('target'))
+        self.assertTrue(summary.is_failed())
+        self.assertEqual(summary.get('failure_reason'), 'crash')
+        self.assertEqual(summary.get('bucket first test'), 1)
+        total, summaries = self._query(min_test_id=10)
+        self.assertIsNone(summaries[0]['bucket'])
+
+    def _compact(self, batch_size=100, **retention):
+        def task(dataman):
+            manager = dataman.get_reports_manager()
+            manager.set_retention(**retention)
+            return manager.compact(batch_size)
+        return self.dataman.submit_task(DataManagerTask(task)).get_results()
+
+    def _get_summary_test_ids(self, **kwargs):
+        return [s['test_id'] for s in self._query(**kwargs)[1]]
+
+    def test_retention_max_reports(self):
+        self._start(self.dbname)
+        self._store_failure_reports()
+        self.assertEqual(self._compact(batch_size=2, max_reports=5), 2)
+        self.assertEqual(self._get_summary_test_ids(), [0, 3, 4, 5, 6, 7, 8, 9])
+        self.assertEqual(self._compact(max_reports=5), 3)
+        self.assertEqual(self._get_summary_test_ids(), [0, 3, 6, 8, 9])
+        self.assertEqual(self._compact(max_reports=1), 1)
+        # reports of failed tests are not removed
+        self.assertEqual(self._get_summary_test_ids(), [0, 3, 6, 9])
+        self.assertEqual(self._compact(max_reports=1), 0)
+
+    def test_retention_max_age(self):
+        self._start(self.dbname)
+        self._store_failure_reports()
+
+        def age_task(dataman):
+            dataman.get_reports_manager().update({'timestamp': 0}, 'test_id<5')
+        self.dataman.submit_task(DataManagerTask(age_task)).get_results()
+        self.assertEqual(self._compact(max_age_secs=3600), 3)
+        self.assertEqual(self._get_summary_test_ids(), [0, 3, 5, 6, 7, 8, 9])
+
+    def test_retention_max_bucket_reports(self):
+        self._start(self.dbname)
+
+        def task(dataman):
+            manager = dataman.get_reports_manager()
+            manager.set_failure_buckets(['failure_reason'], 10)
+            for i in range(5):
+                report = Report('report_%d' % i)
+                report.failed('crash')
+                manager.store(report, i)
+        self.dataman.submit_task(DataManagerTask(task)).get_results()
+        self.assertEqual(self._compact(max_bucket_reports=2), 3)
+        self.assertEqual(self._get_report(1).get_name(), 'report_1')
+        summary = self._get_report(2)
+        self.assertEqual(summary.get_name(), 'summary')
+        self.assertEqual(summary.get('failure_reason'), 'crash')
+        self.assertEqual(self._get_summary_test_ids(), range(5))
+        self.assertEqual(self._compact(max_bucket_reports=2), 0)
+
+    def test_retention_max_bucket_reports_batches(self):
+        self._start(self.dbname)
+
+        def task(dataman):
+            manager = dataman.get_reports_manager()
+            manager.set_failure_buckets(['failure_reason'], 10)
+            for i in range(12):
+                report = Report('report_%d' % i)
+                report.failed('crash' if i % 2 else 'hang')
+                manager.store(report, i)
+        self.dataman.submit_task(DataManagerTask(task)).get_results()
+        counts = [self._compact(batch_size=3, max_bucket_reports=1) for _ in range(5)]
+        self.assertEqual(counts, [3, 3, 3, 1, 0])
+        self.assertEqual(self._get_report(0).get_name(), 'report_0')
+        self.assertEqual(self._get_report(1).get_name(), 'report_1')
+        for i in range(2, 12):
+            self.assertEqual(self._get_report(i).get_name(), 'summary')
+
+    def test_retention_releases_blobs(self):
+        self._start(self.dbname)
+        big = 'A' * 100
+        self._store_payload_reports([big, big, 'B' * 100])
+        self.assertEqual(self._count_blobs(), 2)
+        self._compact(max_reports=2)
+        self.assertEqual(self._count_blobs(), 2)
+        self.assertEqual(self._get_report(1).get('payload').get('raw'), big)
+        self._compact(max_reports=1)
+        self.assertEqual(self._count_blobs(), 1)
+
+    def test_retention_archive_rotation(self):
+        self._start(self.dbname)
+        big = 'A' * 100
+        self._store_payload_reports([big] * 5)
+        archive = os.path.join(self.tmpdir, 'archive')
+        self._compact(max_reports=1, archive=archive, archive_max_reports=3)
+        self.assertEqual(self._get_summary_test_ids(), [4])
+        for number, test_ids in [(0, [0, 1, 2]), (1, [3])]:
+            self.assertEqual(self._read_archive('%s.%d' % (archive, number)), (test_ids, 1))
+        self.assertFalse(os.path.exists(archive + '.2'))
+        self._compact(max_reports=0, archive=archive, archive_max_reports=3)
+        self.assertEqual(self._read_archive(archive + '.1'), ([3, 4], 1))
+        self.assertEqual(self._count_blobs(), 0)
+
+    def _read_archive(self, filename):
+        '''
+        :return: tuple of (test ids of the archived reports, number of archived blobs)
+        '''
+        connection = sqlite3.connect(filename)
+        test_ids = [row[0] for row in connection.execute('SELECT test_id FROM reports ORDER BY test_id')]
+        count = connection.execute('SELECT COUNT(*) FROM blobs').fetchone()[0]
+        connection.close()
+        return test_ids, count
+
+class TestReportCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.codec = ReportCodec()
+
+    def _get_report(self):
+        report = Report('fuzzer')
+        report.failed(u'unicode reason \u05d0')
+        report.add('test_number', 17)
+        report.add('negative', -3)
+        report.add('big', 1 << 70)
+        report.add('ratio', 0.25)
+        report.add('ids', [1, 2, 3])
+        report.add('nothing', None)
+        payload = Report('payload')
+        payload.add('raw', ''.join(chr(i) for i in range(256)))
+        payload.add('length', 256)
+        report.add('payload', payload)
+        target = Report('target')
+        target.failed('no response')
+        report.add('target', target)
+        return report
+
+    def test_round_trip(self):
+        report = self._get_report()
+        decoded = self.codec.decode(self.codec.encode(report))
+        self.assertEqual(decoded.get_name(), 'fuzzer')
+        for key in ['failed', 'failure_reason', 'test_number', 'negative', 'big', 'ratio', 'ids', 'nothing']:
+            self.assertEqual(decoded.get(key), report.get(key))
+        self.assertEqual(decoded.get('payload').get('raw'), report.get('payload').get('raw'))
+        self.assertEqual(decoded.get('payload').get('length'), 256)
+        self.assertTrue(decoded.get('target').is_failed())
+        self.assertEqual(sorted(decoded.get('sub_reports')), ['payload', 'target'])
+
+    def test_partial_decode(self):
+        report = self._get_report()
+        decoded = self.codec.decode(self.codec.encode(report), fields=['failure_reason', 'payload'])
+        self.assertEqual(decoded.get('failure_reason'), report.get('failure_reason'))
+        self.assertEqual(decoded.get('payload').get('length'), 256)
+        self.assertIsNone(decoded.get('test_number'))
+        self.assertIsNone(decoded.get('target'))
+
+    def test_smaller_than_legacy_format(self):
+        report = self._get_report()
+        dataman = DataManager(':memory:')
+        dataman.open()
+        legacy = dataman.get_reports_manager()._serialize_dict(report.to_dict())
+        dataman.close()
+        self.assertLess(len(self.codec.encode(report)), len(legacy))
+
+    def test_hex_views_not_stored(self):
+        raw = ''.join(chr(i) for i in range(256))
+        report = Report('report')
+        report.add('raw', raw)
+        without_hex = self.codec.encode(report)
+        report.add('hex', raw.encode('hex'))
+        self.assertEqual(self.codec.encode(report), without_hex)
+        self.assertEqual(self.codec.decode(without_hex).get('hex'), raw.encode('hex'))
+
+    def test_external_blobs(self):
+        blobs = {}
+
+        def store_blob(data):
+            blobs[str(len(blobs))] = data
+            return str(len(blobs) - 1)
+        report = self._get_report()
+        data = self.codec.encode(report, store_blob)
+        self.assertEqual(blobs.values(), [report.get('payload').get('raw')])
+        decoded = self.codec.decode(data, load_blob=blobs.get)
+        self.assertEqual(decoded.get('payload').get('raw'), report.get('payload').get('raw'))
+        self.assertEqual(decoded.get('payload').get('hex'), report.get('payload').get('raw').encode('hex'))
+        with self.assertRaises(KittyException):
+            self.codec.decode(data)
+
+    def test_decode_invalid_data(self):
+        with self.assertRaises(KittyException):
+            self.codec.decode('not a report')
+
+
+class TestSessionExporter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.dbname = os.path.join(self.tmpdir, 'session.sqlite')
+        dataman = DataManager(self.dbname)
+        dataman.start()
+
+        def task(dataman):
+            for i in range(20):
+                report = Report('report_%d' % i)
+                report.add('fuzz_path', 'login->cmd')
+                payload = Report('payload')
+                payload.add('raw', 'A' * 100 + str(i % 4))
+                payload.add('length', 101)
+                report.add('payload', payload)
+                if i % 2:
+                    report.failed('crash')
+                dataman.get_reports_manager().store(report, i * 3)
+        dataman.submit_task(DataManagerTask(task)).get_results()
+
+        def test_summaries_task(dataman):
+            summaries = [(i, 1.0 * i, 1.0 * i + 0.5, 0.25, 10, 'digest_%d' % i, i == 7) for i in range(10)]
+            dataman.get_test_summaries_manager().store_batch(summaries)
+        dataman.submit_task(DataManagerTask(test_summaries_task)).get_results()
+        dataman.submit_task(None)
+        dataman.join()
+        self.exporter = SessionExporter(self.dbname)
+
+    def tearDown(self):
+        self.exporter.close()
+        shutil.rmtree(self.tmpdir)
+
+    def _read_lines(self, filename):
+        with open(filename, 'r') as f:
+            return [json.loads(line) for line in f]
+
+    def test_export_reports(self):
+        filename = os.path.join(self.tmpdir, 'reports.jsonl')
+        with open(filename, 'w') as f:
+            self.assertEqual(self.exporter.export_reports(f, 9, 15), 3)
+        lines = self._read_lines(filename)
+        self.assertEqual([line['test_id'] for line in lines], [9, 12, 15])
+        report = lines[0]['report']
+        self.assertEqual(report['failure_reason'].decode('base64'), 'crash')
+        self.assertEqual(report['payload']['raw'].decode('base64'), 'A' * 100 + '3')
+
+    def test_export_summary_columns(self):
+        directory = os.path.join(self.tmpdir, 'columns')
+        self.assertEqual(self.exporter.export_summary_columns(directory), 20)
+        test_ids = self._read_lines(os.path.join(directory, 'test_id.jsonl'))
+        failed = self._read_lines(os.path.join(directory, 'failed.jsonl'))
+        self.assertEqual(test_ids, [i * 3 for i in range(20)])
+        self.assertEqual(failed, [bool(i % 2) for i in range(20)])
+
+    def test_ranges_cover_all_reports(self):
+        ranges = self.exporter.get_ranges(3)
+        self.assertEqual(len(ranges), 3)
+        test_ids = []
+        for low, high in ranges:
+            filename = os.path.join(self.tmpdir, 'summaries_%d.jsonl' % low)
+            with open(filename, 'w') as f:
+                self.exporter.export_summaries(f, low, high)
+            test_ids.extend(line['test_id'] for line in self._read_lines(filename))
+        self.assertEqual(test_ids, [i * 3 for i in range(20)])
+
+    def test_export_blobs(self):
+        filename = os.path.join(self.tmpdir, 'blobs.jsonl')
+        with open(filename, 'w') as f:
+            self.assertEqual(self.exporter.export_blobs(f), 4)
+        contents = sorted(line['content'].decode('base64') for line in self._read_lines(filename))
+        self.assertEqual(contents, ['A' * 100 + str(i) for i in range(4)])
+
+    def test_export_test_summaries(self):
+        filename = os.path.join(self.tmpdir, 'tests.jsonl')
+        with open(filename, 'w') as f:
+            self.assertEqual(self.exporter.export_test_summaries(f, min_test_id=5), 5)
+        lines = self._read_lines(filename)
+        self.assertEqual([line['test_id'] for line in lines], range(5, 10))
+        self.assertEqual([line['test_id'] for line in lines if line['failed']], [7])
+        self.assertEqual(lines[0]['response_digest'], 'digest_5')
+
+    def test_export_test_summary_columns(self):
+        directory = os.path.join(self.tmpdir, 'tests')
+        self.assertEqual(self.exporter.export_test_summary_columns(directory), 10)
+        self.assertEqual(self._read_lines(os.path.join(directory, 'stop_time.jsonl')), [i + 0.5 for i in range(10)])
+        self.assertEqual(self.exporter.get_ranges(2, test_summaries=True), [(0, 4), (5, 9)])
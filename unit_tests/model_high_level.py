@@ -28,7 +28,8 @@ from kitty.model import GraphModel
 from kitty.model import RandomSequenceModel
 from kitty.model import StagedSequenceModel, Stage
 from kitty.model import Template
-from kitty.model import String, UInt32
+from kitty.model import String, UInt32, Group
+from kitty.data.report import Report
 from kitty.core import KittyException
 
 
@@ -218,6 +219,252 @@ class GraphModelTests(unittest.TestCase):
         expected_mutated = m_num_mutations - expected_skipped
         self._check_skip(to_skip, expected_skipped, expected_mutated)
 
+    def _get_partition_indices(self, num_shards, strategy):
+        res = []
+        for shard_id in range(num_shards):
+            templates = self.get_templates()
+            model = GraphModel()
+            model.connect(templates[0])
+            model.connect(templates[0], templates[1])
+            model.partition(num_shards, shard_id, strategy)
+            indices = []
+            while model.mutate():
+                self.assertTrue(model.in_partition(model.current_index()))
+                indices.append(model.current_index())
+            res.append(indices)
+        return res
+
+    def _check_partition(self, num_shards, strategy):
+        self.model.connect(self.templates[0])
+        self.model.connect(self.templates[0], self.templates[1])
+        m_num_mutations = self.model.num_mutations()
+        shards = self._get_partition_indices(num_shards, strategy)
+        all_indices = []
+        for indices in shards:
+            all_indices.extend(indices)
+        self.assertEqual(sorted(all_indices), range(m_num_mutations))
+        return shards
+
+    def test_partition_stride(self):
+        shards = self._check_partition(7, GraphModel.PARTITION_STRIDE)
+        for shard_id, indices in enumerate(shards):
+            self.assertTrue(all(i % 7 == shard_id for i in indices))
+
+    def test_partition_block(self):
+        shards = self._check_partition(7, GraphModel.PARTITION_BLOCK)
+        for indices in shards:
+            self.assertEqual(indices, range(indices[0], indices[-1] + 1))
+        sizes = [len(indices) for indices in shards]
+        self.assertLessEqual(max(sizes) - min(sizes), 1)
+
+    def test_partition_single_shard(self):
+        shards = self._check_partition(1, GraphModel.PARTITION_STRIDE)
+        self.assertEqual(len(shards), 1)
+
+    def test_partition_skip(self):
+        self.model.connect(self.templates[0])
+        self.model.partition(4, 1)
+        self.model.skip(10)
+        self.assertTrue(self.model.mutate())
+        self.assertEqual(self.model.current_index(), 13)
+
+    def _get_duplicates_model(self):
+        t1 = Template(name='t1', fields=[Group(['a', 'a', 'b'], name='g1'), String('x', name='s1')])
+        t2 = Template(name='t2', fields=[Group(['a', 'a', 'b'], name='g2')])
+        model = GraphModel()
+        model.connect(t1)
+        model.connect(t1, t2)
+        return model
+
+    def _check_partition_with_duplicates(self, strategy):
+        m_num_mutations = self._get_duplicates_model().num_mutations()
+        all_indices = []
+        duplicates = 0
+        for shard_id in range(3):
+            model = self._get_duplicates_model()
+            model.partition(3, shard_id, strategy)
+            while model.mutate():
+                self.assertTrue(model.in_partition(model.current_index()))
+                self.assertFalse(model.is_duplicate())
+                all_indices.append(model.current_index())
+            duplicates += model.get_test_info()['duplicate (skipped) test count']
+        self.assertEqual(len(all_indices), len(set(all_indices)))
+        self.assertEqual(len(all_indices) + duplicates, m_num_mutations)
+        return duplicates
+
+    def test_partition_stride_with_duplicates(self):
+        self._check_partition_with_duplicates(GraphModel.PARTITION_STRIDE)
+
+    def test_partition_block_with_duplicates(self):
+        duplicates = self._check_partition_with_duplicates(GraphModel.PARTITION_BLOCK)
+        self.assertEqual(duplicates, 2)
+
+    def test_partition_invalid(self):
+        with self.assertRaises(KittyException):
+            self.model.partition(4, 4)
+        with self.assertRaises(KittyException):
+            self.model.partition(0, 0)
+        with self.assertRaises(KittyException):
+            self.model.partition(4, 1, 'random')
+
+    def _get_cases(self, model):
+        res = []
+        while model.mutate():
+            path = model.get_sequence_str()
+            payloads = tuple(e.dst.render().tobytes() for e in model.get_sequence())
+            res.append((path, payloads))
+        return res
+
+    def _get_interleaved_model(self, quota=1, quotas=None):
+        templates = self.get_templates()
+        model = GraphModel()
+        model.connect(templates[0])
+        model.connect(templates[0], templates[1])
+        model.connect(templates[0], templates[2])
+        model.connect(templates[1], templates[2])
+        model.set_scheduling(GraphModel.SCHEDULE_INTERLEAVED, quota, quotas)
+        return model
+
+    def test_interleaved_same_cases(self):
+        self.model.connect(self.templates[0])
+        self.model.connect(self.templates[0], self.templates[1])
+        self.model.connect(self.templates[0], self.templates[2])
+        self.model.connect(self.templates[1], self.templates[2])
+        expected = self._get_cases(self.model)
+        model = self._get_interleaved_model(quota=3)
+        self.assertEqual(model.num_mutations(), self.model.num_mutations())
+        actual = self._get_cases(model)
+        self.assertEqual(sorted(expected), sorted(actual))
+        for path in set(p for p, _ in expected):
+            self.assertEqual([c for c in expected if c[0] == path], [c for c in actual if c[0] == path])
+
+    def test_interleaved_round_robin(self):
+        model = self._get_interleaved_model(quotas={'t1->t2': 2})
+        paths = [path for path, _ in self._get_cases(model)]
+        self.assertEqual(paths[:5], ['t1', 't1->t2', 't1->t2', 't1->t2->t3', 't1->t3'])
+        self.assertEqual(paths[5:10], paths[:5])
+
+    def test_interleaved_skip(self):
+        cases = self._get_cases(self._get_interleaved_model(quota=2))
+        model = self._get_interleaved_model(quota=2)
+        current = -1
+        for index in [3, 4, 100, 101, 250, len(cases) - 1]:
+            self.assertEqual(model.skip(index - current - 1), index - current - 1)
+            self.assertTrue(model.mutate())
+            self.assertEqual(model.current_index(), index)
+            path = model.get_sequence_str()
+            payloads = tuple(e.dst.render().tobytes() for e in model.get_sequence())
+            self.assertEqual((path, payloads), cases[index])
+            current = index
+        self.assertFalse(model.mutate())
+
+    def test_interleaved_hash(self):
+        model1 = self._get_interleaved_model()
+        model2 = self._get_interleaved_model()
+        model3 = self._get_interleaved_model(quota=2)
+        self.assertEqual(model1.hash(), model2.hash())
+        self.assertNotEqual(model1.hash(), model3.hash())
+
+    def _get_adaptive_model(self, quota=1):
+        t1 = Template(name='t1', fields=[String('data1', name='f1')])
+        t2 = Template(name='t2', fields=[String('data2', name='f2'), UInt32(300, name='f3')])
+        t3 = Template(name='t3', fields=[UInt32(400, name='f4')])
+        model = GraphModel()
+        model.connect(t1)
+        model.connect(t1, t2)
+        model.connect(t1, t3)
+        model.connect(t2, t3)
+        model.set_scheduling(GraphModel.SCHEDULE_ADAPTIVE, quota)
+        return model
+
+    def test_adaptive_same_cases(self):
+        model = self._get_adaptive_model()
+        model.set_scheduling(GraphModel.SCHEDULE_SEQUENTIAL)
+        expected = self._get_cases(model)
+        model = self._get_adaptive_model(quota=4)
+        self.assertEqual(model.num_mutations(), len(expected))
+        actual = self._get_cases(model)
+        self.assertEqual(sorted(expected), sorted(actual))
+
+    def test_adaptive_all_fields_first(self):
+        model = self._get_adaptive_model()
+        units = set([])
+        # t1: f1, t1->t2: f2 and f3, t1->t3: f4, t1->t2->t3: f4
+        for i in range(5):
+            self.assertTrue(model.mutate())
+            units.add(model.get_test_info()['schedule/unit'])
+        self.assertEqual(len(units), 5)
+
+    def test_adaptive_feedback_prioritizes_failures(self):
+        model = self._get_adaptive_model()
+        for i in range(5):
+            model.mutate()
+            report = Report('target')
+            if model.get_test_info()['schedule/unit'] == 't1->t2:t2/f2':
+                report.failed('boom')
+            model.feedback(report)
+        units = []
+        for i in range(10):
+            model.mutate()
+            units.append(model.get_test_info()['schedule/unit'])
+            report = Report('target')
+            report.failed('boom')
+            model.feedback(report)
+        self.assertEqual(units, ['t1->t2:t2/f2'] * 10)
+
+    def test_adaptive_partition_invalid(self):
+        model = self._get_adaptive_model()
+        model.partition(2, 0)
+        with self.assertRaises(KittyException):
+            model.mutate()
+
+    def _check_state(self, get_model, to_mutate):
+        model = get_model()
+        for i in range(to_mutate):
+            model.mutate()
+            report = Report('target')
+            if i % 3 == 0:
+                report.failed('boom')
+            model.feedback(report)
+        state = model.get_state()
+        restored = get_model()
+        restored.set_state(state)
+        self.assertEqual(restored.current_index(), model.current_index())
+        self.assertEqual(restored.get_state(), state)
+        self.assertEqual(self._get_cases(restored), self._get_cases(model))
+
+    def test_state_sequential(self):
+        def get_model():
+            templates = self.get_templates()
+            model = GraphModel()
+            model.connect(templates[0])
+            model.connect(templates[0], templates[1])
+            return model
+        self._check_state(get_model, 20)
+
+    def test_state_interleaved(self):
+        self._check_state(self._get_interleaved_model, 20)
+
+    def test_state_adaptive(self):
+        self._check_state(self._get_adaptive_model, 20)
+
+    def test_state_restore_mutated_model(self):
+        model = self._get_interleaved_model()
+        state = model.get_state()
+        model.mutate()
+        with self.assertRaises(KittyException):
+            model.set_state(state)
+
+    def test_scheduling_invalid(self):
+        self.model.connect(self.templates[0])
+        with self.assertRaises(KittyException):
+            self.model.set_scheduling('random')
+        with self.assertRaises(KittyException):
+            self.model.set_scheduling(GraphModel.SCHEDULE_INTERLEAVED, quota=0)
+        self.model.mutate()
+        with self.assertRaises(KittyException):
+            self.model.set_scheduling(GraphModel.SCHEDULE_INTERLEAVED)
+
     def test_failure_to_to(self):
         self.assertEqual(len(self.todo), 0)
 
@@ -274,6 +521,26 @@ class StagedSequenceModelTests(unittest.TestCase):
                 actual_mutations += 1
             self.assertEqual(expected_num_mutations, actual_mutations)
 
+    def _get_seeded_model(self):
+        model = StagedSequenceModel(num_mutations=100)
+        for stage in sorted(self.get_stage_map().keys(), key=lambda stage: stage.get_name()):
+            model.add_stage(stage)
+        return model
+
+    def test_state(self):
+        model = self._get_seeded_model()
+        model.skip(30)
+        model.mutate()
+        state = model.get_state()
+        restored = self._get_seeded_model()
+        restored.set_state(state)
+        self.assertEqual(restored.current_index(), model.current_index())
+        self.assertEqual(restored.get_sequence_str(), model.get_sequence_str())
+        while model.mutate():
+            self.assertTrue(restored.mutate())
+            self.assertEqual(restored.get_sequence_str(), model.get_sequence_str())
+        self.assertFalse(restored.mutate())
+
     def _check_skip(self, model, to_skip, expected_skipped, expected_mutated):
         skipped = model.skip(to_skip)
         self.assertEqual(expected_skipped, skipped)
@@ -322,6 +589,17 @@ class StagedSequenceModelTests(unittest.TestCase):
         expected_mutated = m_num_mutations - expected_skipped
         self._check_skip(model, to_skip, expected_skipped, expected_mutated)
 
+    def test_partition_stride(self):
+        num_shards = 3
+        all_indices = []
+        for shard_id in range(num_shards):
+            model = StagedSequenceModel(num_mutations=100)
+            model.add_stage(self.stages[0])
+            model.partition(num_shards, shard_id)
+            while model.mutate():
+                all_indices.append(model.current_index())
+        self.assertEqual(sorted(all_indices), range(100))
+
     def test_sequence_length_single_stage(self):
         for stage in self.stages:
             expected_length = self.stage_lengths[stage]
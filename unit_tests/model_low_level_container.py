@@ -18,12 +18,14 @@
 '''
 Tests for low level fields
 '''
+import itertools
 from common import metaTest, BaseTestCase
 from bitstring import Bits
 from kitty.model.low_level.field import String, Static, Group
-from kitty.model.low_level.container import Container, ForEach, If, IfNot, Repeat
+from kitty.model.low_level.container import Container, ForEach, If, IfNot, Repeat, CoveringArray
 from kitty.model.low_level.condition import Condition
 from kitty.model.low_level.aliases import Equal, NotEqual
+from kitty.core import KittyException
 
 
 class ContainerTest(BaseTestCase):
@@ -258,6 +260,55 @@ class ContainerTest(BaseTestCase):
             self.assertEqual(hash_after_creation, hash_after_render_all)
 
 
+    def _test_skip(self, fields):
+        container = self.get_default_container(fields=fields)
+        mutations = self.get_all_mutations(container)
+        for count in [0, 1, 7, len(mutations) / 2, len(mutations) - 1, len(mutations), len(mutations) + 5]:
+            container.reset()
+            skipped = container.skip(count)
+            self.assertEqual(skipped, min(count, len(mutations)))
+            if count < len(mutations):
+                self.assertTrue(container.mutate())
+                self.assertEqual(container.render(), mutations[count])
+            else:
+                self.assertFalse(container.mutate())
+
+    @metaTest
+    def test_skip_primitives(self):
+        fields = [String('test_%d' % d) for d in range(3)]
+        self._test_skip(fields)
+
+    @metaTest
+    def test_skip_nested_containers(self):
+        fields = [
+            String('test_1'),
+            Container(fields=[Group(['a', 'b', 'c']), Static('static'), String('test_2')]),
+            String('test_3', fuzzable=False),
+            Repeat(fields=[Static('r')], min_times=1, max_times=5),
+        ]
+        self._test_skip(fields)
+
+    def test_skip_overridden_mutate(self):
+        class ReversedContainer(Container):
+            def _mutate(self):
+                fields = self._fields[::-1]
+                for i in range(self._field_idx, len(fields)):
+                    self._field_idx = i
+                    if fields[i].mutate():
+                        return True
+                    fields[i].reset()
+                return False
+        container = ReversedContainer(fields=[String('test_%d' % d) for d in range(3)])
+        mutations = self.get_all_mutations(container)
+        for count in [1, 7, len(mutations) / 2]:
+            container.reset()
+            self.assertEqual(container.skip(count), count)
+            self.assertTrue(container.mutate())
+            self.assertEqual(container.render(), mutations[count])
+        ranges = container.get_mutation_ranges()
+        self.assertEqual(len(ranges), 1)
+        self.assertEqual(ranges[0][1:], (0, len(mutations)))
+
 class ConditionTest(ContainerTest):
 
     __meta__ = True
@@ -512,3 +563,65 @@ class RepeatTest(ContainerTest):
         ]
         repeater = Repeat(fields=fields, max_times=max_times)
         self._test_mutations(repeater, fields, max_times=max_times)
+
+
+class CoveringArrayTests(BaseTestCase):
+
+    def setUp(self, cls=CoveringArray):
+        super(CoveringArrayTests, self).setUp(cls)
+
+    def _get_fields(self, count, values=4):
+        return [Group(values=['%d_%d' % (i, v) for v in range(values)], name='field_%d' % i) for i in range(count)]
+
+    def _get_all_values(self, fields):
+        # the default value of each field, followed by its mutations
+        res = []
+        for field in fields:
+            values = [field.render().tobytes()] + [m.tobytes() for m in self.get_all_mutations(field)]
+            res.append(values)
+        return res
+
+    def _test_coverage(self, fields, strength):
+        all_values = self._get_all_values(fields)
+        container = CoveringArray(fields=fields, strength=strength)
+        rows = [[field.render().tobytes() for field in fields]]
+        while container.mutate():
+            rows.append([field.render().tobytes() for field in fields])
+        for columns in itertools.combinations(range(len(fields)), strength):
+            expected = set(itertools.product(*[all_values[i] for i in columns]))
+            covered = set(tuple(row[i] for i in columns) for row in rows)
+            self.assertEqual(expected - covered, set([]))
+        return container
+
+    def test_pairwise_coverage(self):
+        container = self._test_coverage(self._get_fields(6), 2)
+        self.assertLess(container.num_mutations(), 5 ** 6 - 1)
+
+    def test_3_wise_coverage(self):
+        container = self._test_coverage(self._get_fields(6), 3)
+        self.assertLess(container.num_mutations(), 5 ** 6 - 1)
+
+    def test_product_when_smaller(self):
+        fields = self._get_fields(2)
+        container = self._test_coverage(fields, 2)
+        self.assertEqual(container.num_mutations(), 5 * 5 - 1)
+
+    def test_full_product_in_info(self):
+        container = CoveringArray(fields=self._get_fields(6), strength=2)
+        container.mutate()
+        info = container.get_info()
+        self.assertEqual(info['covering array/full product mutations'], 5 ** 6 - 1)
+        self.assertEqual(info['covering array/strength'], 2)
+
+    def test_skip(self):
+        container = CoveringArray(fields=self._get_fields(5), strength=2)
+        mutations = self.get_all_mutations(container)
+        for index in [0, 1, 7, len(mutations) - 1, 3]:
+            container.reset()
+            self.assertEqual(container.skip(index), index)
+            self.assertTrue(container.mutate())
+            self.assertEqual(container.render(), mutations[index])
+
+    def test_invalid_strength(self):
+        with self.assertRaises(KittyException):
+            CoveringArray(fields=self._get_fields(3), strength=1)
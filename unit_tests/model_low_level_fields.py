@@ -590,6 +590,14 @@ class DynamicTests(ValueTestCase):
         field.set_session_data({self.key_not_exist: new_val})
         self.assertEqual(Bits(bytes=self.value_exists), field.render())
 
+    def test_render_fuzzable_twice(self):
+        field = self.cls(key=self.key_exists, default_value=self.default_value, length=len(self.default_value), fuzzable=True)
+        default = field.render()
+        while field.mutate():
+            rendered = field.render()
+            self.assertEqual(rendered, field.render())
+            self.assertEqual((rendered ^ default).count(1), 1)
+
 
 class RandomBytesTests(ValueTestCase):
 
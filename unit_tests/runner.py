@@ -17,10 +17,13 @@
 import os
 import unittest
 from server_fuzzer import *
+from client_fuzzer import *
+from data_manager import *
 from model_high_level import *
 from model_low_level_container import *
 from model_low_level_fields import *
 from model_low_level_encoders import *
+from web_interface import *
 
 
 if __name__ == '__main__':
@@ -17,10 +17,23 @@
 
 import unittest
 import logging
+import os
+import shutil
+import socket
+import tempfile
+import time
+from threading import Event, Thread
 
-from kitty.model import Template, GraphModel, String, UInt32
-from kitty.fuzzers import ServerFuzzer
+from kitty.core import KittyException
+from kitty.model import Template, GraphModel, String, UInt32, Dynamic, Group
+from kitty.fuzzers import ServerFuzzer, ParallelServerFuzzer, ConcurrentServerFuzzer
+from kitty.fuzzers import DistributedServerFuzzer, DistributedWorker
+from kitty.fuzzers import RateController, AimdRateController
+from kitty.fuzzers.server import _PipelinedModel
+from kitty.data.data_manager import DataManager, DataManagerTask
+from kitty.data.report import Report
 from kitty.interfaces.base import EmptyInterface
+from kitty.remote.rpc import RpcClient
 from mocks.mock_target import TargetMock
 
 test_logger = None
@@ -184,3 +197,762 @@ class TestServerFuzzer(unittest.TestCase):
         self.assertEqual(mutations_tested, expected_num_mutations)
         self.assertEqual(info.start_index, start_index)
         self.assertEqual(info.end_index, expected_end_index)
+
+    def test_shard_option(self):
+        self.fuzzer = ServerFuzzer(name="TestServerFuzzer", logger=self.logger, option_line='--shard 1/4')
+        self.fuzzer.set_interface(self.interface)
+        self.fuzzer.set_model(self.model)
+        self.fuzzer.set_target(self.target)
+        self.fuzzer.start()
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(self.model.get_partition(), (4, 1, 'stride'))
+        self.assertTrue(self.model.in_partition(info.current_index))
+        self.assertEqual(info.current_index, self.model.last_index() - (self.model.last_index() - 1) % 4)
+
+    def _get_report(self, test_id):
+        def get_report_task(dataman):
+            return dataman.get_reports_manager().get(test_id)
+        return self.fuzzer.dataman.submit_task(DataManagerTask(get_report_task)).get_results()
+
+    def test_response_novelty(self):
+        self.fuzzer.set_store_all_reports(True)
+        self.fuzzer.start()
+        first = self._get_report(self.start_index)
+        self.assertEqual(first.get('novel responses'), 1)
+        self.assertEqual(first.get('Data Model').get('novelty/novel responses'), 1)
+        # the mock target always responds with the same response
+        for test_id in range(self.start_index + 1, self.end_index + 1):
+            report = self._get_report(test_id)
+            self.assertEqual(report.get('novel responses'), 0)
+            self.assertEqual(report.get('response fingerprints'), first.get('response fingerprints'))
+        self.assertEqual(self.fuzzer._response_index.count(), 1)
+
+    def _get_payloads(self, pipeline_depth, get_template):
+        if self.fuzzer.dataman:
+            self.fuzzer.stop()
+        self.prepare()
+        t_str = Template(name='str_template', fields=[String(name='str2', value='kitty')])
+        self.model = GraphModel()
+        self.model.connect(t_str)
+        self.model.connect(t_str, get_template())
+        self.fuzzer.set_model(self.model)
+        self.fuzzer.set_range()
+        self.fuzzer.set_store_all_reports(True)
+        self.fuzzer.set_pipeline_depth(pipeline_depth)
+        self.fuzzer.start()
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.current_index, self.model.last_index())
+        return [self._get_report(i).get('payload').get('raw') for i in range(self.model.num_mutations())]
+
+    def test_pipeline_same_order(self):
+        def get_template():
+            return Template(name='int_template', fields=[UInt32(name='int2', value=0x1234)])
+        expected = self._get_payloads(0, get_template)
+        self.assertEqual(self._get_payloads(3, get_template), expected)
+
+    def test_pipeline_dynamic_fields(self):
+        def get_template():
+            return Template(name='dynamic_template', fields=[
+                Dynamic(key='session', default_value='\x00\x00'),
+                UInt32(name='int2', value=0x1234)
+            ])
+        expected = self._get_payloads(0, get_template)
+        self.assertEqual(self._get_payloads(3, get_template), expected)
+
+    def test_pipeline_end_index(self):
+        self.fuzzer.set_pipeline_depth(5)
+        self.fuzzer.start()
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.current_index, self.end_index)
+        self.assertEqual(info.start_index, self.start_index)
+
+    def test_pipeline_deeper_than_range(self):
+        self.fuzzer.set_range(10, 12)
+        self.fuzzer.set_pipeline_depth(10)
+        self.fuzzer.set_store_all_reports(True)
+        start = _PipelinedModel.start
+
+        def start_and_wait(pipeline):
+            # let the pipeline prepare all the tests before the first one is run
+            start(pipeline)
+            while pipeline._queue.qsize() < 4:
+                time.sleep(0.01)
+        _PipelinedModel.start = start_and_wait
+        try:
+            self.fuzzer.start()
+        finally:
+            _PipelinedModel.start = start
+        for test_id in range(10, 13):
+            self.assertEqual(self._get_report(test_id).get('test_number'), test_id)
+
+    def test_pipeline_adaptive_model(self):
+        self.model.set_scheduling(GraphModel.SCHEDULE_ADAPTIVE)
+        self.fuzzer.set_pipeline_depth(5)
+        self.fuzzer.start()
+        # no test was run
+        self.assertEqual(self.model.current_index(), self.start_index - 1)
+
+    def test_pipeline_edge_callbacks(self):
+        self.model.connect(self.t_str, self.t_int, lambda fuzzer, edge, resp: None)
+        self.fuzzer.set_pipeline_depth(5)
+        self.fuzzer.start()
+        # no test was run
+        self.assertEqual(self.model.current_index(), self.start_index - 1)
+
+    def test_pipeline_test_info(self):
+        self.fuzzer.set_pipeline_depth(5)
+        self.fuzzer.set_store_all_reports(True)
+        self.fuzzer.start()
+        test_info = self._get_report(self.start_index).get('Data Model')
+        self.assertEqual(test_info.get('current mutation index'), '%s/%s' % (self.start_index, self.model.last_index()))
+        self.assertEqual(test_info.get('sequence/current'), self.t_str.get_name())
+
+    def test_rate_controller_fixed(self):
+        self.fuzzer.set_rate_controller(RateController(0.01))
+        start = time.time()
+        self.fuzzer.start()
+        self.assertGreaterEqual(time.time() - start, 0.01 * (self.end_index - self.start_index + 1))
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.current_index, self.end_index)
+
+    def test_rate_controller_aimd(self):
+        rate_controller = AimdRateController(initial_rate=1000)
+        self.fuzzer.set_rate_controller(rate_controller)
+        self.fuzzer.start()
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.current_index, self.end_index)
+        self.assertGreater(rate_controller.get_rate(), 1000)
+
+    def test_concurrent_rate_controller(self):
+        self._prepare_parallel(4, {'12': {'report': {'failed': True}}}, ConcurrentServerFuzzer)
+        self.fuzzer.set_rate_controller(AimdRateController(initial_rate=1000, max_concurrency=2))
+        self.fuzzer.start()
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.failure_count, 1)
+        self.assertEqual(info.current_index, self.end_index)
+
+    def _count_checkpoints(self):
+        self.checkpoints = 0
+        set_session_info = self.fuzzer._set_session_info
+
+        def counting_set_session_info(*args):
+            self.checkpoints += 1
+            return set_session_info(*args)
+        self.fuzzer._set_session_info = counting_set_session_info
+
+    def test_checkpoint_interval(self):
+        self.fuzzer.set_checkpoint_interval(tests=5)
+        self._count_checkpoints()
+        self.fuzzer.start()
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.current_index, self.end_index)
+        # initial session, every 5 tests, end of session
+        self.assertLessEqual(self.checkpoints, 6)
+
+    def test_checkpoint_on_failure(self):
+        self.fuzzer.set_target(TargetMock({'12': {'report': {'failed': True}}}))
+        self.fuzzer.set_checkpoint_interval(tests=1000)
+        self._count_checkpoints()
+        self.fuzzer.start()
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.failure_count, 1)
+        self.assertEqual(self.checkpoints, 4)
+
+    def test_failure_buckets(self):
+        self.fuzzer.set_target(TargetMock({
+            'always': {'report': {'failed': True, 'failure_reason': 'crash'}},
+            '12': {'report': {'failed': True, 'failure_reason': 'hang'}},
+        }))
+        self.fuzzer.set_failure_buckets(max_reports=2)
+        self.fuzzer.start()
+
+        def get_buckets_task(dataman):
+            return dataman.get_reports_manager().get_buckets_manager().get_buckets()
+        total, buckets = self.fuzzer.dataman.submit_task(DataManagerTask(get_buckets_task)).get_results()
+        self.assertEqual(total, 2)
+        num_tests = self.end_index - self.start_index + 1
+        self.assertEqual([b['count'] for b in buckets], [num_tests - 1, 1])
+        self.assertEqual(buckets[0]['first_test_id'], self.start_index)
+        # full reports of the first tests in the bucket, summaries of the rest
+        self.assertIsNotNone(self._get_report(self.start_index + 1).get('payload'))
+        summary = self._get_report(self.end_index)
+        self.assertIsNone(summary.get('payload'))
+        self.assertEqual(summary.get('failure_reason'), 'crash')
+        self.assertEqual(summary.get('bucket first test'), self.start_index)
+        self.assertIsNotNone(self._get_report(12).get('payload'))
+
+    def test_test_summaries(self):
+        self.fuzzer.set_target(TargetMock({'12': {'report': {'failed': True}}}))
+        self.fuzzer.set_store_test_summaries(batch_size=7)
+        self.fuzzer.start()
+
+        def get_summaries_task(dataman):
+            return list(dataman.get_test_summaries_manager().iter_summaries())
+        summaries = self.fuzzer.dataman.submit_task(DataManagerTask(get_summaries_task)).get_results()
+        self.assertEqual([s['test_id'] for s in summaries], range(self.start_index, self.end_index + 1))
+        self.assertEqual([s['test_id'] for s in summaries if s['failed']], [12])
+        for summary in summaries:
+            self.assertLessEqual(summary['start_time'], summary['stop_time'])
+            self.assertGreaterEqual(summary['transmit_latency'], 0)
+
+    def test_parallel_test_summaries(self, cls=ParallelServerFuzzer):
+        self._prepare_parallel(2, {'12': {'report': {'failed': True}}}, cls)
+        self.fuzzer.set_store_test_summaries(batch_size=5)
+        self.fuzzer.start()
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.current_index, self.end_index)
+
+        def get_summaries_task(dataman):
+            return list(dataman.get_test_summaries_manager().iter_summaries())
+        summaries = self.fuzzer.dataman.submit_task(DataManagerTask(get_summaries_task)).get_results()
+        self.assertEqual(sorted(s['test_id'] for s in summaries), range(self.start_index, self.end_index + 1))
+        self.assertEqual([s['test_id'] for s in summaries if s['failed']], [12])
+
+    def test_concurrent_test_summaries(self):
+        self.test_parallel_test_summaries(ConcurrentServerFuzzer)
+
+    def test_parallel_report_retention(self, cls=ParallelServerFuzzer):
+        self._prepare_parallel(2, {'12': {'report': {'failed': True}}}, cls)
+        self.fuzzer.set_store_all_reports(True)
+        self.fuzzer.set_report_retention(max_reports=5, interval=5)
+        self.fuzzer.start()
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.current_index, self.end_index)
+
+        def count_task(dataman):
+            return dataman.get_reports_manager().count()
+        self.assertLessEqual(self.fuzzer.dataman.submit_task(DataManagerTask(count_task)).get_results(), 6)
+        self.assertTrue(self._get_report(12).is_failed())
+
+    def test_concurrent_report_retention(self):
+        self.test_parallel_report_retention(ConcurrentServerFuzzer)
+
+    def test_test_summaries_not_stored_by_default(self):
+        self.fuzzer.start()
+
+        def get_summaries_task(dataman):
+            return list(dataman.get_test_summaries_manager().iter_summaries())
+        self.assertEqual(self.fuzzer.dataman.submit_task(DataManagerTask(get_summaries_task)).get_results(), [])
+
+    def test_report_retention(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            archive = os.path.join(tmpdir, 'archive')
+            self.fuzzer.set_target(TargetMock({'12': {'report': {'failed': True}}}))
+            self.fuzzer.set_store_all_reports(True)
+            self.fuzzer.set_report_retention(max_reports=5, archive=archive, archive_max_reports=2, interval=2, batch_size=3)
+            self.fuzzer.start()
+
+            def get_test_ids_task(dataman):
+                return sorted(dataman.get_reports_manager().get_report_test_ids())
+            test_ids = self.fuzzer.dataman.submit_task(DataManagerTask(get_test_ids_task)).get_results()
+            self.assertEqual(test_ids, [12, 16, 17, 18, 19, 20])
+            self.fuzzer.stop()
+            self.fuzzer.dataman.join()
+            self.fuzzer = None
+            archived = []
+            for number in range(3):
+                dataman = DataManager(archive + '.%d' % number)
+                dataman.start()
+                archived.append(dataman.submit_task(DataManagerTask(get_test_ids_task)).get_results())
+                dataman.submit_task(None)
+                dataman.join()
+            self.assertEqual(archived, [[10, 11], [13, 14], [15]])
+            self.assertFalse(os.path.exists(archive + '.3'))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_report_retention_invalid_interval(self):
+        self.assertRaises(KittyException, self.fuzzer.set_report_retention, max_reports=10, interval=0)
+        self.fuzzer = None
+
+    def test_failure_buckets_invalid_max_reports(self):
+        self.assertRaises(KittyException, self.fuzzer.set_failure_buckets, ['failure_reason'], 0)
+        self.fuzzer = None
+
+    def test_checkpoint_invalid_interval(self):
+        self.assertRaises(KittyException, self.fuzzer.set_checkpoint_interval, 0)
+        self.fuzzer = None
+
+    def test_checkpoint_journal_replay(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            session_file = os.path.join(tmpdir, 'session.sqlite')
+            self.fuzzer.set_session_file(session_file)
+            self.fuzzer.set_checkpoint_interval(tests=1000)
+            self.fuzzer.set_range(0, 5)
+            self.fuzzer.start()
+            self.fuzzer.stop()
+            # progress after the last checkpoint, journaled before a crash
+            with open(session_file + '.journal', 'a') as f:
+                f.write('8 1\n9 1\n1')
+            self.model = GraphModel()
+            self.model.connect(Template(name='simple_str_template', fields=[String(name='str1', value='kitty')]))
+            self.fuzzer = ServerFuzzer(name='TestServerFuzzer', logger=self.logger)
+            self.fuzzer.set_interface(self.interface)
+            self.fuzzer.set_model(self.model)
+            self.fuzzer.set_target(TargetMock({}))
+            self.fuzzer.set_session_file(session_file)
+            self.fuzzer.set_checkpoint_interval(tests=1000)
+            self.fuzzer._load_session()
+            self.assertEqual(self.fuzzer.session_info.current_index, 9)
+            self.assertEqual(self.fuzzer.session_info.failure_count, 1)
+            self.fuzzer.dataman.submit_task(None)
+            self.fuzzer = None
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_checkpoint_journal_truncate(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            session_file = os.path.join(tmpdir, 'session.sqlite')
+            self.fuzzer.set_session_file(session_file)
+            self.fuzzer.set_checkpoint_interval(tests=1000)
+            self.fuzzer._load_session()
+            journal = self.fuzzer._journal
+            self.fuzzer.session_info.current_index = 3
+            journal.append(self.fuzzer.session_info)
+            # hold the data manager until the checkpoint was submitted and more progress was journaled
+            blocker = Event()
+            self.fuzzer.dataman.submit_task(DataManagerTask(lambda dataman: blocker.wait()))
+            task = self.fuzzer._checkpoint()
+            self.fuzzer.session_info.current_index = 7
+            journal.append(self.fuzzer.session_info)
+            blocker.set()
+            task.get_results()
+            self.assertEqual(journal.read()[0], 7)
+            self.fuzzer._checkpoint().get_results()
+            self.assertIsNone(journal.read())
+            journal.close()
+            self.fuzzer.dataman.submit_task(None)
+            self.fuzzer = None
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_lazy_test_info(self):
+        calls = []
+        get_test_info = self.model.get_test_info
+
+        def counting_get_test_info():
+            calls.append(self.model.current_index())
+            return get_test_info()
+        self.model.get_test_info = counting_get_test_info
+        self.logger.setLevel(logging.INFO)
+        try:
+            self.fuzzer.start()
+        finally:
+            self.logger.setLevel(logging.DEBUG)
+        # the test info is not computed for tests that no one asked about
+        self.assertEqual(calls, [])
+        test_info = self.fuzzer._get_test_info()
+        self.assertEqual(calls, [self.end_index])
+        self.assertEqual(test_info['current mutation index'], '%d/%d' % (self.end_index, self.model.last_index()))
+        self.assertIn('novelty/unique responses', test_info)
+
+    def test_lazy_test_info_before_start(self):
+        self.fuzzer._load_session()
+        self.fuzzer._set_test_info_provider()
+        self.assertEqual(self.fuzzer._get_test_info(), {})
+
+    def test_report_payload_hex(self):
+        self.fuzzer.set_store_all_reports(True)
+        self.fuzzer.start()
+        for test_id in range(self.start_index, self.end_index + 1):
+            payload = self._get_report(test_id).get('payload')
+            self.assertEqual(payload.get('hex'), payload.get('raw').encode('hex'))
+            self.assertEqual(payload.get('length'), len(payload.get('raw')))
+
+    def test_payload_history(self):
+        self.fuzzer.set_target(TargetMock({'15': {'report': {'failed': True}}}))
+        self.fuzzer.set_store_all_reports(True)
+        self.fuzzer.set_payload_history(3)
+        self.fuzzer.start()
+        history = self._get_report(15).get('payload history')
+        self.assertEqual(history.get('count'), 3)
+        messages = [history.get('message %d' % i) for i in range(3)]
+        self.assertEqual([m.get('test_number') for m in messages], [13, 14, 15])
+        for message in messages:
+            payload = self._get_report(message.get('test_number')).get('payload')
+            self.assertEqual(message.get('raw'), payload.get('raw'))
+            self.assertEqual(message.get('length'), len(payload.get('raw')))
+            self.assertEqual(message.get('template'), 'simple_str_template')
+        # the history is added only to the reports of failed tests
+        self.assertIsNone(self._get_report(16).get('payload history'))
+
+    def test_payload_history_disabled_by_default(self):
+        self.fuzzer.set_target(TargetMock({'15': {'report': {'failed': True}}}))
+        self.fuzzer.start()
+        self.assertIsNone(self._get_report(15).get('payload history'))
+
+    def test_payload_history_invalid_size(self):
+        self.assertRaises(KittyException, self.fuzzer.set_payload_history, -1)
+        self.fuzzer = None
+
+    def test_model_snapshot_interval(self):
+        self.fuzzer.set_model_snapshots(tests=4)
+        snapshots = []
+        get_model_snapshot = self.fuzzer._get_model_snapshot
+
+        def recording_get_model_snapshot():
+            snapshot = get_model_snapshot()
+            snapshots.append(snapshot['state']['current_index'])
+            return snapshot
+        self.fuzzer._get_model_snapshot = recording_get_model_snapshot
+        self.fuzzer.start()
+        # every 4 tests, and when the fuzzing is over
+        self.assertEqual(snapshots, [13, 17, 20])
+
+    def test_model_snapshot_adaptive_interval(self):
+        self.model.set_scheduling(GraphModel.SCHEDULE_ADAPTIVE)
+        self.fuzzer.set_model_snapshots(tests=4)
+        snapshots = []
+        get_model_snapshot = self.fuzzer._get_model_snapshot
+
+        def recording_get_model_snapshot():
+            snapshot = get_model_snapshot()
+            if snapshot:
+                snapshots.append(snapshot['state']['current_index'])
+            return snapshot
+        self.fuzzer._get_model_snapshot = recording_get_model_snapshot
+        self.fuzzer.start()
+        # at every checkpoint
+        self.assertEqual(snapshots[:11], range(self.start_index, self.end_index + 1))
+
+    def test_model_snapshot_adaptive_older_snapshot(self):
+        self.model.set_scheduling(GraphModel.SCHEDULE_ADAPTIVE)
+        self.model.skip(3)
+        self.model.mutate()
+        snapshot = {'state': self.model.get_state(), 'test_done': True}
+        self.model = GraphModel()
+        self.model.connect(Template(name='simple_str_template', fields=[String(name='str1', value='kitty')]))
+        self.model.set_scheduling(GraphModel.SCHEDULE_ADAPTIVE)
+        self.fuzzer.set_model(self.model)
+        self.fuzzer.session_info.current_index = 10
+        self.assertTrue(self.fuzzer._restore_model_state(snapshot))
+        self.assertEqual(self.model.current_index(), 3)
+        self.assertEqual(self.fuzzer.session_info.current_index, 3)
+        self.fuzzer = None
+
+    def test_model_snapshot_signaled_with_busy_model(self):
+        self.fuzzer.set_model_snapshots()
+        self.model.mutate()
+        self.fuzzer._signaled = True
+        with self.fuzzer._model_lock:
+            self.assertIsNone(self.fuzzer._get_model_snapshot())
+        self.assertIsNotNone(self.fuzzer._get_model_snapshot())
+        self.fuzzer = None
+
+    def test_model_snapshot_invalid_interval(self):
+        self.assertRaises(KittyException, self.fuzzer.set_model_snapshots, True, 0)
+        self.fuzzer = None
+
+    def test_model_snapshot_resume(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            session_file = os.path.join(tmpdir, 'session.sqlite')
+            self.fuzzer.set_session_file(session_file)
+            self.fuzzer.set_model_snapshots()
+            self.fuzzer.set_range(0, 5)
+            self.fuzzer.start()
+            self.fuzzer.stop()
+            self.model = GraphModel()
+            self.model.connect(Template(name='simple_str_template', fields=[String(name='str1', value='kitty')]))
+            self.fuzzer = ServerFuzzer(name='TestServerFuzzer', logger=self.logger)
+            self.fuzzer.set_interface(self.interface)
+            self.fuzzer.set_model(self.model)
+            self.fuzzer.set_target(TargetMock({}))
+            self.fuzzer.set_session_file(session_file)
+            self.fuzzer.set_model_snapshots()
+            self.fuzzer._load_session()
+            snapshot = self.fuzzer._load_model_snapshot()
+            self.assertEqual(snapshot['state']['current_index'], 5)
+            self.assertTrue(snapshot['test_done'])
+            self.assertTrue(self.fuzzer._restore_model_state(snapshot))
+            self.assertEqual(self.model.current_index(), 5)
+            self.assertEqual(self.model._unique_set, snapshot['state']['unique_set'])
+            self.fuzzer.dataman.submit_task(None)
+            self.fuzzer = None
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_model_snapshot_not_done(self):
+        self.fuzzer._load_session()
+        self.fuzzer.session_info.current_index = 5
+        snapshot = {'state': {'current_index': 5}, 'test_done': False}
+        self.assertFalse(self.fuzzer._restore_model_state(snapshot))
+        snapshot = {'state': {'current_index': 6}, 'test_done': True}
+        self.assertFalse(self.fuzzer._restore_model_state(snapshot))
+        self.assertEqual(self.model.current_index(), -1)
+
+    def _get_all_mutations(self, field):
+        res = []
+        while field.mutate():
+            res.append(field.render())
+        return res
+
+    def _prepare_parallel(self, num_workers, target_config={}, cls=ParallelServerFuzzer):
+        self.fuzzer = cls(name='TestParallelServerFuzzer', logger=self.logger)
+        self.fuzzer.set_interface(self.interface)
+        self.fuzzer.set_model(self.model)
+        self.fuzzer.set_target_factory(lambda worker_id: TargetMock(target_config), num_workers)
+        self.fuzzer.set_range(self.start_index, self.end_index)
+
+    def test_parallel_vanilla(self, cls=ParallelServerFuzzer):
+        self._prepare_parallel(3, cls=cls)
+        self.fuzzer.set_store_all_reports(True)
+        self.fuzzer.start()
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.failure_count, 0)
+        self.assertEqual(info.start_index, self.start_index)
+        self.assertEqual(info.current_index, self.end_index)
+        t_str = Template(name='simple_str_template', fields=[String(name='str1', value='kitty')])
+        expected = [m.tobytes() for m in self._get_all_mutations(t_str)]
+        for test_id in range(self.start_index, self.end_index + 1):
+            report = self._get_report(test_id)
+            self.assertEqual(report.get('test_number'), test_id)
+            self.assertEqual(report.get('payload').get('raw'), expected[test_id])
+
+    def test_parallel_failures(self, cls=ParallelServerFuzzer):
+        self._prepare_parallel(2, {'12': {'report': {'failed': True}}, '15': {'report': {'failed': True}}}, cls)
+        self.fuzzer.start()
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.failure_count, 2)
+        self.assertEqual(info.current_index, self.end_index)
+        self.assertEqual(self._get_report(12).get('test_number'), 12)
+        self.assertEqual(self._get_report(15).get('test_number'), 15)
+
+    def _prepare_duplicates(self, num_workers, cls):
+        self.model = GraphModel()
+        self.model.connect(Template(name='duplicates_template', fields=[Group(['a', 'a', 'b'], name='group1')]))
+        self.start_index = 0
+        self.end_index = 2
+        self._prepare_parallel(num_workers, cls=cls)
+        self.fuzzer.set_store_all_reports(True)
+
+    def test_parallel_duplicates(self, cls=ParallelServerFuzzer):
+        self._prepare_duplicates(2, cls)
+        self.fuzzer.start()
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.current_index, self.end_index)
+        for test_id, payload in enumerate(['a', 'a', 'b']):
+            report = self._get_report(test_id)
+            self.assertEqual(report.get('test_number'), test_id)
+            self.assertEqual(report.get('payload').get('raw'), payload)
+
+    def test_concurrent_duplicates(self):
+        self.test_parallel_duplicates(ConcurrentServerFuzzer)
+
+    def test_parallel_adaptive_model(self, cls=ParallelServerFuzzer):
+        self.model.set_scheduling(GraphModel.SCHEDULE_ADAPTIVE)
+        self._prepare_parallel(2, cls=cls)
+        self.fuzzer.start()
+        # no test was run
+        self.assertEqual(self.model.current_index(), self.start_index - 1)
+
+    def test_concurrent_adaptive_model(self):
+        self.test_parallel_adaptive_model(ConcurrentServerFuzzer)
+
+    def test_parallel_worker_died(self):
+        def get_target(worker_id):
+            target = TargetMock({})
+            if worker_id == 1:
+                def die(payload):
+                    os._exit(1)
+                target.transmit = die
+            return target
+        self.fuzzer = ParallelServerFuzzer(name='TestParallelServerFuzzer', logger=self.logger)
+        self.fuzzer.set_interface(self.interface)
+        self.fuzzer.set_model(self.model)
+        self.fuzzer.set_target_factory(get_target, 2)
+        self.fuzzer.set_range(self.start_index, self.end_index)
+        # signal handlers can only be set in the main thread
+        self.fuzzer.set_signal_handler = lambda: None
+        thread = Thread(target=self.fuzzer.start)
+        thread.daemon = True
+        thread.start()
+        thread.join(30)
+        self.assertFalse(thread.is_alive())
+        info = self.fuzzer._get_session_info()
+        self.assertLess(info.current_index, self.end_index)
+
+    def test_concurrent_vanilla(self):
+        self.test_parallel_vanilla(ConcurrentServerFuzzer)
+
+    def test_concurrent_failures(self):
+        self.test_parallel_failures(ConcurrentServerFuzzer)
+
+    def test_concurrent_dynamic_fields(self):
+        self.model = GraphModel()
+        self.model.connect(Template(name='dynamic_template', fields=[
+            Dynamic(key='session', default_value='\x00\x00'),
+            UInt32(name='int2', value=0x1234)
+        ]))
+        self._prepare_parallel(2, cls=ConcurrentServerFuzzer)
+        self.fuzzer.start()
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.current_index, self.start_index)
+
+    def _get_free_port(self):
+        s = socket.socket()
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+        s.close()
+        return port
+
+    def _wait_for_port(self, port):
+        for _ in range(100):
+            try:
+                socket.create_connection(('127.0.0.1', port)).close()
+                return
+            except socket.error:
+                time.sleep(0.05)
+
+    def _prepare_distributed(self, lease_timeout=60):
+        self.port = self._get_free_port()
+        self.fuzzer = DistributedServerFuzzer(name='TestDistributedServerFuzzer', logger=self.logger)
+        self.fuzzer.set_interface(self.interface)
+        self.fuzzer.set_model(self.model)
+        self.fuzzer.set_listen_address('127.0.0.1', self.port)
+        self.fuzzer.set_lease_timeout(lease_timeout)
+        self.fuzzer.set_range(self.start_index, self.end_index)
+
+    def test_distributed_adaptive_model(self):
+        self.model.set_scheduling(GraphModel.SCHEDULE_ADAPTIVE)
+        self._prepare_distributed()
+        self.fuzzer.start()
+        # no test was run
+        self.assertEqual(self.model.current_index(), self.start_index - 1)
+        self.assertEqual(self.fuzzer._get_session_info().failure_count, 0)
+
+    def _start_distributed_worker(self, worker_id, target_config={}, batch_size=3):
+        def get_model():
+            model = GraphModel()
+            model.connect(Template(name='simple_str_template', fields=[String(name='str1', value='kitty')]))
+            return model
+        worker = DistributedWorker(name='worker_%d' % worker_id, logger=self.logger)
+        worker.set_model_factory(get_model)
+        worker.set_target(TargetMock(target_config))
+        worker.set_coordinator('127.0.0.1', self.port)
+        worker.set_batch_size(batch_size)
+
+        def run():
+            self._wait_for_port(self.port)
+            worker.start()
+        thread = Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def test_distributed_vanilla(self):
+        self._prepare_distributed()
+        self.fuzzer.set_store_all_reports(True)
+        workers = [self._start_distributed_worker(i) for i in range(2)]
+        self.fuzzer.start()
+        for worker in workers:
+            worker.join(5)
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.failure_count, 0)
+        self.assertEqual(info.start_index, self.start_index)
+        self.assertEqual(info.current_index, self.end_index)
+        t_str = Template(name='simple_str_template', fields=[String(name='str1', value='kitty')])
+        expected = [m.tobytes() for m in self._get_all_mutations(t_str)]
+        for test_id in range(self.start_index, self.end_index + 1):
+            report = self._get_report(test_id)
+            self.assertEqual(report.get('test_number'), test_id)
+            self.assertEqual(report.get('payload').get('raw'), expected[test_id])
+
+    def test_distributed_failures(self):
+        self._prepare_distributed()
+        config = {'12': {'report': {'failed': True}}, '15': {'report': {'failed': True}}}
+        workers = [self._start_distributed_worker(i, config) for i in range(2)]
+        self.fuzzer.start()
+        for worker in workers:
+            worker.join(5)
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.failure_count, 2)
+        self.assertEqual(info.current_index, self.end_index)
+        self.assertEqual(self._get_report(12).get('test_number'), 12)
+        self.assertEqual(self._get_report(15).get('test_number'), 15)
+
+    def test_distributed_lease_expired(self):
+        self._prepare_distributed(lease_timeout=1)
+        config = {'11': {'report': {'failed': True}}}
+
+        def dead_worker():
+            self._wait_for_port(self.port)
+            client = RpcClient('127.0.0.1', self.port)
+            info = client.register(name='dead_worker', model_hash=self.model.hash())
+            # lease the first tests and never complete them
+            client.lease(worker_id=info['worker_id'], count=3)
+            self._start_distributed_worker(1, config)
+        thread = Thread(target=dead_worker)
+        thread.daemon = True
+        thread.start()
+        self.fuzzer.start()
+        info = self.fuzzer._get_session_info()
+        self.assertEqual(info.failure_count, 1)
+        self.assertEqual(info.current_index, self.end_index)
+        self.assertEqual(self._get_report(11).get('test_number'), 11)
+
+
+class TestAimdRateController(unittest.TestCase):
+
+    def _update(self, rate_controller, latency, failed=False):
+        report = Report('test')
+        if failed:
+            report.failed('test failed')
+        rate_controller.update(latency, report)
+
+    def test_invalid_parameters(self):
+        self.assertRaises(KittyException, AimdRateController, initial_rate=0)
+        self.assertRaises(KittyException, AimdRateController, initial_rate=10, max_rate=5)
+        self.assertRaises(KittyException, AimdRateController, decrease=1)
+
+    def test_additive_increase(self):
+        rate_controller = AimdRateController(initial_rate=10, increase=5)
+        for _ in range(10):
+            self._update(rate_controller, 0.01)
+        self.assertGreater(rate_controller.get_rate(), 10)
+        self.assertLess(rate_controller.get_rate(), 20)
+
+    def test_max_rate(self):
+        rate_controller = AimdRateController(initial_rate=10, max_rate=11, increase=100)
+        for _ in range(10):
+            self._update(rate_controller, 0.01)
+        self.assertEqual(rate_controller.get_rate(), 11)
+
+    def test_failure_decrease(self):
+        rate_controller = AimdRateController(initial_rate=10, decrease=0.5)
+        self._update(rate_controller, 0.01, failed=True)
+        self.assertEqual(rate_controller.get_rate(), 5)
+        # a burst of failures is a single congestion event
+        self._update(rate_controller, 0.01, failed=True)
+        self.assertEqual(rate_controller.get_rate(), 5)
+
+    def test_min_rate(self):
+        rate_controller = AimdRateController(initial_rate=1, min_rate=0.8, decrease=0.5)
+        self._update(rate_controller, 0.01, failed=True)
+        self.assertEqual(rate_controller.get_rate(), 0.8)
+
+    def test_latency_decrease(self):
+        rate_controller = AimdRateController(initial_rate=10, increase=0, latency_threshold=3)
+        for _ in range(AimdRateController.LATENCY_MIN_SAMPLES):
+            self._update(rate_controller, 0.01)
+        self._update(rate_controller, 0.02)
+        self.assertEqual(rate_controller.get_rate(), 10)
+        self._update(rate_controller, 0.1)
+        self.assertEqual(rate_controller.get_rate(), 5)
+
+    def test_token_bucket_delay(self):
+        rate_controller = AimdRateController(initial_rate=10, burst=2)
+        self.assertEqual(rate_controller.get_delay(), 0)
+        self.assertEqual(rate_controller.get_delay(), 0)
+        self.assertAlmostEqual(rate_controller.get_delay(), 0.1, places=2)
+
+    def test_concurrency(self):
+        rate_controller = AimdRateController(initial_rate=100, increase=0, max_concurrency=3)
+        self.assertEqual(rate_controller.get_concurrency(), 1)
+        self._update(rate_controller, 0.02)
+        self.assertEqual(rate_controller.get_concurrency(), 2)
+        self._update(rate_controller, 0.5)
+        self.assertEqual(rate_controller.get_concurrency(), 3)
@@ -0,0 +1,113 @@
+# Copyright (C) 2016 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+#
+# This file is part of Kitty.
+#
+# Kitty is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# Kitty is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kitty.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Tests for the web interface API
+'''
+import json
+import unittest
+from kitty.data.data_manager import DataManager, DataManagerTask
+from kitty.data.report import Report
+from kitty.interfaces.web import _WebInterfaceHandler
+
+
+class _WebInterfaceHandlerMock(_WebInterfaceHandler):
+    '''
+    Handles a single request without a connection
+    '''
+
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+        self.status = None
+
+    def send_response(self, code, message=None):
+        self.status = code
+
+    def send_header(self, keyword, value):
+        pass
+
+    def end_headers(self):
+        pass
+
+
+class TestWebInterfaceApi(unittest.TestCase):
+
+    def setUp(self):
+        self.dataman = DataManager(':memory:')
+        self.dataman.start()
+        self.report_count = 5
+
+        def task(dataman):
+            for test_id in range(self.report_count):
+                dataman.get_reports_manager().store(Report('report_%d' % test_id), test_id)
+        self.dataman.submit_task(DataManagerTask(task)).get_results()
+
+    def tearDown(self):
+        self.dataman.submit_task(None)
+        self.dataman.join()
+
+    def _request(self, path):
+        handler = _WebInterfaceHandlerMock(path, self.dataman)
+        response = handler._handle_api_request()
+        return handler.status, json.loads(response)
+
+    def test_reports_vanilla(self):
+        status, response = self._request('/api/reports?offset=1&limit=2')
+        self.assertEqual(status, 200)
+        self.assertEqual(response['total'], self.report_count)
+        self.assertEqual(response['offset'], 1)
+        self.assertEqual([r['test_id'] for r in response['reports']], [1, 2])
+
+    def test_reports_limit_above_max(self):
+        _WebInterfaceHandlerMock.MAX_QUERY_LIMIT = 3
+        try:
+            status, response = self._request('/api/reports?limit=1000')
+        finally:
+            del _WebInterfaceHandlerMock.MAX_QUERY_LIMIT
+        self.assertEqual(status, 200)
+        self.assertEqual(len(response['reports']), 3)
+
+    def test_reports_negative_limit(self):
+        status, response = self._request('/api/reports?limit=-1')
+        self.assertEqual(status, 200)
+        self.assertEqual(len(response['reports']), 1)
+
+    def test_reports_limit_not_integer(self):
+        status, response = self._request('/api/reports?limit=abc')
+        self.assertEqual(status, 400)
+        self.assertIn('error', response)
+
+    def test_reports_negative_offset(self):
+        status, response = self._request('/api/reports?offset=-1')
+        self.assertEqual(status, 400)
+        self.assertIn('error', response)
+
+    def test_buckets_negative_limit(self):
+        status, response = self._request('/api/buckets?limit=-1')
+        self.assertEqual(status, 200)
+        self.assertEqual(response['total'], 0)
+
+    def test_buckets_limit_not_integer(self):
+        status, response = self._request('/api/buckets?limit=abc')
+        self.assertEqual(status, 400)
+        self.assertIn('error', response)
+
+    def test_buckets_negative_offset(self):
+        status, response = self._request('/api/buckets?offset=-1')
+        self.assertEqual(status, 400)
+        self.assertIn('error', response)